@@ -0,0 +1,137 @@
+"""
+Benchmark measures messages per second consumed by the flopsy.Consumer at prefetch 1, 10 and 100:
+one message per callback with an acknowledgement per message, against the batch mode
+with a single *multiple* acknowledgement per batch.
+
+Broker is replaced by an in-process stand-in: a delivery reaches the consumer ROUND_TRIP seconds
+after the acknowledgement that opened its slot in the prefetch window, as it does over the network.
+
+Usage from the project root:
+    python -m scripts.benchmark_consumer_prefetch
+"""
+
+__author__ = 'Bohdan Mushkevych'
+
+import collections
+import json
+import socket
+import time
+
+import amqp
+
+from settings import enable_test_mode
+enable_test_mode()
+
+from synergy.mq.flopsy import Consumer
+from synergy.scheduler.scheduler_constants import QUEUE_JOB_STATUS
+
+NUMBER_OF_MESSAGES = 20000
+ROUND_TRIP = 0.0005         # seconds between the acknowledgement and the delivery of the next message
+PREFETCH_COUNTS = [1, 10, 100]
+
+
+class StandInBroker(object):
+    """ stand-in for the AMQP connection and channel, that keeps the messages in flight per the prefetch window """
+
+    def __init__(self, number_of_messages):
+        self.connection = self
+        self.remaining = number_of_messages
+        self.next_tag = 1
+        self.prefetch_count = 0
+        self.acked_tag = 0
+        self.callback = None
+        # format: deque of (arrival time, amqp.Message) delivered to the consumer, but not yet read
+        self.in_flight = collections.deque()
+
+    def _send(self, number_of_messages, arrival):
+        for _ in range(min(number_of_messages, self.remaining)):
+            message = amqp.Message(json.dumps({'data': {'record_db_id': self.next_tag}}))
+            message.delivery_info = {'delivery_tag': self.next_tag}
+            self.in_flight.append((arrival, message))
+            self.next_tag += 1
+            self.remaining -= 1
+
+    # connection methods
+    def channel(self):
+        return self
+
+    def blocking_read(self, timeout=None):
+        if not self.in_flight:
+            raise socket.timeout('queue is empty')
+        arrival = self.in_flight[0][0]
+        delay = arrival - time.perf_counter()
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise socket.timeout()
+        if delay > 0:
+            time.sleep(delay)
+        now = time.perf_counter()
+        while self.in_flight and self.in_flight[0][0] <= now:
+            self.callback(self.in_flight.popleft()[1])
+
+    def close(self):
+        pass
+
+    # channel methods
+    def queue_declare(self, **_):
+        pass
+
+    def exchange_declare(self, **_):
+        pass
+
+    def queue_bind(self, **_):
+        pass
+
+    def basic_qos(self, prefetch_size, prefetch_count, a_global):
+        self.prefetch_count = prefetch_count
+
+    def basic_consume(self, queue, no_ack, callback, consumer_tag):
+        self.callback = callback
+        self._send(self.prefetch_count or self.remaining, time.perf_counter() + ROUND_TRIP)
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        number_of_settled = delivery_tag - self.acked_tag if multiple else 1
+        self.acked_tag = max(self.acked_tag, delivery_tag)
+        if self.prefetch_count:
+            self._send(number_of_settled, time.perf_counter() + ROUND_TRIP)
+
+    def basic_reject(self, delivery_tag, requeue):
+        pass
+
+
+def run(prefetch_count, is_batch):
+    broker = StandInBroker(NUMBER_OF_MESSAGES)
+    consumer = Consumer(QUEUE_JOB_STATUS, connection=broker, prefetch_count=prefetch_count)
+    processed = []
+
+    def call_back(message):
+        processed.append(message.body['record_db_id'])
+        consumer.acknowledge(message.delivery_tag)
+        if len(processed) == NUMBER_OF_MESSAGES:
+            consumer.is_running = False
+
+    def batch_call_back(messages):
+        processed.extend(message.body['record_db_id'] for message in messages)
+        if len(processed) == NUMBER_OF_MESSAGES:
+            consumer.is_running = False
+        return []
+
+    if is_batch:
+        consumer.register_batch(batch_call_back, prefetch_count, batch_timeout=ROUND_TRIP * 4)
+    else:
+        consumer.register(call_back)
+
+    started_at = time.perf_counter()
+    consumer.wait(timeout=1.0)
+    elapsed = time.perf_counter() - started_at
+    assert len(processed) == NUMBER_OF_MESSAGES
+
+    mode = 'batch' if is_batch else 'one by one'
+    print(f'prefetch {prefetch_count:>4}, {mode:>10}: {NUMBER_OF_MESSAGES / elapsed:>10.0f} messages/s')
+
+
+if __name__ == '__main__':
+    print(f'{NUMBER_OF_MESSAGES} messages, {ROUND_TRIP * 1000} ms round trip to the broker')
+    for prefetch_count in PREFETCH_COUNTS:
+        run(prefetch_count, is_batch=False)
+        run(prefetch_count, is_batch=True)
@@ -0,0 +1,143 @@
+"""
+Benchmark measures the publish latency and the number of open AMQP connections under concurrent MqTransmitter use:
+connection per publisher (as it was prior to the ConnectionManager) against the channels over shared connections.
+
+Broker is replaced by an in-process stand-in: opening a connection costs CONNECT_TIME (TCP and AMQP handshake),
+opening a channel costs CHANNEL_OPEN_TIME (one round trip); publishing is asynchronous and costs nothing.
+
+Usage from the project root:
+    python -m scripts.benchmark_mq_connections
+"""
+
+__author__ = 'Bohdan Mushkevych'
+
+import logging
+import random
+import threading
+import time
+
+from settings import enable_test_mode
+enable_test_mode()
+
+from synergy.conf import context
+from synergy.db.model.unit_of_work import UnitOfWork
+from synergy.db.model.managed_process_entry import ManagedProcessEntry
+from synergy.mq import flopsy
+from synergy.system.mq_transmitter import MqTransmitter
+
+NUMBER_OF_TRANSMITTERS = 8      # state machines and the GC hold a transmitter each
+NUMBER_OF_BURSTS = 10
+BURST_SIZE = 50
+CONNECT_TIME = 0.02             # seconds
+CHANNEL_OPEN_TIME = 0.001       # seconds
+
+
+class StandInAmqpConnection(object):
+    """ stand-in for the amqp.Connection; counts connections that are currently open """
+    lock = threading.Lock()
+    number_of_open = 0
+    max_number_of_open = 0
+
+    def __init__(self, **_):
+        self.connected = False
+
+    def connect(self):
+        time.sleep(CONNECT_TIME)
+        self.connected = True
+        with StandInAmqpConnection.lock:
+            StandInAmqpConnection.number_of_open += 1
+            StandInAmqpConnection.max_number_of_open = max(StandInAmqpConnection.max_number_of_open,
+                                                           StandInAmqpConnection.number_of_open)
+
+    def channel(self):
+        time.sleep(CHANNEL_OPEN_TIME)
+        return StandInChannel()
+
+    def close(self):
+        if self.connected:
+            self.connected = False
+            with StandInAmqpConnection.lock:
+                StandInAmqpConnection.number_of_open -= 1
+
+
+class StandInChannel(object):
+    def __init__(self):
+        self.is_open = True
+
+    def basic_publish(self, message, exchange, routing_key):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+
+class LegacyPool(flopsy._Pool):
+    """ _Pool as it was prior to the ConnectionManager: every publisher opens its own connection,
+        and the pool keeps all of them """
+
+    def _create(self):
+        return flopsy.Publisher(name=self.name, parent_pool=self)
+
+    def put(self, publisher):
+        self.publishers.append(publisher)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(is_legacy):
+    StandInAmqpConnection.number_of_open = 0
+    StandInAmqpConnection.max_number_of_open = 0
+    connection_manager = flopsy.ConnectionManager()
+    process_names = [process_name for process_name, process_entry in context.process_context.items()
+                     if isinstance(process_entry, ManagedProcessEntry)]
+
+    transmitters = []
+    for _ in range(NUMBER_OF_TRANSMITTERS):
+        transmitter = MqTransmitter(logging.getLogger('benchmark'))
+        transmitter.publishers = flopsy.PublishersPool(transmitter.logger, connection_manager=connection_manager)
+        if is_legacy:
+            transmitter.publishers._get_pool = lambda name, pools=transmitter.publishers: \
+                pools.pools.setdefault(name, LegacyPool(pools.logger, name))
+        else:
+            # as the Scheduler does at the start
+            for process_name in process_names:
+                transmitter.publishers.prewarm(process_name)
+        transmitters.append(transmitter)
+
+    latencies = []
+    latencies_lock = threading.Lock()
+
+    def publish(transmitter):
+        for _ in range(NUMBER_OF_BURSTS):
+            for _ in range(BURST_SIZE):
+                uow = UnitOfWork()
+                uow.db_id = '5e2b7a1c9d4f3a0012000001'
+                uow.process_name = random.choice(process_names)
+                started_at = time.perf_counter()
+                transmitter.publish_managed_uow(uow, lane='live')
+                with latencies_lock:
+                    latencies.append(time.perf_counter() - started_at)
+                # state machine work between two units of work
+                time.sleep(0.0005)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=publish, args=(transmitter,)) for transmitter in transmitters]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    mode = 'connection per publisher' if is_legacy else 'shared connections'
+    print('{0:>24}: publish latency p50={1:7.3f} ms  p99={2:7.3f} ms  max={3:7.1f} ms;  open connections: {4}'
+          .format(mode, percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000,
+                  max(latencies) * 1000, StandInAmqpConnection.max_number_of_open))
+
+
+if __name__ == '__main__':
+    flopsy.amqp.Connection = StandInAmqpConnection
+    print(f'{NUMBER_OF_TRANSMITTERS} concurrent MqTransmitters, {NUMBER_OF_BURSTS} bursts of {BURST_SIZE} UOWs each')
+    run(is_legacy=True)
+    run(is_legacy=False)
@@ -0,0 +1,153 @@
+"""
+Benchmark measures the queueing latency - time from the publishing of the unit of work to the start of its
+processing - of the live units of work, published while the workers churn through a 10,000 UOW backfill.
+Single lane (no message priority) is compared against the live/backfill priority lanes.
+
+Broker is replaced by an in-process stand-in, that follows the RabbitMQ delivery order:
+messages of higher priority first, FIFO within the same priority; every worker holds one unacknowledged message.
+
+Usage from the project root:
+    python -m scripts.benchmark_priority_lanes
+"""
+
+__author__ = 'Bohdan Mushkevych'
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from settings import enable_test_mode
+enable_test_mode()
+
+from constants import PROCESS_SITE_HOURLY
+from synergy.conf import settings
+from synergy.db.model.unit_of_work import UnitOfWork
+from synergy.system import time_helper
+from synergy.system.mq_transmitter import MqTransmitter
+from synergy.system.time_qualifier import QUALIFIER_HOURLY
+
+NUMBER_OF_BACKFILL_UOWS = 10000
+NUMBER_OF_LIVE_UOWS = 40
+LIVE_UOW_INTERVAL = 0.05    # seconds between two live units of work
+NUMBER_OF_WORKERS = 20
+PROCESSING_TIME = 0.005     # seconds per unit of work
+MAX_PRIORITY = 2
+
+
+class InProcessBroker(object):
+    """ stand-in for the priority queue of the RabbitMQ """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.heap = []
+        self.sequence = itertools.count()
+
+    def put(self, message_data, priority):
+        with self.condition:
+            heapq.heappush(self.heap, (-(priority or 0), next(self.sequence), time.time(), message_data))
+            self.condition.notify()
+
+    def get(self):
+        """ :return: tuple (published_at, message_data) or None if no messages arrive within a second """
+        with self.condition:
+            if not self.heap and not self.condition.wait(1.0):
+                return None
+            if not self.heap:
+                return None
+            _, _, published_at, message_data = heapq.heappop(self.heap)
+            return published_at, message_data
+
+
+class StandInPublisher(object):
+    def __init__(self, broker):
+        self.broker = broker
+
+    def publish(self, message_data, priority=None):
+        self.broker.put(message_data, priority)
+
+    def release(self):
+        pass
+
+
+class StandInPublishersPool(object):
+    def __init__(self, broker):
+        self.broker = broker
+
+    def get(self, name):
+        return StandInPublisher(self.broker)
+
+    def close(self):
+        pass
+
+
+def build_uow(db_id, timeperiod):
+    uow = UnitOfWork()
+    uow.db_id = db_id
+    uow.process_name = PROCESS_SITE_HOURLY
+    uow.timeperiod = timeperiod
+    return uow
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(max_priority):
+    settings.settings['mq_max_priority'] = max_priority
+    broker = InProcessBroker()
+    transmitter = MqTransmitter(logging.getLogger('benchmark'))
+    transmitter.publishers = StandInPublishersPool(broker)
+
+    actual_timeperiod = time_helper.actual_timeperiod(QUALIFIER_HOURLY)
+    backfill_timeperiod = time_helper.increment_timeperiod(QUALIFIER_HOURLY, actual_timeperiod, delta=-24 * 30)
+    live_ids = set()
+    latencies = []
+    is_done = threading.Event()
+
+    def work():
+        while not is_done.is_set():
+            delivery = broker.get()
+            if delivery is None:
+                continue
+            published_at, message_data = delivery
+            if message_data['record_db_id'] in live_ids:
+                latencies.append(time.time() - published_at)
+            time.sleep(PROCESSING_TIME)
+
+    # backlog is in the queue before the workers start, as it is after an outage
+    for index in range(NUMBER_OF_BACKFILL_UOWS):
+        transmitter.publish_managed_uow(build_uow(f'backfill_{index}', backfill_timeperiod))
+
+    workers = [threading.Thread(target=work, daemon=True) for _ in range(NUMBER_OF_WORKERS)]
+    started_at = time.time()
+    for worker in workers:
+        worker.start()
+
+    for index in range(NUMBER_OF_LIVE_UOWS):
+        live_ids.add(f'live_{index}')
+        transmitter.publish_managed_uow(build_uow(f'live_{index}', actual_timeperiod))
+        time.sleep(LIVE_UOW_INTERVAL)
+
+    while len(latencies) < NUMBER_OF_LIVE_UOWS:
+        time.sleep(0.01)
+    while broker.heap:
+        time.sleep(0.01)
+    drained_in = time.time() - started_at
+    is_done.set()
+    for worker in workers:
+        worker.join()
+
+    mode = 'single lane' if not max_priority else 'priority lanes'
+    print('{0:>15}: live latency p50={1:8.1f} ms  p99={2:8.1f} ms  max={3:8.1f} ms;  backlog drained in {4:.1f} s'
+          .format(mode, percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000,
+                  max(latencies) * 1000, drained_in))
+
+
+if __name__ == '__main__':
+    print(f'{NUMBER_OF_BACKFILL_UOWS} backfill UOWs, {NUMBER_OF_LIVE_UOWS} live UOWs every {LIVE_UOW_INTERVAL} s, '
+          f'{NUMBER_OF_WORKERS} workers x {PROCESSING_TIME * 1000:.0f} ms per UOW')
+    run(max_priority=0)
+    run(max_priority=MAX_PRIORITY)
@@ -0,0 +1,105 @@
+"""
+Benchmark measures messages per second published by the flopsy.Publisher: fire-and-forget (no delivery guarantee)
+against the publisher confirms with a synchronous round-trip per message (confirm window of 1)
+and the pipelined confirms with the confirm window of 10, 100 and 1000.
+
+Broker is replaced by an in-process stand-in: a message is confirmed ROUND_TRIP seconds after it was published;
+confirms that are due at the same time are coalesced into a single *multiple* ack, as the RabbitMQ does.
+
+Usage from the project root:
+    python -m scripts.benchmark_publisher_confirms
+"""
+
+__author__ = 'Bohdan Mushkevych'
+
+import collections
+import socket
+import threading
+import time
+
+from settings import enable_test_mode
+enable_test_mode()
+
+from constants import PROCESS_SITE_HOURLY
+from synergy.mq.flopsy import Publisher
+
+NUMBER_OF_MESSAGES = 5000
+ROUND_TRIP = 0.0005         # seconds between the publishing of the message and the arrival of its confirm
+CONFIRM_WINDOWS = [1, 10, 100, 1000]
+
+
+class StandInBroker(object):
+    """ stand-in for the flopsy.Connection, the amqp.Connection and the amqp.Channel in the confirm mode """
+
+    def __init__(self):
+        self.connection = self
+        self.lock = threading.Lock()
+        self.is_alive = True
+        self.is_open = True
+        self.events = collections.defaultdict(set)
+        self.next_tag = 1
+
+        # format: deque of (arrival time, delivery tag) of the confirms sent by the broker
+        self.in_flight = collections.deque()
+
+    # amqp.Connection methods
+    def channel(self):
+        return self
+
+    def drain_events(self, timeout=None):
+        if not self.in_flight:
+            if timeout:
+                time.sleep(timeout)
+            raise socket.timeout()
+        delay = self.in_flight[0][0] - time.perf_counter()
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise socket.timeout()
+        if delay > 0:
+            time.sleep(delay)
+
+        now = time.perf_counter()
+        delivery_tag = None
+        while self.in_flight and self.in_flight[0][0] <= now:
+            delivery_tag = self.in_flight.popleft()[1]
+        for callback in self.events['basic_ack']:
+            callback(delivery_tag, True)
+
+    # amqp.Channel methods
+    def confirm_select(self):
+        pass
+
+    def basic_publish(self, message, exchange, routing_key):
+        if self.events['basic_ack']:
+            self.in_flight.append((time.perf_counter() + ROUND_TRIP, self.next_tag))
+            self.next_tag += 1
+
+    def close(self):
+        pass
+
+
+def run(confirm_window):
+    publisher = Publisher(PROCESS_SITE_HOURLY, connection=StandInBroker(), confirm_window=confirm_window)
+    message_data = {'process_name': PROCESS_SITE_HOURLY, 'record_db_id': '5e2b7a1c9d4f3a0012000001'}
+
+    started_at = time.perf_counter()
+    for index in range(NUMBER_OF_MESSAGES):
+        publisher.publish(message_data, token=index)
+    publisher.wait_for_confirms()
+    elapsed = time.perf_counter() - started_at
+    assert not publisher.pop_failed()
+
+    if not confirm_window:
+        mode = 'fire-and-forget'
+    elif confirm_window == 1:
+        mode = 'confirm per message'
+    else:
+        mode = f'confirm window {confirm_window}'
+    print(f'{mode:>20}: {NUMBER_OF_MESSAGES / elapsed:>10.0f} messages/s')
+
+
+if __name__ == '__main__':
+    print(f'{NUMBER_OF_MESSAGES} messages, {ROUND_TRIP * 1000} ms round trip to the broker')
+    run(confirm_window=0)
+    for confirm_window in CONFIRM_WINDOWS:
+        run(confirm_window)
@@ -0,0 +1,98 @@
+"""
+Benchmark compares thread count, resident memory and firing jitter - time from the scheduled tick
+to the start of the call_back - of the thread-per-timer RepeatTimer against the TimerDispatcher-based one.
+
+Usage from the project root:
+    python -m scripts.benchmark_timer_dispatcher [thread|dispatcher]
+"""
+
+__author__ = 'Bohdan Mushkevych'
+
+import random
+import resource
+import sys
+import threading
+import time
+
+from synergy.system.repeat_timer import RepeatTimer
+
+NUMBER_OF_HANDLERS = 5000
+MIN_INTERVAL = 1.0          # seconds
+MAX_INTERVAL = 5.0          # seconds
+DURATION = 15.0             # seconds
+
+
+class ThreadRepeatTimer(threading.Thread):
+    """ RepeatTimer as it was before the TimerDispatcher: every instance holds a thread,
+        plus a threading.Timer thread per countdown """
+    def __init__(self, interval, call_back, daemonic=True, args=None):
+        super(ThreadRepeatTimer, self).__init__(daemon=daemonic)
+        self.interval = interval
+        self.call_back = call_back
+        self.args = args or []
+        self.event = threading.Event()
+        self.event.set()
+        self.__timer = None
+
+    def run(self):
+        while self.event.is_set():
+            self.__timer = threading.Timer(self.interval, self.call_back, self.args)
+            self.__timer.start()
+            self.__timer.join()
+
+    def cancel(self):
+        self.event.clear()
+        if self.__timer is not None:
+            self.__timer.cancel()
+
+
+def rss_mb():
+    """ :return: current resident set size in MB """
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(timer_klass):
+    random.seed(0)
+    jitters = []
+    timers = []
+
+    def make_call_back(interval, state):
+        def call_back():
+            now = time.time()
+            jitters.append(now - state['expected'])
+            state['expected'] = now + interval
+        return call_back
+
+    rss_before = rss_mb()
+    threads_before = threading.active_count()
+    for _ in range(NUMBER_OF_HANDLERS):
+        interval = random.uniform(MIN_INTERVAL, MAX_INTERVAL)
+        state = {'expected': time.time() + interval}
+        timer = timer_klass(interval, make_call_back(interval, state), daemonic=True)
+        timer.start()
+        timers.append(timer)
+
+    time.sleep(DURATION)
+    threads = threading.active_count() - threads_before
+    rss = rss_mb() - rss_before
+    for timer in timers:
+        timer.cancel()
+
+    print('{0:>18} {1:>9} {2:>9.1f} {3:>9} {4:>9.1f} {5:>9.1f} {6:>9.1f}'.format(
+        timer_klass.__name__, threads, rss, len(jitters), percentile(jitters, 0.50) * 1000,
+        percentile(jitters, 0.99) * 1000, max(jitters) * 1000))
+
+
+if __name__ == '__main__':
+    # every mode is run in a separate process, so that memory figures do not interfere
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'dispatcher'
+    print(f'{NUMBER_OF_HANDLERS} handlers, intervals {MIN_INTERVAL}-{MAX_INTERVAL}s, {DURATION}s run')
+    print('{0:>18} {1:>9} {2:>9} {3:>9} {4:>9} {5:>9} {6:>9}'.format(
+        'timer', 'threads', '+RSS MB', 'ticks', 'p50 ms', 'p99 ms', 'max ms'))
+    run(ThreadRepeatTimer if mode == 'thread' else RepeatTimer)
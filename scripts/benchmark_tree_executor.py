@@ -0,0 +1,116 @@
+"""
+Benchmark compares managed tick latency - time from the scheduled tick to the start of its execution -
+under the global Scheduler lock against the per-tree SerialExecutors, while one of the trees is busy catching up.
+
+Usage from the project root:
+    python -m scripts.benchmark_tree_executor
+"""
+
+__author__ = 'Bohdan Mushkevych'
+
+import heapq
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from synergy.system.serial_executor import SerialExecutor
+
+NUMBER_OF_TREES = 10
+PROCESSES_PER_TREE = 20
+TICK_INTERVAL = 1.0         # seconds between ticks of a single process
+DURATION = 5.0              # seconds of simulated ticks
+BUSY_TREE_TICK = 0.040      # seconds a tick of the busy tree spends in the DB
+REGULAR_TREE_TICK = 0.001   # seconds a tick of a regular tree spends in the DB
+BUSY_TREE = 'tree_0'
+
+
+def schedule_ticks():
+    """ :return: heap of (tick time offset, tree_name, process_name) with the processes' phases randomized """
+    random.seed(0)
+    ticks = []
+    for tree_index in range(NUMBER_OF_TREES):
+        for process_index in range(PROCESSES_PER_TREE):
+            phase = random.uniform(0, TICK_INTERVAL)
+            offset = phase
+            while offset < DURATION:
+                ticks.append((offset, f'tree_{tree_index}', f'process_{tree_index}_{process_index}'))
+                offset += TICK_INTERVAL
+    heapq.heapify(ticks)
+    return ticks
+
+
+class GlobalLockScheduler(object):
+    """ every tick occupies a timer thread and is executed under the single lock """
+    title = 'global lock'
+
+    def __init__(self):
+        self.lock = Lock()
+        self.timer_threads = ThreadPoolExecutor(max_workers=NUMBER_OF_TREES * PROCESSES_PER_TREE)
+
+    def fire(self, tree_name, process_name, tick):
+        self.timer_threads.submit(self._fire, tree_name, tick)
+
+    def _fire(self, tree_name, tick):
+        with self.lock:
+            tick()
+
+    def shutdown(self):
+        self.timer_threads.shutdown()
+
+
+class TreeExecutorScheduler(object):
+    """ every tick is queued into the serial work queue of its tree """
+    title = 'tree executors'
+
+    def __init__(self):
+        self.executors = {f'tree_{index}': SerialExecutor(f'tree_{index}') for index in range(NUMBER_OF_TREES)}
+
+    def fire(self, tree_name, process_name, tick):
+        self.executors[tree_name].submit_once(process_name, tick)
+
+    def shutdown(self):
+        for executor in self.executors.values():
+            executor.shutdown()
+
+
+def run(scheduler):
+    """ :return: dict in format {tree_name: list of tick latencies in seconds} """
+    latencies = {f'tree_{index}': [] for index in range(NUMBER_OF_TREES)}
+
+    def make_tick(tree_name, scheduled_at):
+        def tick():
+            latencies[tree_name].append(time.perf_counter() - scheduled_at)
+            time.sleep(BUSY_TREE_TICK if tree_name == BUSY_TREE else REGULAR_TREE_TICK)
+        return tick
+
+    ticks = schedule_ticks()
+    started_at = time.perf_counter()
+    while ticks:
+        offset, tree_name, process_name = heapq.heappop(ticks)
+        scheduled_at = started_at + offset
+        delay = scheduled_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        scheduler.fire(tree_name, process_name, make_tick(tree_name, scheduled_at))
+    scheduler.shutdown()
+    return latencies
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+if __name__ == '__main__':
+    print(f'{NUMBER_OF_TREES} trees x {PROCESSES_PER_TREE} processes, tick every {TICK_INTERVAL}s; '
+          f'{BUSY_TREE} ticks take {BUSY_TREE_TICK * 1000:.0f} ms, others {REGULAR_TREE_TICK * 1000:.0f} ms')
+    print('{0:>14} {1:>12} {2:>9} {3:>9} {4:>9} {5:>9}'.format('scheduler', 'trees', 'ticks',
+                                                              'p50 ms', 'p95 ms', 'p99 ms'))
+    for scheduler_klass in [GlobalLockScheduler, TreeExecutorScheduler]:
+        latencies = run(scheduler_klass())
+        for title, tree_names in [('busy', [BUSY_TREE]), ('regular', [t for t in latencies if t != BUSY_TREE])]:
+            values = [value for tree_name in tree_names for value in latencies[tree_name]]
+            print('{0:>14} {1:>12} {2:>9} {3:>9.1f} {4:>9.1f} {5:>9.1f}'.format(
+                scheduler_klass.title, title, len(values),
+                percentile(values, 0.50) * 1000, percentile(values, 0.95) * 1000, percentile(values, 0.99) * 1000))
@@ -0,0 +1,109 @@
+"""
+Benchmark measures memory footprint of the MultiLevelTree per node:
+ - legacy: every node has an instance __dict__ and every leaf holds a full Job document and its own children dict
+ - compact: nodes declare __slots__, and finished leaf job records are frozen into the parent's LeafBlock
+
+Usage from the project root:
+    python -m scripts.benchmark_tree_memory
+"""
+
+__author__ = 'Bohdan Mushkevych'
+
+import gc
+import tracemalloc
+from unittest import mock
+
+from settings import enable_test_mode
+enable_test_mode()
+
+from constants import PROCESS_SITE_YEARLY, PROCESS_SITE_MONTHLY, PROCESS_SITE_DAILY, PROCESS_SITE_HOURLY
+from synergy.conf import settings
+from synergy.db.model import job
+from synergy.db.model.job import Job
+from synergy.scheduler import tree as tree_module
+from synergy.scheduler.tree import MultiLevelTree
+from synergy.scheduler.tree_node import TreeNode, LEAF_CHILDREN
+from synergy.system import time_helper
+from synergy.system.immutable_dict import ImmutableDict
+from synergy.system.time_qualifier import QUALIFIER_HOURLY
+
+YEARS = [1, 5]
+
+
+class BenchmarkTimetable(object):
+    """ minimal stand-in for the Timetable: all job records are assigned by the benchmark itself """
+
+    def assign_job_record(self, tree_node):
+        raise AssertionError(f'{tree_node} has no job record')
+
+    def assign_job_records(self, tree_nodes):
+        if tree_nodes:
+            raise AssertionError(f'{len(tree_nodes)} nodes have no job record')
+
+
+class LegacyTreeNode(TreeNode):
+    """ TreeNode with an instance __dict__ and a private children dict per leaf, as it was prior to __slots__ """
+
+    def __init__(self, tree, parent, process_name, timeperiod, job_record):
+        super(LegacyTreeNode, self).__init__(tree, parent, process_name, timeperiod, job_record)
+        if self.children is LEAF_CHILDREN:
+            self.children = ImmutableDict({})
+
+
+def object_id(counter):
+    return '5e2b7a1c9d4f{0:012x}'.format(counter)
+
+
+def build_tree(process_names, years, compact):
+    actual_timeperiod = time_helper.actual_timeperiod(QUALIFIER_HOURLY)
+    settings.settings['synergy_start_timeperiod'] = \
+        time_helper.increment_timeperiod(QUALIFIER_HOURLY, actual_timeperiod, delta=-years * 365 * 24)
+
+    tree = MultiLevelTree(process_names=process_names, timetable=BenchmarkTimetable(), tree_name='benchmark')
+    tree.build_tree()
+    for counter, ((process_name, timeperiod), node) in enumerate(tree.nodes.items()):
+        node.job_record = Job(db_id=object_id(counter),
+                              process_name=process_name,
+                              timeperiod=timeperiod,
+                              related_unit_of_work=object_id(counter + 1),
+                              state=job.STATE_PROCESSED)
+
+    if compact:
+        tree.validate()
+    tree.dirty_nodes.clear()
+    return tree
+
+
+def measure(process_names, years, compact):
+    """ :return: tuple (number of nodes, bytes per node) """
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+
+    if compact:
+        tree = build_tree(process_names, years, compact)
+    else:
+        with mock.patch.object(tree_module, 'TreeNode', LegacyTreeNode):
+            tree = build_tree(process_names, years, compact)
+
+    gc.collect()
+    footprint = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return len(tree.nodes), footprint / len(tree.nodes)
+
+
+def run_benchmark(title, process_names):
+    print(f'\n{title}')
+    print('{0:>6} {1:>10} {2:>15} {3:>16} {4:>9}'.format('years', 'nodes', 'legacy B/node', 'compact B/node',
+                                                         'ratio'))
+    for years in YEARS:
+        number_of_nodes, legacy = measure(process_names, years, compact=False)
+        _, compact = measure(process_names, years, compact=True)
+        print('{0:>6} {1:>10,} {2:>15,.0f} {3:>16,.0f} {4:>8.1f}x'.format(years, number_of_nodes,
+                                                                         legacy, compact, legacy / compact))
+
+
+if __name__ == '__main__':
+    run_benchmark('4-level tree: yearly->monthly->daily->hourly',
+                  [PROCESS_SITE_YEARLY, PROCESS_SITE_MONTHLY, PROCESS_SITE_DAILY, PROCESS_SITE_HOURLY])
+    run_benchmark('linear tree: hourly', [PROCESS_SITE_HOURLY])
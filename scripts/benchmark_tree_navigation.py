@@ -0,0 +1,115 @@
+"""
+Benchmark compares MultiLevelTree.get_next_node against the legacy implementation,
+that re-sorted children of every visited node on every call and re-scanned them from the first child.
+
+Usage from the project root:
+    python -m scripts.benchmark_tree_navigation
+"""
+
+__author__ = 'Bohdan Mushkevych'
+
+import timeit
+
+from settings import enable_test_mode
+enable_test_mode()
+
+from constants import PROCESS_SITE_YEARLY, PROCESS_SITE_MONTHLY, PROCESS_SITE_DAILY, PROCESS_SITE_HOURLY
+from synergy.conf import settings
+from synergy.db.model import job
+from synergy.db.model.job import Job
+from synergy.scheduler.tree import MultiLevelTree
+from synergy.system import time_helper
+from synergy.system.time_qualifier import QUALIFIER_HOURLY
+
+YEARS = [1, 5, 10]
+NUMBER_OF_CALLS = 20
+HOURS_IN_PROGRESS = 24
+
+
+class BenchmarkTimetable(object):
+    """ minimal stand-in for the Timetable: creates job records in memory, rather than in the DB """
+
+    def assign_job_record(self, tree_node):
+        tree_node.job_record = Job(process_name=tree_node.process_name,
+                                   timeperiod=tree_node.timeperiod,
+                                   state=job.STATE_EMBRYO)
+
+
+class LegacyMultiLevelTree(MultiLevelTree):
+    """ MultiLevelTree with the navigation methods as they were prior to the SortedDict and frontier cursors """
+
+    def _get_next_parent_node(self, parent):
+        grandparent = parent.parent
+        if grandparent is None:
+            return None
+
+        parent_siblings = list(grandparent.children)
+        sorted_keys = sorted(parent_siblings)
+        index = sorted_keys.index(parent.timeperiod)
+        if index + 1 >= len(sorted_keys):
+            return None
+        else:
+            return grandparent.children[sorted_keys[index + 1]]
+
+    def _get_next_child_node(self, parent, process_name):
+        children_keys = list(parent.children)
+        sorted_keys = sorted(children_keys)
+        for key in sorted_keys:
+            node = parent.children[key]
+            if node.job_record is None:
+                self.timetable.assign_job_record(node)
+                return node
+            elif self.should_skip_tree_node(node):
+                continue
+            elif node.job_record.is_active:
+                return node
+
+        new_parent = self._get_next_parent_node(parent)
+        if new_parent is not None:
+            return self._get_next_child_node(new_parent, process_name)
+        else:
+            process_name = parent.children[sorted_keys[0]].process_name
+            time_qualifier = parent.children[sorted_keys[0]].time_qualifier
+            actual_timeperiod = time_helper.actual_timeperiod(time_qualifier)
+            return self.get_node(process_name, actual_timeperiod)
+
+
+def build_tree(tree_klass, process_names, years):
+    actual_timeperiod = time_helper.actual_timeperiod(QUALIFIER_HOURLY)
+    settings.settings['synergy_start_timeperiod'] = \
+        time_helper.increment_timeperiod(QUALIFIER_HOURLY, actual_timeperiod, delta=-years * 365 * 24)
+
+    tree = tree_klass(process_names=process_names, timetable=BenchmarkTimetable(), tree_name='benchmark')
+    tree.build_tree()
+
+    # all nodes but the most recent hours are processed
+    in_progress_since = time_helper.increment_timeperiod(QUALIFIER_HOURLY, actual_timeperiod,
+                                                         delta=-HOURS_IN_PROGRESS)
+    for (process_name, timeperiod), node in tree.nodes.items():
+        is_recent = time_helper.cast_to_time_qualifier(QUALIFIER_HOURLY, timeperiod) >= in_progress_since
+        node.job_record = Job(process_name=process_name,
+                              timeperiod=timeperiod,
+                              state=job.STATE_IN_PROGRESS if is_recent else job.STATE_PROCESSED)
+    return tree
+
+
+def run_benchmark(title, process_names):
+    print(f'\n{title}')
+    print('{0:>6} {1:>10} {2:>14} {3:>15} {4:>9}'.format('years', 'nodes', 'legacy ms/call', 'current ms/call',
+                                                        'speedup'))
+    for years in YEARS:
+        timings = []
+        for tree_klass in [LegacyMultiLevelTree, MultiLevelTree]:
+            tree = build_tree(tree_klass, process_names, years)
+            seconds = timeit.timeit(lambda: tree.get_next_node(PROCESS_SITE_HOURLY), number=NUMBER_OF_CALLS)
+            timings.append(seconds * 1000 / NUMBER_OF_CALLS)
+
+        print('{0:>6} {1:>10,} {2:>14.3f} {3:>15.3f} {4:>8.1f}x'.format(years, len(tree.nodes),
+                                                                        timings[0], timings[1],
+                                                                        timings[0] / timings[1]))
+
+
+if __name__ == '__main__':
+    run_benchmark('4-level tree: yearly->monthly->daily->hourly',
+                  [PROCESS_SITE_YEARLY, PROCESS_SITE_MONTHLY, PROCESS_SITE_DAILY, PROCESS_SITE_HOURLY])
+    run_benchmark('linear tree: hourly', [PROCESS_SITE_HOURLY])
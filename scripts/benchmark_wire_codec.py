@@ -0,0 +1,54 @@
+"""
+Benchmark measures the encode+decode cost and the bytes per message of the MqTransmission documents:
+json wire format (as published prior to the binary one) against the binary wire format.
+
+Usage from the project root:
+    python -m scripts.benchmark_wire_codec
+"""
+
+__author__ = 'Bohdan Mushkevych'
+
+import timeit
+
+from settings import enable_test_mode
+enable_test_mode()
+
+from constants import PROCESS_SITE_HOURLY, PROCESS_ALERT_DAILY
+from synergy.db.model.mq_transmission import MqTransmission
+from synergy.mq import wire_codec
+from synergy.mq.wire_codec import WIRE_FORMAT_JSON, WIRE_FORMAT_BINARY
+
+NUMBER_OF_ITERATIONS = 100000
+RECORD_DB_ID = '5e2b7a1c9d4f3a0012000001'
+
+MESSAGES = {
+    'managed uow': MqTransmission(process_name=PROCESS_SITE_HOURLY, record_db_id=RECORD_DB_ID).document,
+    'freerun uow': MqTransmission(process_name=PROCESS_ALERT_DAILY, entry_name='daily_digest',
+                                  record_db_id=RECORD_DB_ID).document,
+}
+
+
+def round_trip(message_data, wire_format):
+    body, content_type = wire_codec.encode(message_data, wire_format)
+    if isinstance(body, str):
+        # as amqp.Message does for the unicode bodies
+        body = body.encode('utf-8')
+    return wire_codec.decode(body, content_type)
+
+
+def run(message_name, wire_format):
+    message_data = MESSAGES[message_name]
+    assert round_trip(message_data, wire_format) == message_data
+
+    body, _ = wire_codec.encode(message_data, wire_format)
+    number_of_bytes = len(body.encode('utf-8') if isinstance(body, str) else body)
+    elapsed = min(timeit.repeat(lambda: round_trip(message_data, wire_format), number=NUMBER_OF_ITERATIONS, repeat=7))
+    print(f'{message_name:>12}, {wire_format:>6}: encode+decode {elapsed / NUMBER_OF_ITERATIONS * 1e6:6.2f} us; '
+          f'{number_of_bytes:>4} bytes per message')
+
+
+if __name__ == '__main__':
+    print(f'{NUMBER_OF_ITERATIONS} iterations, best of 7')
+    for message_name in MESSAGES:
+        run(message_name, WIRE_FORMAT_JSON)
+        run(message_name, WIRE_FORMAT_BINARY)
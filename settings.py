@@ -45,6 +45,7 @@ testable_modules = [
 test_cases = [
     'tests.test_tree_node',
     'tests.test_multi_level_tree',
+    'tests.test_timetable',
     'tests.test_process_hierarchy',
     'tests.test_abstract_state_machine',
     'tests.test_state_machine_recomputing',
@@ -58,6 +59,18 @@ test_cases = [
     'tests.test_system_utils',
     'tests.test_time_helper',
     'tests.test_timeperiod_dict',
+    'tests.test_sorted_dict',
+    'tests.test_leaf_block',
+    'tests.test_event_log_store',
+    'tests.test_serial_executor',
+    'tests.test_timer_dispatcher',
+    'tests.test_admission_control',
+    'tests.test_mq_transmitter',
+    'tests.test_flopsy_consumer',
+    'tests.test_mq_outbox',
+    'tests.test_wire_codec',
+    'tests.test_job_dao',
+    'tests.test_uow_status_listener',
     'tests.test_process_starter',
     'tests.test_log_recording_handler',
     'tests.test_site_hourly_aggregator',
@@ -5,12 +5,53 @@ settings = dict(
     mq_auto_delete=False,
     mq_delivery_mode=2,
     mq_no_ack=False,
+    mq_max_priority=0,                # number of priority levels of the worker queues; 0 declares queues without
+                                      # the x-max-priority argument and turns off the live/backfill lanes.
+                                      # NOTICE: existing queues have to be deleted before the value is changed
+    mq_live_lane_periods=2,           # number of the most recent timeperiods, whose units of work take the live lane
+    mq_prefetch_count=0,              # number of unacknowledged messages the broker delivers to a consumer ahead;
+                                      # 0 leaves the window to the broker default
+    mq_batch_timeout_sec=0.1,         # number of seconds the batch consumer waits for the next message,
+                                      # before handing over the incomplete batch
+    mq_deferred_ack_interval_sec=0.1, # number of seconds the consumer waits for the next message, before sending
+                                      # the acknowledgements of the messages processed outside of the consumer thread
+    mq_connections_per_process=2,     # number of long-lived AMQP connections shared by the publishers of a process
+    mq_pool_size=4,                   # maximum number of idle publishers (channels) kept per queue name
+    mq_pool_prewarm=1,                # number of publishers opened per managed process at the Scheduler start
+    mq_confirm_window=0,              # number of messages a publisher keeps in flight unconfirmed by the broker;
+                                      # 0 turns the publisher confirms off
+    mq_confirm_timeout_sec=5.0,       # number of seconds a publisher waits for the broker confirms,
+                                      # before reporting the outstanding messages as unconfirmed
+    mq_wire_format='json',            # encoding of the published messages: 'json' or 'binary'. consumers read both;
+                                      # switch to 'binary' once all workers are upgraded to understand it
+    mq_outbox_max_size_mb=0,          # maximum size of the on-disk outbox, that keeps the messages failed to publish
+                                      # until the broker is back. 0 turns the outbox off
+    mq_outbox_segment_size_mb=4,      # size of the outbox segment file, at which the next segment is started
+    mq_outbox_fsync_batch_size=32,    # number of outbox messages written to the disk with a single fsync;
+                                      # also the number of messages drained between two cursor updates
+    mq_outbox_drain_interval_sec=5,   # number of seconds between the attempts to drain the outbox
+    mq_queue_high_water_mark=0,       # number of messages in the worker queue, at which the Scheduler and the GC
+                                      # hold back new units of work for the process. 0 disables the admission control
+    mq_queue_low_water_mark=0,        # number of messages in the worker queue, at which the held back process resumes
+    mq_queue_depth_cache_seconds=5,   # number of seconds the queue depth is cached for, before the broker is re-probed
 
     gc_run_interval=60,          # number of seconds between GarbageCollector runs
     gc_life_support_hours=48,    # number of hours from UOW creation time to keep UOW re-posting to MQ
     gc_resubmit_after_hours=1,   # number of hours, GC waits for the worker to pick up the UOW from MQ before re-posting
     gc_release_lag_minutes=15,   # number of minutes, GC keeps the UOW in the queue before posting it into MQ
 
+    timetable_hot_window_days=None,   # number of days of the most recent history the Timetable loads eagerly;
+                                      # older nodes are faulted in on demand. None loads the whole history
+    timetable_cold_ttl_minutes=60,    # number of minutes a faulted-in finished subtree is kept in memory
+    timetable_load_batch_size=5000,   # number of job documents fetched per DB round-trip during the Timetable load
+
+    event_log_batch_size=64,          # number of job events accumulated in memory before they are written to the DB
+    event_log_capped_size_mb=64,      # size of the capped job_event_log collection; oldest events are overwritten
+
+    tick_phase_offset=True,           # spread the ticks of the *every NNN* timers across the interval
+                                      # by an offset derived from the process name
+    tick_jitter_seconds=0.0,          # upper boundary of the random delay added to every *every NNN* tick
+
     mx_host='0.0.0.0',           # management extension host (0.0.0.0 opens all interfaces)
     mx_port=5000,                # management extension port
     mx_title='Synergy Scheduler',   # name of the Scheduler, displayed in the top left corner of the UI
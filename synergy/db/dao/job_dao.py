@@ -3,8 +3,11 @@ __author__ = 'Bohdan Mushkevych'
 from threading import RLock
 
 from bson import ObjectId
+from pymongo import ASCENDING, ReplaceOne
+from pymongo.errors import BulkWriteError
 
 from synergy.conf import context
+from synergy.db.error import DUPLICATE_KEY_ERROR_CODE
 from synergy.db.manager import ds_manager
 from synergy.db.model import job
 from synergy.db.model.job import Job
@@ -13,6 +16,8 @@ from synergy.scheduler.scheduler_constants import COLLECTION_JOB_HOURLY, COLLECT
 from synergy.system.decorator import thread_safe
 from synergy.system.time_qualifier import *
 
+# legacy job documents may still carry the event_log, that is now kept by the job_event_log collection
+JOB_PROJECTION = {'event_log': False}
 
 QUERY_GET_LIKE_TIMEPERIOD = lambda timeperiod, include_running, include_processed, include_noop, include_failed: {
     job.TIMEPERIOD: {'$gte': timeperiod},
@@ -34,6 +39,9 @@ class JobDao(object):
         self.lock = RLock()
         self.ds = ds_manager.ds_factory(logger)
 
+        # job collections known to carry the timeperiod index
+        self.indexed_collections = set()
+
     @thread_safe
     def _get_job_collection_name(self, process_name):
         """jobs are stored in 4 collections: hourly, daily, monthly and yearly;
@@ -52,6 +60,11 @@ class JobDao(object):
             raise ValueError(f'Unknown time qualifier: {qualifier} for {process_name}')
         return collection_name
 
+    def get_collection_name(self, process_name):
+        """ :return: name of the job collection, that keeps job records of the given process.
+            job records of the processes sharing the collection are resolved and inserted in bulk per collection """
+        return self._get_job_collection_name(process_name)
+
     @thread_safe
     def get_by_id(self, process_name, db_id):
         """ method finds a single job record and returns it to the caller"""
@@ -88,6 +101,96 @@ class JobDao(object):
             raise LookupError(f'MongoDB has no job records in collection {collection_name} since {since}')
         return [Job.from_json(document) for document in cursor]
 
+    @thread_safe
+    def get_range(self, process_name, start_timeperiod, end_timeperiod):
+        """ method returns job records of the given process within [start_timeperiod : end_timeperiod] boundaries """
+        collection_name = self._get_job_collection_name(process_name)
+        query = {job.PROCESS_NAME: process_name,
+                 job.TIMEPERIOD: {'$gte': start_timeperiod, '$lte': end_timeperiod}}
+        cursor = self.ds.filter(collection_name, query)
+        return [Job.from_json(document) for document in cursor]
+
+    @thread_safe
+    def get_many(self, collection_name, keys):
+        """ method resolves job records identified by the list of (process_name, timeperiod) keys
+            with a single query to the collection
+            :return: list of found job records """
+        if not keys:
+            return []
+        process_names = sorted({process_name for process_name, _ in keys})
+        timeperiods = sorted({timeperiod for _, timeperiod in keys})
+        query = {job.PROCESS_NAME: {'$in': process_names},
+                 job.TIMEPERIOD: {'$in': timeperiods}}
+        cursor = self.ds.filter(collection_name, query)
+
+        # $in on both fields matches a superset of the keys, should several processes share the collection
+        keys = set(keys)
+        job_records = [Job.from_json(document) for document in cursor]
+        return [job_record for job_record in job_records
+                if (job_record.process_name, job_record.timeperiod) in keys]
+
+    @thread_safe
+    def insert_many(self, collection_name, instances):
+        """ method inserts job records with a single unordered bulk write
+            and assigns their db_id on success
+            :return: list of job records that were not inserted, since such records already exist """
+        if not instances:
+            return []
+        documents = [instance.document for instance in instances]
+        collection = self.ds.connection(collection_name)
+
+        duplicate_indexes = set()
+        try:
+            collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            write_errors = e.details.get('writeErrors', [])
+            duplicate_indexes = {error['index'] for error in write_errors if error['code'] == DUPLICATE_KEY_ERROR_CODE}
+            if len(duplicate_indexes) != len(write_errors) or e.details.get('writeConcernErrors'):
+                raise
+
+        for index, (instance, document) in enumerate(zip(instances, documents)):
+            if index not in duplicate_indexes:
+                # pymongo assigns _id to the inserted documents
+                instance.db_id = document['_id']
+        return [instances[index] for index in sorted(duplicate_indexes)]
+
+    @thread_safe
+    def update_many(self, instances):
+        """ method replaces the job records of a single process with one unordered bulk write """
+        if not instances:
+            return
+        collection_name = self._get_job_collection_name(instances[0].process_name)
+        operations = []
+        for instance in instances:
+            assert isinstance(instance, Job) and instance.db_id
+            document = instance.document
+            document['_id'] = ObjectId(document['_id'])
+            operations.append(ReplaceOne({'_id': document['_id']}, document))
+
+        collection = self.ds.connection(collection_name)
+        collection.bulk_write(operations, ordered=False)
+
+    @thread_safe
+    def ensure_timeperiod_index(self, collection_name):
+        """ creates the timeperiod index of the job collection, unless it exists.
+            deployments predating the timeperiod-ordered load of the Timetable have no such index,
+            and would otherwise sort the whole collection in memory """
+        if collection_name in self.indexed_collections:
+            return
+        collection = self.ds.connection(collection_name)
+        collection.create_index([(job.TIMEPERIOD, ASCENDING)])
+        self.indexed_collections.add(collection_name)
+
+    @thread_safe
+    def stream(self, collection_name, query, batch_size):
+        """ :return: generator of job records matching the query, in the timeperiod order.
+            documents are fetched from the DB in batches of <batch_size>, rather than materialized in a list """
+        self.ensure_timeperiod_index(collection_name)
+        collection = self.ds.connection(collection_name)
+        cursor = collection.find(query, projection=JOB_PROJECTION, batch_size=batch_size)
+        cursor = cursor.sort(job.TIMEPERIOD, ASCENDING)
+        return (Job.from_json(document) for document in cursor)
+
     @thread_safe
     def run_query(self, collection_name, query):
         """ method runs query on a specified collection and return a list of filtered Job records """
@@ -0,0 +1,58 @@
+__author__ = 'Bohdan Mushkevych'
+
+import pymongo
+from pymongo.errors import CollectionInvalid
+
+from synergy.conf import settings
+from synergy.db.dao.base_dao import BaseDao
+from synergy.db.model.job import EVENT_LOG_MAX_SIZE
+from synergy.db.model.job_event import JobEvent, JOB_ID
+from synergy.system.decorator import thread_safe
+from synergy.scheduler.scheduler_constants import COLLECTION_JOB_EVENT_LOG
+
+
+class JobEventDao(BaseDao):
+    """ Thread-safe Data Access Object for job events stored in the capped job_event_log table/collection """
+
+    def __init__(self, logger):
+        super(JobEventDao, self).__init__(logger=logger,
+                                          collection_name=COLLECTION_JOB_EVENT_LOG,
+                                          model_class=JobEvent)
+
+        # the first insert into a missing collection would create a regular, not capped, one
+        self.is_collection_ensured = False
+
+    @thread_safe
+    def ensure_collection(self):
+        """ creates the capped job_event_log collection along with its job_id index, should the collection be missing.
+            NOTICE: collection left not capped by the older deployments is reported, and has to be converted manually:
+            db.runCommand({convertToCapped: 'job_event_log', size: <event_log_capped_size_mb * 1024 * 1024>}) """
+        collection = self.ds.connection(self.collection_name)
+        if self.collection_name not in collection.database.list_collection_names():
+            capped_size = settings.settings['event_log_capped_size_mb'] * 1024 * 1024
+            try:
+                collection.database.create_collection(self.collection_name, capped=True, size=capped_size)
+            except CollectionInvalid:
+                # collection was created by another process in the meantime
+                pass
+        elif not collection.options().get('capped'):
+            self.logger.warning(f'Collection {self.collection_name} is not capped, and grows without bounds. '
+                                f'Convert it with the convertToCapped command.')
+
+        collection.create_index([(JOB_ID, pymongo.ASCENDING)])
+        self.is_collection_ensured = True
+
+    @thread_safe
+    def insert_many(self, instances):
+        """ inserts a batch of job events in a single round-trip """
+        if not self.is_collection_ensured:
+            self.ensure_collection()
+        collection = self.ds.connection(self.collection_name)
+        collection.insert_many([instance.document for instance in instances], ordered=False)
+
+    @thread_safe
+    def get_events(self, job_id, limit=EVENT_LOG_MAX_SIZE):
+        """ :return: list of up to <limit> most recent job events, newest first """
+        collection = self.ds.connection(self.collection_name)
+        cursor = collection.find({JOB_ID: job_id}).sort('_id', pymongo.DESCENDING).limit(limit)
+        return [JobEvent.from_json(document) for document in cursor]
@@ -4,10 +4,10 @@ from threading import RLock
 
 from bson.objectid import ObjectId
 from pymongo import ASCENDING
-from pymongo.errors import DuplicateKeyError as MongoDuplicateKeyError
+from pymongo.errors import BulkWriteError, DuplicateKeyError as MongoDuplicateKeyError
 
 from synergy.conf import context
-from synergy.db.error import DuplicateKeyError
+from synergy.db.error import DuplicateKeyError, DUPLICATE_KEY_ERROR_CODE
 from synergy.db.manager import ds_manager
 from synergy.db.model import unit_of_work
 from synergy.db.model.unit_of_work import UnitOfWork
@@ -138,6 +138,30 @@ class UnitOfWorkDao(object):
                                     e)
             raise exc
 
+    @thread_safe
+    def insert_many(self, instances):
+        """ inserts units of work with a single unordered bulk write and assigns their db_id on success
+        :return: list of units of work that were not inserted, since such records already exist """
+        if not instances:
+            return []
+        documents = [instance.document for instance in instances]
+        collection = self.ds.connection(COLLECTION_UNIT_OF_WORK)
+
+        duplicate_indexes = set()
+        try:
+            collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            write_errors = e.details.get('writeErrors', [])
+            duplicate_indexes = {error['index'] for error in write_errors if error['code'] == DUPLICATE_KEY_ERROR_CODE}
+            if len(duplicate_indexes) != len(write_errors) or e.details.get('writeConcernErrors'):
+                raise
+
+        for index, (instance, document) in enumerate(zip(instances, documents)):
+            if index not in duplicate_indexes:
+                # pymongo assigns _id to the inserted documents
+                instance.db_id = document['_id']
+        return [instances[index] for index in sorted(duplicate_indexes)]
+
     @thread_safe
     def remove(self, uow_id):
         collection = self.ds.connection(COLLECTION_UNIT_OF_WORK)
@@ -1,5 +1,8 @@
 __author__ = 'Bohdan Mushkevych'
 
+# MongoDB error code of the unique index violation
+DUPLICATE_KEY_ERROR_CODE = 11000
+
 
 class DuplicateKeyError(Exception):
     def __init__(self, process_name, timeperiod, start_id, end_id, *args, **kwargs):
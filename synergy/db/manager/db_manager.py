@@ -8,6 +8,8 @@ from synergy.db.model.unit_of_work import TIMEPERIOD, START_ID, END_ID
 from synergy.db.model.log_recording import PARENT_OBJECT_ID, CREATED_AT
 
 from synergy.db.dao.managed_process_dao import ManagedProcessDao
+from synergy.db.dao.job_event_dao import JobEventDao
+from synergy.db.dao.job_dao import JobDao
 
 from synergy.conf import context, settings
 from synergy.scheduler.scheduler_constants import *
@@ -85,10 +87,16 @@ def reset_db():
     ttl_seconds = settings.settings['db_log_ttl_days'] * 86400     # number of seconds for TTL
     connection.create_index(CREATED_AT, expireAfterSeconds=ttl_seconds)
 
+    # capped collection: MongoDB overwrites the oldest job events once the collection reaches its size
+    JobEventDao(logger).ensure_collection()
+
+    job_dao = JobDao(logger)
     for collection_name in [COLLECTION_JOB_HOURLY, COLLECTION_JOB_DAILY,
                             COLLECTION_JOB_MONTHLY, COLLECTION_JOB_YEARLY]:
         connection = ds.connection(collection_name)
         connection.create_index([(PROCESS_NAME, pymongo.ASCENDING), (TIMEPERIOD, pymongo.ASCENDING)], unique=True)
+        # Timetable loads job records in the timeperiod order
+        job_dao.ensure_timeperiod_index(collection_name)
 
     # reset Synergy Flow tables
     db_manager.reset_db()
@@ -1,9 +1,9 @@
 __author__ = 'Bohdan Mushkevych'
 
 from odm.document import BaseDocument
-from odm.fields import StringField, ObjectIdField, ListField, IntegerField
+from odm.fields import StringField, ObjectIdField, IntegerField
 
-# number of job events to be stored in Job.event_log, such as emission of the UOW
+# number of the most recent job events, such as emission of the UOW, presented by the job's event log
 EVENT_LOG_MAX_SIZE = 128
 
 # given Job was _not_ processed by aggregator because of multiple errors/missing data
@@ -42,8 +42,6 @@ class Job(BaseDocument):
     state = StringField(choices=[STATE_IN_PROGRESS, STATE_PROCESSED, STATE_FINAL_RUN,
                                  STATE_EMBRYO, STATE_SKIPPED, STATE_NOOP])
     related_unit_of_work = ObjectIdField()
-
-    event_log = ListField()
     number_of_failures = IntegerField(default=0)
 
     @classmethod
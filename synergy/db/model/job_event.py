@@ -0,0 +1,23 @@
+__author__ = 'Bohdan Mushkevych'
+
+from odm.document import BaseDocument
+from odm.fields import StringField, ObjectIdField, DateTimeField
+
+
+class JobEvent(BaseDocument):
+    """ Persistent model: single entry of the job's event log, such as emission of the UOW
+        Job events are append-only and are stored in the capped collection, separately from the job records """
+    db_id = ObjectIdField(name='_id', null=True)
+    job_id = ObjectIdField()
+    process_name = StringField()
+    timeperiod = StringField()
+    created_at = DateTimeField()
+    message = StringField()
+
+    @classmethod
+    def key_fields(cls):
+        return cls.job_id.name
+
+
+JOB_ID = JobEvent.job_id.name
+CREATED_AT = JobEvent.created_at.name
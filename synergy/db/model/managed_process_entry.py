@@ -19,6 +19,12 @@ class ManagedProcessEntry(DaemonProcessEntry):
     state_machine_name = StringField()
     blocking_type = StringField(choices=[BLOCKING_CHILDREN, BLOCKING_DEPENDENCIES, BLOCKING_NORMAL])
 
+    # maximum number of backlogged job records processed in bulk by a single tick; 1 disables the bulk catch-up
+    max_catchup_batch = IntegerField(default=1)
+
+    # maximum number of job records of a BLOCKING_NORMAL process processed concurrently; 1 means one at a time
+    max_in_flight = IntegerField(default=1)
+
     @classmethod
     def key_fields(cls):
         return cls.process_name.name
@@ -35,6 +41,8 @@ def managed_context_entry(process_name,
                           blocking_type=BLOCKING_NORMAL,
                           present_on_boxes=None,
                           time_grouping=1,
+                          max_catchup_batch=1,
+                          max_in_flight=1,
                           arguments=None,
                           queue=None,
                           routing=None,
@@ -66,6 +74,8 @@ def managed_context_entry(process_name,
         arguments=arguments if arguments is not None else dict(),
         time_qualifier=time_qualifier,
         time_grouping=time_grouping,
+        max_catchup_batch=max_catchup_batch,
+        max_in_flight=max_in_flight,
         log_filename=log_file if log_file is not None else token + time_qualifier + '.log',
         pid_filename=pid_file if pid_file is not None else token + time_qualifier + '.pid')
     return process_entry
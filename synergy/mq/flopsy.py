@@ -1,12 +1,16 @@
-import json
+import itertools
+import queue
+import socket
+import time
 import uuid
-from collections import deque
+from collections import deque, OrderedDict
 from threading import Lock
 
 import amqp
 import sys
 
 from synergy.conf import settings, context
+from synergy.mq import wire_codec
 from synergy.system.decorator import thread_safe
 
 
@@ -39,11 +43,18 @@ class Connection(object):
         self.port = port
         self.connection = None
 
+        # serializes the frames written by the channels that share the connection
+        self.lock = Lock()
+
         self.connect()
 
     def __del__(self):
         self.close()
 
+    @property
+    def is_alive(self):
+        return self.connection is not None and self.connection.connected
+
     def connect(self):
         self.connection = amqp.Connection(
             host='{0}:{1}'.format(self.db_host, self.port),
@@ -58,28 +69,99 @@ class Connection(object):
             self.connection.close()
 
 
+class ConnectionManager(object):
+    """ keeps up to *size* long-lived AMQP connections per process, and hands them out round-robin.
+        publishers open their lightweight channels over the shared connections,
+        rather than paying for a TCP socket and an AMQP handshake each """
+
+    def __init__(self, size=settings.settings['mq_connections_per_process']):
+        self.size = size
+        self.connections = []
+        self.sequence = itertools.count()
+        self.lock = Lock()
+
+    def __del__(self):
+        self.close()
+
+    @thread_safe
+    def get(self):
+        """ :return: live :mq::flopsy::Connection instance. broken connections are replaced """
+        for connection in [connection for connection in self.connections if not connection.is_alive]:
+            self.connections.remove(connection)
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+        if len(self.connections) < self.size:
+            self.connections.append(Connection())
+            return self.connections[-1]
+        return self.connections[next(self.sequence) % len(self.connections)]
+
+    @property
+    def number_of_connections(self):
+        return len(self.connections)
+
+    @thread_safe
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        self.connections = []
+
+
+_connection_manager = ConnectionManager()
+
+
+def get_connection_manager():
+    """ :return: ConnectionManager instance shared by the publishers of the process """
+    return _connection_manager
+
+
 class Consumer(SynergyAware):
+    """ consumer hands the decoded messages over to the registered callback either one by one, see *register*,
+        or in batches, see *register_batch* """
+
     def __init__(self,
                  name,
                  durable=settings.settings['mq_durable'],
                  exclusive=settings.settings['mq_exclusive'],
                  auto_delete=settings.settings['mq_auto_delete'],
-                 connection=None):
+                 connection=None,
+                 prefetch_count=settings.settings['mq_prefetch_count']):
         super(Consumer, self).__init__(name)
         self.callback = None
         self.is_running = True
 
+        # batch mode: messages are accumulated, until there are *batch_size* of them
+        # or no message arrives within *batch_timeout* seconds
+        self.batch_callback = None
+        self.batch_size = 1
+        self.batch_timeout = None
+        self.batch = []
+
+        # delivery tags of the messages, whose processing is handed over to other threads. @see defer_acknowledgement
+        self.deferred_tags = set()
+        self.completed_tags = queue.Queue()
+
         self.durable = durable
         self.exclusive = exclusive
         self.auto_delete = auto_delete
         self.connection = connection or Connection()
         self.channel = self.connection.connection.channel()
 
+        # priority queue delivers messages of the live lane ahead of the backfill ones
+        arguments = None
+        if settings.settings['mq_max_priority']:
+            arguments = {'x-max-priority': settings.settings['mq_max_priority']}
         self.channel.queue_declare(
             queue=self.queue,
             durable=self.durable,
             exclusive=self.exclusive,
-            auto_delete=self.auto_delete
+            auto_delete=self.auto_delete,
+            arguments=arguments
         )
         self.channel.exchange_declare(
             exchange=self.exchange,
@@ -92,6 +174,8 @@ class Consumer(SynergyAware):
             exchange=self.exchange,
             routing_key=self.routing_key
         )
+        if prefetch_count:
+            self.channel.basic_qos(prefetch_size=0, prefetch_count=prefetch_count, a_global=False)
         self.channel.basic_consume(
             queue=self.queue,
             no_ack=settings.settings['mq_no_ack'],
@@ -113,20 +197,87 @@ class Consumer(SynergyAware):
 
     def wait(self, timeout=None):
         while self.is_running:
-            self.connection.connection.blocking_read(timeout=timeout)
+            self._acknowledge_completed()
+            if self.deferred_tags and not self.batch:
+                try:
+                    self.connection.connection.blocking_read(timeout=settings.settings['mq_deferred_ack_interval_sec'])
+                except socket.timeout:
+                    # no message has arrived. acknowledge the deliveries completed in the meantime
+                    pass
+                continue
+
+            if not self.batch:
+                self.connection.connection.blocking_read(timeout=timeout)
+                continue
 
-    def dispatch(self, message):
-        if isinstance(message.body, bytes):
-            message.body = message.body.decode('utf-8')
+            try:
+                self.connection.connection.blocking_read(timeout=self.batch_timeout)
+            except socket.timeout:
+                # no more messages are coming promptly. hand over the incomplete batch
+                self.flush_batch()
 
-        decoded = json.loads(message.body)
-        message.body = decoded['data']
-        if self.callback is not None:
+    def dispatch(self, message):
+        message.body = wire_codec.decode(message.body, message.properties.get('content_type'))
+        if self.batch_callback is not None:
+            self.batch.append(message)
+            if len(self.batch) >= self.batch_size:
+                self.flush_batch()
+        elif self.callback is not None:
             self.callback(message)
 
-    def acknowledge(self, tag):
+    def flush_batch(self):
+        """ hands the accumulated messages over to the batch callback.
+            messages returned by the callback are rejected and re-queued one by one;
+            the rest of the batch is acknowledged with a single *multiple* acknowledgement,
+            or one by one if the rejected messages are interleaved with them.
+            the whole batch is re-queued if the callback raises an exception """
+        batch, self.batch = self.batch, []
+        if not batch:
+            return
+
+        try:
+            failed = list(self.batch_callback(batch) or [])
+        except Exception:
+            failed = batch
+
+        for message in failed:
+            self.reject(message.delivery_tag)
+
+        failed_tags = {message.delivery_tag for message in failed}
+        succeeded_tags = sorted(message.delivery_tag for message in batch if message.delivery_tag not in failed_tags)
+        if not succeeded_tags:
+            return
+
+        if any(tag < succeeded_tags[-1] for tag in failed_tags):
+            # *multiple* acknowledgement would cover the rejected deliveries, which are already settled
+            for tag in succeeded_tags:
+                self.acknowledge(tag)
+        else:
+            self.acknowledge(succeeded_tags[-1], multiple=True)
+
+    def acknowledge(self, tag, multiple=False):
+        """ :param multiple: if True - acknowledges all outstanding deliveries up to and including the tag """
         if settings.settings['mq_no_ack'] is False:
-            self.channel.basic_ack(delivery_tag=tag)
+            self.channel.basic_ack(delivery_tag=tag, multiple=multiple)
+
+    def defer_acknowledgement(self, tag):
+        """ marks the delivery as processed outside of the consumer thread.
+            channel is not thread-safe, so the delivery is acknowledged by the consumer thread,
+            once the processing thread calls *acknowledge_deferred* """
+        self.deferred_tags.add(tag)
+
+    def acknowledge_deferred(self, tag):
+        """ thread-safe: queues the acknowledgement of the deferred delivery for the consumer thread """
+        self.completed_tags.put(tag)
+
+    def _acknowledge_completed(self):
+        while True:
+            try:
+                tag = self.completed_tags.get_nowait()
+            except queue.Empty:
+                return
+            self.deferred_tags.discard(tag)
+            self.acknowledge(tag)
 
     def reject(self, tag):
         if settings.settings['mq_no_ack'] is False:
@@ -140,36 +291,154 @@ class Consumer(SynergyAware):
         assert callable(callback)
         self.callback = callback
 
+    def register_batch(self, callback, batch_size, batch_timeout=settings.settings['mq_batch_timeout_sec']):
+        """ :param callback: function that receives a list of decoded messages
+             and returns the messages that failed to process, if any
+            :param batch_size: maximum number of messages in a batch. should not exceed the prefetch_count """
+        assert callable(callback)
+        assert batch_size >= 1
+        self.batch_callback = callback
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+
     def unregister(self):
         self.callback = None
+        self.batch_callback = None
 
 
 class Publisher(SynergyAware):
+    """ publisher owns its channel. connection is owned, and closed, only if it was not given by the caller.
+        with the *confirm_window* set, the channel is put into the confirm mode: up to *confirm_window* messages
+        are kept in flight, while the broker confirms are read as they arrive.
+        messages nacked by the broker, or not confirmed within the *confirm_timeout*, are reported by *pop_failed* """
+
     def __init__(self,
                  name,
                  connection=None,
                  delivery_mode=settings.settings['mq_delivery_mode'],
-                 parent_pool=None):
+                 parent_pool=None,
+                 confirm_window=settings.settings['mq_confirm_window'],
+                 confirm_timeout=settings.settings['mq_confirm_timeout_sec'],
+                 wire_format=settings.settings['mq_wire_format']):
         super(Publisher, self).__init__(name)
+        self.is_connection_owner = connection is None
         self.connection = connection or Connection()
-        self.channel = self.connection.connection.channel()
         self.delivery_mode = delivery_mode
         self.parent_pool = parent_pool
+        self.confirm_window = confirm_window
+        self.confirm_timeout = confirm_timeout
+        self.wire_format = wire_format
+
+        # delivery tag of the next published message, as counted by the broker in the confirm mode
+        self.next_delivery_tag = 1
+
+        # format: {delivery tag: (token, time.time() of the publishing)} of the published messages
+        # awaiting the broker confirm, in the publishing order
+        self.unconfirmed = OrderedDict()
+
+        # tokens of the messages nacked by the broker or not confirmed within the timeout
+        self.failed = list()
+
+        with self.connection.lock:
+            self.channel = self.connection.connection.channel()
+            if self.confirm_window:
+                self.channel.confirm_select()
+                self.channel.events['basic_ack'].add(self._on_ack)
+                self.channel.events['basic_nack'].add(self._on_nack)
 
     def __del__(self):
         self.release()
 
-    def publish(self, message_data):
-        encoded = json.dumps({'data': message_data})
-        message = amqp.Message(encoded)
+    def publish(self, message_data, priority=None, token=None):
+        """ :param priority: message priority; has effect only for queues declared with the x-max-priority
+            :param token: identifies the message in the *pop_failed* report; applicable in the confirm mode only
+            NOTICE: in the confirm mode, method blocks only while the *confirm_window* is full """
+        body, content_type = wire_codec.encode(message_data, self.wire_format)
+        message = amqp.Message(body, content_type=content_type)
         message.properties['delivery_mode'] = self.delivery_mode
-        self.channel.basic_publish(
-            message,
-            exchange=self.exchange,
-            routing_key=self.routing_key
-        )
+        if priority is not None:
+            message.properties['priority'] = priority
+        with self.connection.lock:
+            self.channel.basic_publish(
+                message,
+                exchange=self.exchange,
+                routing_key=self.routing_key
+            )
+            if self.confirm_window:
+                self.unconfirmed[self.next_delivery_tag] = (token, time.time())
+                self.next_delivery_tag += 1
+                self._read_confirms(0)
+                if len(self.unconfirmed) >= self.confirm_window:
+                    self._await_confirms(self.confirm_window - 1)
         return message
 
+    def wait_for_confirms(self):
+        """ blocks until all messages in flight are either confirmed, or reported as failed """
+        with self.connection.lock:
+            self._await_confirms(0)
+
+    def poll_confirms(self):
+        """ reads the broker confirms that have arrived, without blocking.
+            messages unconfirmed for longer than the *confirm_timeout* are moved to the failed ones """
+        if not self.unconfirmed:
+            return
+
+        with self.connection.lock:
+            self._read_confirms(0)
+            expired_at = time.time() - self.confirm_timeout
+            while self.unconfirmed and next(iter(self.unconfirmed.values()))[1] <= expired_at:
+                self.failed.append(self.unconfirmed.popitem(last=False)[1][0])
+
+    def pop_failed(self):
+        """ :return: list of tokens of the messages nacked by the broker, or not confirmed within the timeout """
+        failed, self.failed = self.failed, list()
+        return failed
+
+    def _read_confirms(self, timeout):
+        """ reads the confirms that arrive within the timeout. NOTICE: connection lock must be held by the caller """
+        try:
+            self.connection.connection.drain_events(timeout=timeout)
+        except socket.timeout:
+            pass
+
+    def _await_confirms(self, max_in_flight):
+        """ reads the confirms, until no more than *max_in_flight* messages remain unconfirmed.
+            messages unconfirmed after the *confirm_timeout* are moved to the failed ones.
+            NOTICE: connection lock must be held by the caller """
+        deadline = time.time() + self.confirm_timeout
+        while len(self.unconfirmed) > max_in_flight:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                self._fail_unconfirmed()
+                break
+            self._read_confirms(remaining)
+
+    def _fail_unconfirmed(self):
+        """ moves all messages in flight to the failed ones """
+        self.failed.extend(token for token, _ in self.unconfirmed.values())
+        self.unconfirmed.clear()
+
+    def _settle(self, delivery_tag, multiple):
+        """ :return: tokens of the messages settled by the broker confirm """
+        if not multiple:
+            return [self.unconfirmed.pop(delivery_tag)[0]] if delivery_tag in self.unconfirmed else []
+
+        settled = []
+        while self.unconfirmed and next(iter(self.unconfirmed)) <= delivery_tag:
+            settled.append(self.unconfirmed.popitem(last=False)[1][0])
+        return settled
+
+    def _on_ack(self, delivery_tag, multiple):
+        self._settle(delivery_tag, multiple)
+
+    def _on_nack(self, delivery_tag, multiple):
+        self.failed.extend(self._settle(delivery_tag, multiple))
+
+    @property
+    def is_healthy(self):
+        """ :return: True if both the channel and the underlying connection are open """
+        return self.channel.is_open and self.connection.is_alive
+
     def release(self):
         if hasattr(self, 'parent_pool') and self.parent_pool:
             self.parent_pool.put(self)
@@ -178,12 +447,20 @@ class Publisher(SynergyAware):
 
     def close(self):
         try:
-            self.channel.close()
+            # messages in flight can not be confirmed over the closed channel
+            self._fail_unconfirmed()
         except:
             pass
 
         try:
-            self.connection.close()
+            with self.connection.lock:
+                self.channel.close()
+        except:
+            pass
+
+        try:
+            if self.is_connection_owner:
+                self.connection.close()
         except:
             pass
 
@@ -194,26 +471,73 @@ class Publisher(SynergyAware):
 
 
 class _Pool(object):
-    def __init__(self, logger, name):
+    """ keeps up to *max_size* idle publishers of the given name; publishers are checked for health on checkout """
+
+    def __init__(self, logger, name, connection_manager=None, max_size=settings.settings['mq_pool_size']):
         self.publishers = deque()
         self.name = name
         self.logger = logger
+        self.connection_manager = connection_manager or get_connection_manager()
+        self.max_size = max_size
         self.lock = Lock()
 
+        # tokens of the unconfirmed messages of the discarded publishers
+        self.failed = list()
+
     def __del__(self):
         self.close()
 
+    def _create(self):
+        return Publisher(name=self.name, connection=self.connection_manager.get(), parent_pool=self)
+
+    def _discard(self, publisher):
+        publisher.close()
+        self.failed.extend(publisher.pop_failed())
+
     @thread_safe
     def get(self):
         """ :return valid :mq::flopsy::Publisher instance """
-        if len(self.publishers) == 0:
-            return Publisher(name=self.name, parent_pool=self)
-        else:
-            return self.publishers.pop()
+        while len(self.publishers) > 0:
+            publisher = self.publishers.pop()
+            if publisher.is_healthy:
+                return publisher
+            self.logger.warning(f'Discarded broken Flopsy Publisher {self.name}')
+            self._discard(publisher)
+        return self._create()
 
     @thread_safe
     def put(self, publisher):
-        self.publishers.append(publisher)
+        if len(self.publishers) >= self.max_size:
+            publisher.wait_for_confirms()
+            self._discard(publisher)
+        else:
+            self.publishers.append(publisher)
+
+    @thread_safe
+    def wait_for_confirms(self):
+        """ awaits the broker confirms of the idle publishers
+            :return: list of tokens of the messages nacked by the broker, or not confirmed within the timeout """
+        failed, self.failed = self.failed, list()
+        for publisher in self.publishers:
+            publisher.wait_for_confirms()
+            failed.extend(publisher.pop_failed())
+        return failed
+
+    @thread_safe
+    def poll_confirms(self):
+        """ reads the broker confirms of the idle publishers, that have arrived, without blocking
+            :return: list of tokens of the messages nacked by the broker, or not confirmed within the timeout """
+        failed, self.failed = self.failed, list()
+        for publisher in self.publishers:
+            publisher.poll_confirms()
+            failed.extend(publisher.pop_failed())
+        return failed
+
+    @thread_safe
+    def prewarm(self, number_of_publishers):
+        """ opens idle publishers ahead of the first use, up to the given number """
+        while len(self.publishers) < min(number_of_publishers, self.max_size):
+            self.publishers.append(self._create())
 
     @thread_safe
     def close(self, suppress_logging=False):
@@ -228,9 +552,10 @@ class _Pool(object):
 
 
 class PublishersPool(object):
-    def __init__(self, logger):
+    def __init__(self, logger, connection_manager=None):
         self.pools = dict()
         self.logger = logger
+        self.connection_manager = connection_manager or get_connection_manager()
 
     def __del__(self):
         self.close(suppress_logging=True)
@@ -238,15 +563,36 @@ class PublishersPool(object):
     def get(self, name):
         """ creates connection to the MQ with process-specific settings
         :return :mq::flopsy::Publisher instance"""
-        if name not in self.pools:
-            self.pools[name] = _Pool(logger=self.logger, name=name)
-        return self.pools[name].get()
+        return self._get_pool(name).get()
 
     def put(self, publisher):
         """ releases the Publisher instance for reuse"""
-        if publisher.name not in self.pools:
-            self.pools[publisher.name] = _Pool(logger=self.logger, name=publisher.name)
-        self.pools[publisher.name].put(publisher)
+        self._get_pool(publisher.name).put(publisher)
+
+    def prewarm(self, name, number_of_publishers=settings.settings['mq_pool_prewarm']):
+        """ opens publishers with process-specific settings ahead of the first use """
+        self._get_pool(name).prewarm(number_of_publishers)
+
+    def wait_for_confirms(self):
+        """ awaits the broker confirms of the idle publishers of all pools
+            :return: list of tokens of the messages nacked by the broker, or not confirmed within the timeout """
+        failed = list()
+        for name in list(self.pools):
+            failed.extend(self.pools[name].wait_for_confirms())
+        return failed
+
+    def poll_confirms(self):
+        """ reads the broker confirms of the idle publishers of all pools, that have arrived, without blocking
+            :return: list of tokens of the messages nacked by the broker, or not confirmed within the timeout """
+        failed = list()
+        for name in list(self.pools):
+            failed.extend(self.pools[name].poll_confirms())
+        return failed
+
+    def _get_pool(self, name):
+        if name not in self.pools:
+            self.pools[name] = _Pool(logger=self.logger, name=name, connection_manager=self.connection_manager)
+        return self.pools[name]
 
     def reset_all(self, suppress_logging=False):
         """ iterates thru the list of established connections and resets them by disconnecting and reconnecting """
@@ -277,6 +623,68 @@ class PublishersPool(object):
             self._close(name, suppress_logging)
 
 
+class QueueDepthProbe(object):
+    """ reports number of messages awaiting in the queue, as per passive *queue_declare*.
+        reported numbers, as well as the failed probes, are cached for *cache_seconds*
+        to spare the broker from a round-trip per query """
+
+    def __init__(self, cache_seconds=settings.settings['mq_queue_depth_cache_seconds']):
+        self.cache_seconds = cache_seconds
+        self.connection = None
+        self.channel = None
+        self.lock = Lock()
+
+        # format: {queue name: (time.time() of the probe, message count, exception raised by the probe)}
+        self.depths = dict()
+
+    def __del__(self):
+        self.close()
+
+    @thread_safe
+    def message_count(self, mq_queue_name):
+        """ :return: number of messages ready for delivery in the given queue
+            :raise Exception: if the broker is unreachable or the queue does not exist """
+        probed_at, message_count, error = self.depths.get(mq_queue_name, (None, None, None))
+        if probed_at is not None and time.time() - probed_at < self.cache_seconds:
+            if error is not None:
+                raise error
+            return message_count
+
+        try:
+            if self.channel is None:
+                self.connection = Connection()
+                self.channel = self.connection.connection.channel()
+            declare_ok = self.channel.queue_declare(queue=mq_queue_name, passive=True)
+        except Exception as e:
+            # failed passive declaration closes the channel. next probe starts over
+            self._close()
+            self.depths[mq_queue_name] = (time.time(), None, e)
+            raise
+
+        self.depths[mq_queue_name] = (time.time(), declare_ok.message_count, None)
+        return declare_ok.message_count
+
+    def _close(self):
+        try:
+            if self.channel is not None:
+                self.channel.close()
+        except:
+            pass
+
+        try:
+            if self.connection is not None:
+                self.connection.close()
+        except:
+            pass
+
+        self.channel = None
+        self.connection = None
+
+    @thread_safe
+    def close(self):
+        self._close()
+
+
 def purge_mq_queue(mq_queue_name):
     """ function purges
     :param mq_queue_name: <string> name of the message queue
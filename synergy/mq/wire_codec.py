@@ -0,0 +1,147 @@
+__author__ = 'Bohdan Mushkevych'
+
+import binascii
+import json
+import struct
+import zlib
+
+from synergy.conf import context
+
+WIRE_FORMAT_JSON = 'json'
+WIRE_FORMAT_BINARY = 'binary'
+
+# AMQP content_type of the messages. messages with no content_type are published by the older versions in json
+CONTENT_TYPE_JSON = 'application/json'
+CONTENT_TYPE_BINARY = 'application/vnd.synergy.mq'
+
+BINARY_VERSION = 1
+
+# format: version, flags, process id, record_db_id as 12-byte ObjectId
+HEADER = struct.Struct('!BBI12s')
+LENGTH = struct.Struct('!H')
+
+FLAG_INLINE_PROCESS_NAME = 0x01     # process name is not in the registry, and follows the header as a string
+FLAG_ENTRY_NAME = 0x02              # entry name follows the header (or the inline process name) as a string
+
+# format: {process id: process name} of the processes from the context registry, whose ids are unique
+_process_names = dict()
+
+# ids shared by several processes of the context registry
+_colliding_ids = set()
+
+
+def process_id(process_name):
+    """ :return: integer id of the process name; stable across the deployments with different process registries """
+    return zlib.crc32(process_name.encode('utf-8'))
+
+
+def _build_registry():
+    global _process_names, _colliding_ids
+    process_names = dict()
+    colliding_ids = set()
+    for process_name in context.process_context:
+        key = process_id(process_name)
+        if key in process_names:
+            colliding_ids.add(key)
+        process_names[key] = process_name
+    for key in colliding_ids:
+        # processes with the colliding ids are transmitted with the inline process name
+        del process_names[key]
+    _process_names, _colliding_ids = process_names, colliding_ids
+
+
+def _registered_id(process_name):
+    """ :return: process id of the registered process, or None if the process name has to be transmitted inline """
+    key = process_id(process_name)
+    if key not in _process_names and key not in _colliding_ids and process_name in context.process_context:
+        # process was registered after the registry was built
+        _build_registry()
+    return key if _process_names.get(key) == process_name else None
+
+
+def _resolve(key):
+    if key not in _process_names:
+        _build_registry()
+    if key not in _process_names:
+        raise ValueError(f'Unknown process id {key}. Message was published by a deployment with another registry.')
+    return _process_names[key]
+
+
+def _pack_string(value):
+    encoded = value.encode('utf-8')
+    return LENGTH.pack(len(encoded)) + encoded
+
+
+def _unpack_string(body, offset):
+    """ :return: tuple (string, offset past the string) """
+    length, = LENGTH.unpack_from(body, offset)
+    offset += LENGTH.size
+    return body[offset:offset + length].decode('utf-8'), offset + length
+
+
+def encode_binary(message_data):
+    """ :return: bytes of the MqTransmission document in the binary wire format, or None if the document
+        can not be expressed in it: holds fields other than the process_name, entry_name and record_db_id """
+    if set(message_data) - {'process_name', 'entry_name', 'record_db_id'}:
+        return None
+
+    process_name = message_data.get('process_name')
+    entry_name = message_data.get('entry_name')
+    record_db_id = message_data.get('record_db_id')
+    if not isinstance(process_name, str) or not isinstance(record_db_id, str) or len(record_db_id) != 24:
+        return None
+
+    try:
+        object_id = binascii.unhexlify(record_db_id)
+    except (binascii.Error, ValueError):
+        return None
+
+    flags = 0
+    key = _registered_id(process_name)
+    tail = b''
+    if key is None:
+        flags |= FLAG_INLINE_PROCESS_NAME
+        key = 0
+        tail += _pack_string(process_name)
+    if entry_name is not None:
+        flags |= FLAG_ENTRY_NAME
+        tail += _pack_string(entry_name)
+    return HEADER.pack(BINARY_VERSION, flags, key, object_id) + tail
+
+
+def decode_binary(body):
+    """ :return: MqTransmission document decoded from the binary wire format
+        :raise ValueError: if the version or the process id are unknown """
+    version, flags, key, object_id = HEADER.unpack_from(body)
+    if version != BINARY_VERSION:
+        raise ValueError(f'Unsupported version {version} of the binary wire format')
+
+    offset = HEADER.size
+    if flags & FLAG_INLINE_PROCESS_NAME:
+        process_name, offset = _unpack_string(body, offset)
+    else:
+        process_name = _resolve(key)
+
+    message_data = {'process_name': process_name, 'record_db_id': binascii.hexlify(object_id).decode('ascii')}
+    if flags & FLAG_ENTRY_NAME:
+        message_data['entry_name'], offset = _unpack_string(body, offset)
+    return message_data
+
+
+def encode(message_data, wire_format=WIRE_FORMAT_JSON):
+    """ :return: tuple (body, content_type). documents not expressible in the binary format are encoded in json """
+    if wire_format == WIRE_FORMAT_BINARY:
+        body = encode_binary(message_data)
+        if body is not None:
+            return body, CONTENT_TYPE_BINARY
+    return json.dumps({'data': message_data}), CONTENT_TYPE_JSON
+
+
+def decode(body, content_type=None):
+    """ :return: document decoded according to the content_type; json is assumed if the content_type is missing """
+    if content_type == CONTENT_TYPE_BINARY:
+        return decode_binary(body)
+
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    return json.loads(body)['data']
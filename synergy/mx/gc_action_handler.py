@@ -34,6 +34,11 @@ class GcActionHandler(BaseRequestHandler):
         self.logger.info(f'MX: performed GC Flush for {self.process_name}')
         return self.reply_ok()
 
+    def validate_timetable(self):
+        self.scheduler.timetable.validate()
+        self.logger.info('MX: performed full Timetable validation')
+        return self.reply_ok()
+
     def tail_gc_log(self):
         fqfn = get_log_filename(PROCESS_GC)
         return tail_file(fqfn)
@@ -19,6 +19,8 @@ class RestManagedSchedulerEntry(ManagedProcessEntry):
     next_run_in = StringField()
     next_timeperiod = StringField()
     reprocessing_queue = ListField()
+    tick_metrics = DictField()
+    admission = DictField()
 
 
 class RestTimetableTree(TimetableTreeEntry):
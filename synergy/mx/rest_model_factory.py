@@ -1,5 +1,6 @@
 __author__ = 'Bohdan Mushkevych'
 
+from synergy.system.admission_control import get_admission_control
 from synergy.system.time_trigger_factory import format_time_trigger_string
 from synergy.mx.rest_model import *
 
@@ -21,7 +22,7 @@ def get_next_timeperiod(timetable, process_name):
 
 
 def get_dependant_trees(timetable, tree_obj):
-    trees = timetable._find_dependant_trees(tree_obj)
+    trees = timetable.get_dependant_trees(tree_obj)
     return [x.tree_name for x in trees]
 
 
@@ -49,6 +50,8 @@ def create_rest_managed_scheduler_entry(thread_handler, timetable, gc):
         state_machine_name=process_entry.state_machine_name,
         blocking_type=process_entry.blocking_type,
         reprocessing_queue=get_reprocessing_queue(gc, process_name),
+        tick_metrics=thread_handler.tick_metrics.document,
+        admission=get_admission_control().process_document(process_name),
     )
     return rest_model
 
@@ -5,8 +5,10 @@ from werkzeug.utils import cached_property
 from synergy.scheduler.scheduler_constants import PROCESS_SCHEDULER, PROCESS_MX
 from synergy.mx.base_request_handler import BaseRequestHandler
 from synergy.mx.rest_model_factory import create_rest_managed_scheduler_entry, create_rest_freerun_scheduler_entry
+from synergy.system.admission_control import get_admission_control
 from synergy.system.performance_tracker import FootprintCalculator
 from synergy.system.system_logger import get_log_filename
+from synergy.system.timer_dispatcher import tick_density
 from synergy.system.utils import tail_file
 
 
@@ -58,6 +60,20 @@ class SchedulerEntries(BaseRequestHandler):
     def reprocess_uows(self):
         return self.scheduler.gc.reprocess_uows
 
+    @cached_property
+    def tick_density(self):
+        return tick_density()
+
+    @cached_property
+    def admission(self):
+        return get_admission_control().document
+
+    @cached_property
+    def outbox(self):
+        if self.scheduler.outbox is None:
+            return {}
+        return self.scheduler.outbox.document
+
     def tail_scheduler_log(self):
         fqfn = get_log_filename(PROCESS_SCHEDULER)
         return tail_file(fqfn)
@@ -1,5 +1,7 @@
 __author__ = 'Bohdan Mushkevych'
 
+from itertools import islice
+
 from werkzeug.utils import cached_property
 
 from synergy.conf import settings
@@ -26,8 +28,7 @@ class TreeNodeDetails(BaseRequestHandler):
             time_qualifier=node.time_qualifier,
             number_of_children=len(node.children),
             number_of_failures='NA' if not node.job_record else node.job_record.number_of_failures,
-            state='NA' if not node.job_record else node.job_record.state,
-            event_log=[] if not node.job_record else node.job_record.event_log)
+            state='NA' if not node.job_record else node.job_record.state)
 
         if as_model:
             return rest_job
@@ -42,9 +43,7 @@ class TreeNodeDetails(BaseRequestHandler):
         if not self.timeperiod:
             # return list of yearly nodes OR leafs for linear tree
             # limit number of children to return, since a linear tree can holds thousands of nodes
-            children_keys = list(self.tree.root.children)
-            sorted_keys = sorted(children_keys, reverse=True)
-            sorted_keys = sorted_keys[:settings.settings['mx_children_limit']]
+            sorted_keys = islice(reversed(self.tree.root.children), settings.settings['mx_children_limit'])
             for key in sorted_keys:
                 child = self.tree.root.children[key]
                 rest_node.children[key] = TreeNodeDetails.get_details(child)
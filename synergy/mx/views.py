@@ -226,6 +226,13 @@ def gc_refresh(request, **values):
     return Response(status=HTTPStatus.NO_CONTENT)
 
 
+@expose('/scheduler/gc/validate/')
+def gc_validate_timetable(request, **values):
+    handler = GcActionHandler(request, **values)
+    handler.validate_timetable()
+    return Response(status=HTTPStatus.NO_CONTENT)
+
+
 @expose('/scheduler/gc/log/')
 def gc_log(request, **values):
     handler = GcActionHandler(request, **values)
@@ -244,6 +251,24 @@ def scheduler_log(request, **values):
     return Response(response=json.dumps(handler.tail_scheduler_log()), mimetype='application/json')
 
 
+@expose('/scheduler/timers/density/')
+def timers_density(request, **values):
+    details = SchedulerEntries(request, **values)
+    return Response(response=json.dumps(details.tick_density), mimetype='application/json')
+
+
+@expose('/scheduler/admission/')
+def admission_control(request, **values):
+    details = SchedulerEntries(request, **values)
+    return Response(response=json.dumps(details.admission), mimetype='application/json')
+
+
+@expose('/scheduler/outbox/')
+def mq_outbox(request, **values):
+    details = SchedulerEntries(request, **values)
+    return Response(response=json.dumps(details.outbox), mimetype='application/json')
+
+
 @expose('/supervisor/entries/')
 def supervisor_entries(request, **values):
     handler = SupervisorActionHandler(request, **values)
@@ -10,11 +10,14 @@ from synergy.db.dao.unit_of_work_dao import UnitOfWorkDao
 from synergy.db.dao.job_dao import JobDao
 from synergy.db.model import unit_of_work
 from synergy.db.model.unit_of_work import UnitOfWork
+from synergy.system.mq_outbox import get_outbox
 from synergy.system.mq_transmitter import MqTransmitter
+from synergy.system.admission_control import AdmissionError, get_admission_control
 from synergy.conf import context
 from synergy.system.decorator import with_reconnect
 from synergy.system import time_helper
 from synergy.scheduler.tree_node import DependentOnSummary
+from synergy.scheduler.scheduler_constants import BLOCKING_CHILDREN, BLOCKING_DEPENDENCIES, PROCESS_SCHEDULER
 
 
 class AbstractStateMachine(object):
@@ -23,7 +26,8 @@ class AbstractStateMachine(object):
     def __init__(self, logger, timetable, name):
         self.name = name
         self.logger = logger
-        self.mq_transmitter = MqTransmitter(self.logger)
+        self.mq_transmitter = MqTransmitter(self.logger, outbox=get_outbox(PROCESS_SCHEDULER))
+        self.admission_control = get_admission_control()
         self.timetable = timetable
         self.uow_dao = UnitOfWorkDao(self.logger)
         self.job_dao = JobDao(self.logger)
@@ -40,10 +44,21 @@ class AbstractStateMachine(object):
         self.timetable.add_log_entry(process_name, timeperiod, msg)
         self.logger.log(level, msg)
 
-    @with_reconnect
-    def _insert_uow(self, process_name, timeperiod, start_timeperiod, end_timeperiod, start_id, end_id):
-        """creates unit_of_work and inserts it into the DB
-            :raise DuplicateKeyError: if unit_of_work with given parameters already exists """
+    def _persist_job(self, job_record):
+        """ method saves the job record into the DB and registers its tree node for the incremental validation """
+        self.job_dao.update(job_record)
+        self.timetable.mark_dirty(job_record)
+
+    @property
+    def is_catchup_capable(self):
+        """
+        :return: True if given State Machine supports the bulk processing of the backlogged job records
+        @see manage_embryo_jobs
+        """
+        return False
+
+    def _build_uow(self, process_name, timeperiod, start_timeperiod, end_timeperiod, start_id, end_id):
+        """ :return: unit_of_work in STATE_REQUESTED. NOTICE: the unit_of_work is not persisted """
         uow = UnitOfWork()
         uow.process_name = process_name
         uow.timeperiod = timeperiod
@@ -59,6 +74,13 @@ class AbstractStateMachine(object):
         uow.unit_of_work_type = unit_of_work.TYPE_MANAGED
         uow.number_of_retries = 0
         uow.arguments = context.process_context[process_name].arguments
+        return uow
+
+    @with_reconnect
+    def _insert_uow(self, process_name, timeperiod, start_timeperiod, end_timeperiod, start_id, end_id):
+        """creates unit_of_work and inserts it into the DB
+            :raise DuplicateKeyError: if unit_of_work with given parameters already exists """
+        uow = self._build_uow(process_name, timeperiod, start_timeperiod, end_timeperiod, start_id, end_id)
         uow.db_id = self.uow_dao.insert(uow)
 
         msg = 'Created: UOW {0} for {1}@{2} over [{3}:{4}).'\
@@ -72,13 +94,28 @@ class AbstractStateMachine(object):
             .format(uow.db_id, uow.process_name, uow.timeperiod, uow.start_timeperiod, uow.end_timeperiod)
         self._log_message(INFO, uow.process_name, uow.timeperiod, msg)
 
+    def republish_unconfirmed_uows(self):
+        """ method reads the broker confirms that have arrived for the units of work published by this state machine,
+            without waiting for the outstanding ones, and republishes those nacked by the broker
+            or not confirmed within the timeout.
+            units of work failed on the republishing are reported by the next call """
+        for uow in self.mq_transmitter.confirm_managed_uows(wait=False):
+            self.mq_transmitter.publish_managed_uow(uow)
+            msg = 'Republished: UOW {0} for {1}@{2}, unconfirmed by the MQ broker.'\
+                .format(uow.db_id, uow.process_name, uow.timeperiod)
+            self._log_message(WARNING, uow.process_name, uow.timeperiod, msg)
+
     def insert_and_publish_uow(self, job_record, start_id, end_id):
         """ method creates and publishes a unit_of_work. it also handles DuplicateKeyError and attempts recovery
         :return: tuple (uow, is_duplicate)
         :raise UserWarning: if the recovery from DuplicateKeyError was unsuccessful
+        :raise AdmissionError: if the worker queue of the process is above the high-water mark
         """
         process_name = job_record.process_name
         timeperiod = job_record.timeperiod
+        if not self.admission_control.is_admitted(process_name):
+            raise AdmissionError(f'worker queue of {process_name} is above the high-water mark')
+
         start_timeperiod = self.compute_start_timeperiod(job_record.process_name, job_record.timeperiod)
         end_timeperiod = self.compute_end_timeperiod(job_record.process_name, job_record.timeperiod)
 
@@ -186,7 +223,7 @@ class AbstractStateMachine(object):
             should a job record fall in-between grouped time milestones,
             its state should be set to STATE_NOOP without any processing """
         job_record.state = job.STATE_NOOP
-        self.job_dao.update(job_record)
+        self._persist_job(job_record)
 
         time_grouping = context.process_context[job_record.process_name].time_grouping
         msg = 'Job {0}@{1} with time_grouping {2} was transferred to STATE_NOOP' \
@@ -256,7 +293,7 @@ class AbstractStateMachine(object):
             # there is very little sense in waiting for them to become STATE_PROCESSED
             # Skip this timeperiod itself
             job_record.state = job.STATE_SKIPPED
-            self.job_dao.update(job_record)
+            self._persist_job(job_record)
             self.mq_transmitter.publish_job_status(job_record)
 
             depon_summary.log_skipped(WARNING)
@@ -302,9 +339,13 @@ class AbstractStateMachine(object):
                 msg = 'Unknown state {0} of the job {1}'.format(job_record.state, job_record.db_id)
                 self._log_message(ERROR, job_record.process_name, job_record.timeperiod, msg)
 
+        except AdmissionError as e:
+            msg = 'Held back Job {0}@{1}, because of: {2}. Waiting another tick' \
+                  .format(job_record.process_name, job_record.timeperiod, e)
+            self._log_message(INFO, job_record.process_name, job_record.timeperiod, msg)
         except LookupError as e:
             job_record.number_of_failures += 1
-            self.job_dao.update(job_record)
+            self._persist_job(job_record)
             self.timetable.skip_if_needed(job_record)
             msg = 'Increasing fail counter for Job {0}@{1}, because of: {2}' \
                   .format(job_record.process_name, job_record.timeperiod, e)
@@ -313,6 +354,69 @@ class AbstractStateMachine(object):
         finally:
             self.mq_transmitter.publish_job_status(job_record)
 
+    def _compute_catchup_job_state(self, job_record):
+        """ :return: state of the job record, once its unit_of_work is published by the bulk catch-up """
+        raise NotImplementedError(f'method _compute_catchup_job_state must be implemented by '
+                                  f'{self.__class__.__name__}')
+
+    def select_catchup_jobs(self, job_records):
+        """ :param job_records: backlog of job records in STATE_EMBRYO, in the timeperiod order
+            :return: leading job records that can be processed by the bulk catch-up:
+             job records that are not subject to time grouping, and whose blocking conditions are satisfied """
+        selected = []
+        for job_record in job_records:
+            process_entry = context.process_context[job_record.process_name]
+            if process_entry.time_grouping != 1:
+                break
+            if process_entry.blocking_type == BLOCKING_CHILDREN \
+                    and not self.timetable.is_job_record_finalizable(job_record):
+                break
+            if process_entry.blocking_type == BLOCKING_DEPENDENCIES \
+                    and not self.timetable.dependent_on_summary(job_record).all_processed:
+                break
+            selected.append(job_record)
+        return selected
+
+    def manage_embryo_jobs(self, job_records):
+        """ bulk counterpart of the *manage_job* for the backlog of job records in STATE_EMBRYO of a single process:
+            - units_of_work are inserted with a single bulk write
+            - units_of_work are published over a single MQ channel
+            - job records are transferred to their next state with a single bulk write
+            job records whose units_of_work already exist are passed to the *manage_job* one by one """
+        assert all(job_record.is_embryo for job_record in job_records)
+        process_name = job_records[0].process_name
+        if not self.admission_control.is_admitted(process_name):
+            self.logger.info(f'Held back catch-up of {len(job_records)} job records for {process_name}, '
+                             f'since its worker queue is above the high-water mark')
+            return
+
+        uows = []
+        for job_record in job_records:
+            start_timeperiod = self.compute_start_timeperiod(job_record.process_name, job_record.timeperiod)
+            end_timeperiod = self.compute_end_timeperiod(job_record.process_name, job_record.timeperiod)
+            uows.append(self._build_uow(job_record.process_name, job_record.timeperiod,
+                                        start_timeperiod, end_timeperiod, 0, 0))
+
+        duplicates = {uow.timeperiod for uow in self.uow_dao.insert_many(uows)}
+        batch = [(job_record, uow) for job_record, uow in zip(job_records, uows) if uow.timeperiod not in duplicates]
+        self.mq_transmitter.publish_managed_uows([uow for _, uow in batch])
+
+        for job_record, uow in batch:
+            job_record.state = self._compute_catchup_job_state(job_record)
+            job_record.related_unit_of_work = uow.db_id
+        self.job_dao.update_many([job_record for job_record, _ in batch])
+
+        for job_record, uow in batch:
+            self.timetable.mark_dirty(job_record)
+            msg = 'Created and published: UOW {0} for {1}@{2} over [{3}:{4}). Updated Job {5}: {6} -> {7};' \
+                  .format(uow.db_id, uow.process_name, uow.timeperiod, uow.start_timeperiod, uow.end_timeperiod,
+                          job_record.db_id, job.STATE_EMBRYO, job_record.state)
+            self._log_message(INFO, job_record.process_name, job_record.timeperiod, msg)
+
+        for job_record in job_records:
+            if job_record.timeperiod in duplicates:
+                self.manage_job(job_record)
+
     def reprocess_job(self, job_record):
         """ method marks given job for reprocessing:
             - if no UOW was bind with the job record - it is transferred to STATE_EMBRYO only
@@ -324,7 +428,7 @@ class AbstractStateMachine(object):
 
         if not job_record.related_unit_of_work:
             job_record.state = job.STATE_EMBRYO
-            self.job_dao.update(job_record)
+            self._persist_job(job_record)
         else:
             uow = self.uow_dao.get_one(job_record.related_unit_of_work)
             if not uow.is_finished:
@@ -346,7 +450,7 @@ class AbstractStateMachine(object):
 
         if not job_record.is_finished:
             job_record.state = job.STATE_SKIPPED
-            self.job_dao.update(job_record)
+            self._persist_job(job_record)
 
         if job_record.related_unit_of_work:
             uow = self.uow_dao.get_one(job_record.related_unit_of_work)
@@ -360,14 +464,21 @@ class AbstractStateMachine(object):
                       original_job_state, job_record.state)
         self._log_message(WARNING, job_record.process_name, job_record.timeperiod, msg)
 
-    def create_job(self, process_name, timeperiod):
-        """ method creates a job record in STATE_EMBRYO for given process_name and timeperiod
-            :returns: created job record of type <Job>"""
+    def build_embryo_job(self, process_name, timeperiod):
+        """ method builds a job record in STATE_EMBRYO for given process_name and timeperiod
+            NOTICE: the job record is not persisted
+            :returns: job record of type <Job>"""
         job_record = Job()
         job_record.state = job.STATE_EMBRYO
         job_record.timeperiod = timeperiod
         job_record.process_name = process_name
-        self.job_dao.update(job_record)
+        return job_record
+
+    def create_job(self, process_name, timeperiod):
+        """ method creates a job record in STATE_EMBRYO for given process_name and timeperiod
+            :returns: created job record of type <Job>"""
+        job_record = self.build_embryo_job(process_name, timeperiod)
+        self._persist_job(job_record)
 
         self.logger.info('Created Job {0} for {1}@{2}'
                          .format(job_record.db_id, job_record.process_name, job_record.timeperiod))
@@ -378,7 +489,7 @@ class AbstractStateMachine(object):
         original_job_state = job_record.state
         job_record.state = new_state
         job_record.related_unit_of_work = uow.db_id
-        self.job_dao.update(job_record)
+        self._persist_job(job_record)
 
         msg = 'Updated Job {0} for {1}@{2}: state transfer {3} -> {4};' \
               .format(job_record.db_id, job_record.process_name, job_record.timeperiod, original_job_state, new_state)
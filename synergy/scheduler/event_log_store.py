@@ -0,0 +1,70 @@
+__author__ = 'Bohdan Mushkevych'
+
+from datetime import datetime
+from threading import RLock
+
+from synergy.conf import settings
+from synergy.db.dao.job_event_dao import JobEventDao
+from synergy.db.model.job import EVENT_LOG_MAX_SIZE
+from synergy.db.model.job_event import JobEvent
+from synergy.system.decorator import thread_safe
+
+# format of the event timestamp, as presented by MX
+EVENT_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class EventLogStore(object):
+    """ Append-only store of the job events, keyed by the job id.
+        Events are accumulated in memory and written to the capped job_event_log collection in batches,
+        so that recording an event never rewrites the job record """
+
+    def __init__(self, logger):
+        self.lock = RLock()
+        self.logger = logger
+        self.job_event_dao = JobEventDao(self.logger)
+        self.batch_size = settings.settings['event_log_batch_size']
+
+        # list of JobEvent instances, not yet written to the DB
+        self.pending = list()
+
+    @thread_safe
+    def append(self, job_record, msg):
+        """ registers an event for the given job and writes the batch to the DB, once it is full """
+        event = JobEvent(job_id=job_record.db_id,
+                         process_name=job_record.process_name,
+                         timeperiod=job_record.timeperiod,
+                         created_at=datetime.utcnow(),
+                         message=msg)
+        self.pending.append(event)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    @thread_safe
+    def flush(self):
+        """ writes pending events to the DB
+            :return: number of written events """
+        if not self.pending:
+            return 0
+
+        events = self.pending
+        try:
+            self.job_event_dao.insert_many(events)
+            self.pending = list()
+        except Exception as e:
+            # keep the most recent events for the next attempt, so that the memory footprint remains bounded
+            self.pending = events[-EVENT_LOG_MAX_SIZE:]
+            self.logger.error(f'Unable to write {len(events)} job events: {e}', exc_info=True)
+            return 0
+        return len(events)
+
+    @thread_safe
+    def get_event_log(self, job_record):
+        """ :return: list of up to EVENT_LOG_MAX_SIZE most recent events in format [timestamp, message],
+            newest first """
+        if job_record is None or job_record.db_id is None:
+            return []
+
+        events = [event for event in reversed(self.pending) if event.job_id == job_record.db_id]
+        if len(events) < EVENT_LOG_MAX_SIZE:
+            events += self.job_event_dao.get_events(job_record.db_id, limit=EVENT_LOG_MAX_SIZE - len(events))
+        return [[event.created_at.strftime(EVENT_TIME_FORMAT), event.message] for event in events]
@@ -9,8 +9,10 @@ from synergy.system.system_logger import get_logger
 from synergy.system.decorator import thread_safe
 from synergy.system.priority_queue import PriorityEntry, PriorityQueue, compute_release_time
 from synergy.system.repeat_timer import RepeatTimer
-from synergy.system.mq_transmitter import MqTransmitter
-from synergy.scheduler.scheduler_constants import PROCESS_GC
+from synergy.system.mq_outbox import get_outbox
+from synergy.system.mq_transmitter import MqTransmitter, LANE_BACKFILL
+from synergy.system.admission_control import get_admission_control
+from synergy.scheduler.scheduler_constants import PROCESS_GC, PROCESS_SCHEDULER
 from synergy.scheduler.thread_handler import ManagedThreadHandler
 from synergy.db.model import unit_of_work
 from synergy.db.dao.unit_of_work_dao import UnitOfWorkDao
@@ -25,7 +27,8 @@ class GarbageCollector(object):
     def __init__(self, scheduler):
         self.logger = get_logger(PROCESS_GC, append_to_console=False, redirect_stdstream=False)
         self.managed_handlers = scheduler.managed_handlers
-        self.mq_transmitter = MqTransmitter(self.logger)
+        self.mq_transmitter = MqTransmitter(self.logger, outbox=get_outbox(PROCESS_SCHEDULER))
+        self.admission_control = get_admission_control()
         self.timetable = scheduler.timetable
 
         self.lock = Lock()
@@ -69,7 +72,7 @@ class GarbageCollector(object):
                 # The Job lifecycle is managed by:
                 # - synergy.scheduler.abstract_state_machine.AbstractStateMachine.notify
                 # - synergy.scheduler.abstract_state_machine.AbstractStateMachine.manage_job
-                # - synergy.scheduler.timetable.Timetable.validate (via GarbageCollector._run)
+                # - synergy.scheduler.timetable.Timetable.validate_incremental (via GarbageCollector._run)
                 if datetime.utcnow() - uow.created_at > timedelta(hours=settings.settings['gc_life_support_hours']):
                     self._cancel_uow(uow)
                     continue
@@ -88,23 +91,39 @@ class GarbageCollector(object):
         :param q: PriorityQueue instance holding GarbageCollector entries
         :param ignore_priority: If True - all GarbageCollector entries should be resubmitted
                 If False - only those entries whose waiting time has expired will be resubmitted
+        NOTICE: entries are held back while the worker queue of their process is above the high-water mark
         """
         current_timestamp = compute_release_time(lag_in_minutes=0)
         for _ in range(len(q)):
             entry = q.pop()
             assert isinstance(entry, PriorityEntry)
 
-            if ignore_priority or entry.release_time < current_timestamp:
+            if not self.admission_control.is_admitted(entry.entry.process_name):
+                q.put(entry)
+                self.logger.info(f'held back re-submission of {len(q)} UOWs for {entry.entry.process_name}, '
+                                 f'since its worker queue is above the high-water mark')
+                break
+            elif ignore_priority or entry.release_time < current_timestamp:
                 self._resubmit_uow(entry.entry)
             else:
                 q.put(entry)
                 break
 
+    def _requeue_unconfirmed(self):
+        """ method awaits the broker confirms of the re-submitted UOWs
+            and returns the unconfirmed ones into the reprocessing queues of their processes """
+        for uow in self.mq_transmitter.confirm_managed_uows():
+            # unconfirmed re-submission is retried by the next flush
+            self.reprocess_uows[uow.process_name].put(PriorityEntry(uow))
+            self.logger.warning('re-submission of UOW {0} for {1}@{2} was not confirmed by the MQ broker'
+                                .format(uow.db_id, uow.process_name, uow.timeperiod))
+
     @thread_safe
     def flush(self, ignore_priority=False):
         """ method iterates over each reprocessing queues and re-submits UOW whose waiting time has expired """
         for process_name, q in self.reprocess_uows.items():
             self._flush_queue(q, ignore_priority)
+        self._requeue_unconfirmed()
 
     @thread_safe
     def validate(self):
@@ -137,6 +156,7 @@ class GarbageCollector(object):
             and re-submits UOW whose waiting time has expired """
         q = self.reprocess_uows[process_name]
         self._flush_queue(q, ignore_priority)
+        self._requeue_unconfirmed()
 
     def _resubmit_uow(self, uow):
         # re-read UOW from the DB, in case it was STATE_CANCELLED by MX
@@ -160,7 +180,7 @@ class GarbageCollector(object):
         uow.submitted_at = datetime.utcnow()
         self.uow_dao.update(uow)
 
-        self.mq_transmitter.publish_managed_uow(uow)
+        self.mq_transmitter.publish_managed_uow(uow, lane=LANE_BACKFILL)
         self.logger.info('re-submitted UOW {0} for {1}@{2}; attempt {3}'
                          .format(uow.db_id, uow.process_name, uow.timeperiod, uow.number_of_retries))
 
@@ -188,8 +208,11 @@ class GarbageCollector(object):
             self.logger.debug('step 4: timetable housekeeping')
             self.timetable.build_trees()
 
-            self.logger.debug('step 5: timetable validation')
-            self.timetable.validate()
+            self.logger.debug('step 5: incremental timetable validation')
+            self.timetable.validate_incremental()
+
+            self.logger.debug('step 6: write pending job events')
+            self.timetable.event_log_store.flush()
         except Exception as e:
             self.logger.error(f'GC run exception: {e}')
         finally:
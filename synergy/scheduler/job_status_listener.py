@@ -10,6 +10,9 @@ from synergy.scheduler.scheduler_constants import QUEUE_JOB_STATUS
 from synergy.scheduler.thread_handler import ManagedThreadHandler
 from synergy.mq.flopsy import Consumer
 
+# maximum number of job status messages handled at once. handlers requested by the batch are triggered only once
+BATCH_SIZE = 64
+
 
 class JobStatusListener(object):
     """ class instance listens to the QUEUE_JOB_STATUS queue and triggers ManagedThreadHandlers if applicable """
@@ -19,7 +22,7 @@ class JobStatusListener(object):
         self.timetable = scheduler.timetable
         self.logger = scheduler.logger
         self.job_dao = JobDao(self.logger)
-        self.consumer = Consumer(QUEUE_JOB_STATUS)
+        self.consumer = Consumer(QUEUE_JOB_STATUS, prefetch_count=BATCH_SIZE)
         self.main_thread = None
 
     def __del__(self):
@@ -29,48 +32,63 @@ class JobStatusListener(object):
         except Exception as e:
             self.logger.error(f'JobStatusListener: Exception caught while closing Flopsy Consumer: {e}')
 
+    def _dependant_handlers(self, job_record):
+        """ :return: set of ManagedThreadHandlers of the dependant TreeNodes/Jobs, that are subject to trigger """
+        # step 1: identify dependant tree nodes
+        tree_obj = self.timetable.get_tree(job_record.process_name)
+        tree_node = tree_obj.get_node(job_record.process_name, job_record.timeperiod)
+        dependant_nodes = self.timetable.get_dependant_tree_nodes(tree_node)
+
+        # step 2: form list of handlers to trigger
+        handlers_to_trigger = set()
+        for node in dependant_nodes:
+            state_machine = self.scheduler.state_machine_for(node.process_name)
+            if state_machine.run_on_active_timeperiod:
+                # ignore dependant processes whose state machine can run on an active timeperiod
+                # to avoid "over-triggering" them
+                continue
+            handlers_to_trigger.add(self.scheduler.managed_handlers[node.process_name])
+        return handlers_to_trigger
+
+    def _trigger_dependants(self, job_record):
+        """ method builds up a list of dependant TreeNodes/Jobs and triggers their ManagedThreadHandlers,
+            if applicable. ManagedThreadHandler.trigger only requests the tick, and does not wait for it """
+        for handler in self._dependant_handlers(job_record):
+            assert isinstance(handler, ManagedThreadHandler)
+            handler.trigger()
+
     # ********************** thread-related methods ****************************
-    def _mq_callback(self, message):
-        """ method receives a message from Synergy Scheduler notifying of Job completion,
-            builds up a list of dependant TreeNodes/Jobs and triggers their ManagedThreadHandlers, if applicable
-            :param message: <MqTransmission> mq message """
-        try:
-            self.logger.info('JobStatusListener {')
-
-            mq_request = MqTransmission.from_json(message.body)
-            job_record = self.job_dao.get_by_id(mq_request.process_name, mq_request.record_db_id)
-
-            # step 1: identify dependant tree nodes
-            tree_obj = self.timetable.get_tree(job_record.process_name)
-            tree_node = tree_obj.get_node(job_record.process_name, job_record.timeperiod)
-            dependant_nodes = self.timetable._find_dependant_tree_nodes(tree_node)
-
-            # step 2: form list of handlers to trigger
-            handlers_to_trigger = set()
-            for node in dependant_nodes:
-                state_machine = self.scheduler.state_machine_for(node.process_name)
-                if state_machine.run_on_active_timeperiod:
-                    # ignore dependant processes whose state machine can run on an active timeperiod
-                    # to avoid "over-triggering" them
-                    continue
-                handlers_to_trigger.add(self.scheduler.managed_handlers[node.process_name])
-
-            # step 3: iterate the list of handlers and trigger them
-            for handler in handlers_to_trigger:
-                assert isinstance(handler, ManagedThreadHandler)
+    def _mq_batch_callback(self, messages):
+        """ method receives a batch of messages from Synergy Scheduler notifying of Job completion,
+            builds up a list of dependant TreeNodes/Jobs and triggers their ManagedThreadHandlers, if applicable.
+            a handler requested by several messages of the batch is triggered once
+            :param messages: list of <MqTransmission> mq messages
+            :return: empty list, as the messages that failed to process are not re-queued """
+        self.logger.info(f'JobStatusListener {{ batch of {len(messages)}')
+        handlers_to_trigger = set()
+        for message in messages:
+            try:
+                mq_request = MqTransmission.from_json(message.body)
+                job_record = self.job_dao.get_by_id(mq_request.process_name, mq_request.record_db_id)
+                handlers_to_trigger.update(self._dependant_handlers(job_record))
+            except KeyError:
+                self.logger.error(f'Access error for {message.body}', exc_info=True)
+            except Exception:
+                self.logger.error(f'Error during dependants resolution {message.body}', exc_info=True)
+
+        for handler in handlers_to_trigger:
+            assert isinstance(handler, ManagedThreadHandler)
+            try:
                 handler.trigger()
+            except Exception:
+                self.logger.error(f'Error during ManagedThreadHandler.trigger call {handler.key}', exc_info=True)
 
-        except KeyError:
-            self.logger.error(f'Access error for {message.body}', exc_info=True)
-        except Exception:
-            self.logger.error(f'Error during ManagedThreadHandler.trigger call {message.body}', exc_info=True)
-        finally:
-            self.consumer.acknowledge(message.delivery_tag)
-            self.logger.info('JobStatusListener }')
+        self.logger.info('JobStatusListener }')
+        return []
 
     def _run_mq_listener(self):
         try:
-            self.consumer.register(self._mq_callback)
+            self.consumer.register_batch(self._mq_batch_callback, BATCH_SIZE)
             self.logger.info('JobStatusListener: instantiated and activated.')
             self.consumer.wait()
         except (AMQPError, IOError) as e:
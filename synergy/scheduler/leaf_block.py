@@ -0,0 +1,88 @@
+__author__ = 'Bohdan Mushkevych'
+
+from array import array
+
+from synergy.db.model import job
+from synergy.db.model.job import Job
+
+# job states in the order of their codes in the LeafBlock.states array
+STATES = [job.STATE_EMBRYO, job.STATE_IN_PROGRESS, job.STATE_FINAL_RUN,
+          job.STATE_PROCESSED, job.STATE_SKIPPED, job.STATE_NOOP]
+STATE_CODES = {state: code for code, state in enumerate(STATES)}
+
+# state code of the vacant record
+VACANT = -1
+
+# ObjectId in its binary form is 12 bytes long
+OBJECT_ID_SIZE = 12
+NO_OBJECT_ID = bytes(OBJECT_ID_SIZE)
+
+# upper boundary of the unsigned short array
+MAX_NUMBER_OF_FAILURES = 0xFFFF
+
+
+class LeafBlock(object):
+    """ Compact array-backed storage of the job records, bound to the leaf children of a single parent node.
+        Job record is kept as a fixed-size record: state code, number of failures, db_id and related_unit_of_work.
+        process_name and timeperiod are not stored, as they are known to the leaf node.
+        Vacant records are reused by the consecutive *freeze* calls """
+
+    __slots__ = ('states', 'failures', 'db_ids', 'uow_ids', 'vacant_indexes')
+
+    def __init__(self):
+        self.states = array('b')
+        self.failures = array('H')
+        self.db_ids = bytearray()
+        self.uow_ids = bytearray()
+        self.vacant_indexes = []
+
+    def __len__(self):
+        """ :return: number of occupied records """
+        return len(self.states) - len(self.vacant_indexes)
+
+    @staticmethod
+    def is_freezable(job_record):
+        """ :return: True if the job record can be represented by the LeafBlock without loss of information """
+        return job_record.db_id is not None \
+            and job_record.state in STATE_CODES \
+            and 0 <= job_record.number_of_failures <= MAX_NUMBER_OF_FAILURES
+
+    def freeze(self, job_record):
+        """ stores the job record in the block
+            :return: index of the record """
+        assert self.is_freezable(job_record), f'Job {job_record.process_name}@{job_record.timeperiod} is not freezable'
+        db_id = bytes.fromhex(job_record.db_id)
+        uow_id = bytes.fromhex(job_record.related_unit_of_work) if job_record.related_unit_of_work else NO_OBJECT_ID
+
+        if self.vacant_indexes:
+            index = self.vacant_indexes.pop()
+            self.states[index] = STATE_CODES[job_record.state]
+            self.failures[index] = job_record.number_of_failures
+            self.db_ids[index * OBJECT_ID_SIZE: (index + 1) * OBJECT_ID_SIZE] = db_id
+            self.uow_ids[index * OBJECT_ID_SIZE: (index + 1) * OBJECT_ID_SIZE] = uow_id
+        else:
+            index = len(self.states)
+            self.states.append(STATE_CODES[job_record.state])
+            self.failures.append(job_record.number_of_failures)
+            self.db_ids += db_id
+            self.uow_ids += uow_id
+        return index
+
+    def thaw(self, index, process_name, timeperiod):
+        """ rebuilds the Job from the record and vacates the record
+            :return: <Job> instance """
+        assert self.states[index] != VACANT, f'record {index} of {process_name}@{timeperiod} is vacant'
+        uow_id = bytes(self.uow_ids[index * OBJECT_ID_SIZE: (index + 1) * OBJECT_ID_SIZE])
+        job_record = Job(db_id=bytes(self.db_ids[index * OBJECT_ID_SIZE: (index + 1) * OBJECT_ID_SIZE]).hex(),
+                         process_name=process_name,
+                         timeperiod=timeperiod,
+                         state=STATES[self.states[index]],
+                         related_unit_of_work=None if uow_id == NO_OBJECT_ID else uow_id.hex(),
+                         number_of_failures=self.failures[index])
+        self.release(index)
+        return job_record
+
+    def release(self, index):
+        """ vacates the record """
+        self.states[index] = VACANT
+        self.vacant_indexes.append(index)
@@ -10,6 +10,8 @@ from synergy.system.timeperiod_dict import TimeperiodDict
 
 
 class HierarchyEntry(object):
+    __slots__ = ('hierarchy', 'parent', 'process_entry', 'timeperiod_dict')
+
     def __init__(self, hierarchy, parent, process_entry: ManagedProcessEntry):
         self.hierarchy = hierarchy
         self.parent = parent
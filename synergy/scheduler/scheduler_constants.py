@@ -46,6 +46,7 @@ COLLECTION_MANAGED_PROCESS = 'managed_process'
 COLLECTION_FREERUN_PROCESS = 'freerun_process'
 COLLECTION_UNIT_OF_WORK = 'unit_of_work'
 COLLECTION_LOG_RECORDING = 'log_recording'
+COLLECTION_JOB_EVENT_LOG = 'job_event_log'
 
 COLLECTION_JOB_HOURLY = 'job_hourly'
 COLLECTION_JOB_DAILY = 'job_daily'
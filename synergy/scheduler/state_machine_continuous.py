@@ -22,6 +22,14 @@ class StateMachineContinuous(AbstractStateMachine):
         """ :return: True, as we allow multiple runs on a given timeperiod """
         return True
 
+    @property
+    def is_catchup_capable(self):
+        """ :return: True, since the job record in STATE_EMBRYO requires only a unit_of_work over its timeperiod """
+        return True
+
+    def _compute_catchup_job_state(self, job_record):
+        return self._compute_next_job_state(job_record)
+
     def notify(self, uow):
         tree = self.timetable.get_tree(uow.process_name)
         node = tree.get_node(uow.process_name, uow.timeperiod)
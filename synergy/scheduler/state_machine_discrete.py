@@ -22,6 +22,14 @@ class StateMachineDiscrete(AbstractStateMachine):
         """ :return: False, since there should be only 1 run for given timeperiod """
         return False
 
+    @property
+    def is_catchup_capable(self):
+        """ :return: True, since the job record in STATE_EMBRYO requires only a unit_of_work over its timeperiod """
+        return True
+
+    def _compute_catchup_job_state(self, job_record):
+        return job.STATE_IN_PROGRESS
+
     def notify(self, uow):
         tree = self.timetable.get_tree(uow.process_name)
         node = tree.get_node(uow.process_name, uow.timeperiod)
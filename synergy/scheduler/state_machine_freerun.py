@@ -10,9 +10,10 @@ from synergy.db.error import DuplicateKeyError
 from synergy.db.model import unit_of_work
 from synergy.db.model.freerun_process_entry import FreerunProcessEntry, MAX_NUMBER_OF_EVENTS
 from synergy.db.model.unit_of_work import UnitOfWork
-from synergy.scheduler.scheduler_constants import STATE_MACHINE_FREERUN
+from synergy.scheduler.scheduler_constants import STATE_MACHINE_FREERUN, PROCESS_SCHEDULER
 from synergy.system import time_helper
 from synergy.system.decorator import with_reconnect
+from synergy.system.mq_outbox import get_outbox
 from synergy.system.mq_transmitter import MqTransmitter
 from synergy.system.time_qualifier import QUALIFIER_REAL_TIME
 
@@ -23,7 +24,7 @@ class StateMachineFreerun(object):
     def __init__(self, logger, name=STATE_MACHINE_FREERUN):
         self.name = name
         self.logger = logger
-        self.mq_transmitter = MqTransmitter(self.logger)
+        self.mq_transmitter = MqTransmitter(self.logger, outbox=get_outbox(PROCESS_SCHEDULER))
         self.uow_dao = UnitOfWorkDao(self.logger)
         self.freerun_process_dao = FreerunProcessDao(self.logger)
 
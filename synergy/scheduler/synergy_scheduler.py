@@ -1,7 +1,6 @@
 __author__ = 'Bohdan Mushkevych'
 
 from datetime import datetime, timedelta
-from threading import Lock
 
 from synergy.conf import context
 from synergy.mx.synergy_mx import MX
@@ -10,7 +9,9 @@ from synergy.db.model.managed_process_entry import ManagedProcessEntry
 from synergy.db.model.freerun_process_entry import FreerunProcessEntry
 from synergy.db.dao.freerun_process_dao import FreerunProcessDao
 from synergy.system import time_helper
-from synergy.system.decorator import with_reconnect, thread_safe
+from synergy.system.decorator import with_reconnect
+from synergy.system.mq_outbox import get_outbox
+from synergy.system.serial_executor import SerialExecutor
 from synergy.system.synergy_process import SynergyProcess
 from synergy.scheduler.garbage_collector import GarbageCollector
 from synergy.scheduler.uow_status_listener import UowStatusListener
@@ -25,20 +26,27 @@ class Scheduler(SynergyProcess):
         - timetable: container for job tress and state machines
         - GarbageCollector: recycles failed/stalled unit of works
         - freerun and managed thread handlers: logic to trigger job execution
+        - tree executors: serial work queue per Timetable tree, that runs managed ticks and status updates
         - UowStatusListener: MQ Listener receiving UOW statuses from the workers
         - JobStatusListener: asynchronous intra-scheduler notification bus
         - MX: HTTP server with management UI """
 
     def __init__(self, process_name):
         super(Scheduler, self).__init__(process_name)
-        self.lock = Lock()
         self.logger.info('Initializing {0}...'.format(self.process_name))
         self.managed_handlers = dict()
         self.freerun_handlers = dict()
         self.timetable = Timetable(self.logger)
         self.freerun_process_dao = FreerunProcessDao(self.logger)
 
+        # work for every tree is executed in order by its own executor, while independent trees progress in parallel
+        # format: {tree_name: SerialExecutor}
+        self.tree_executors = {tree_name: SerialExecutor(f'TreeExecutor-{tree_name}')
+                               for tree_name in self.timetable.trees}
+        self.freerun_executor = SerialExecutor('FreerunExecutor')
+
         self.gc = GarbageCollector(self)
+        self.outbox = get_outbox(PROCESS_SCHEDULER)
         self.uow_listener = UowStatusListener(self)
         self.job_listener = JobStatusListener(self)
         self.mx = MX(self)
@@ -49,6 +57,8 @@ class Scheduler(SynergyProcess):
         self.uow_listener.stop()
         self.job_listener.stop()
         self.gc.stop()
+        if self.outbox is not None:
+            self.outbox.close()
 
         for key, handler in self.managed_handlers.items():
             handler.deactivate(update_persistent=False)
@@ -58,6 +68,10 @@ class Scheduler(SynergyProcess):
             handler.deactivate(update_persistent=False)
         self.freerun_handlers.clear()
 
+        for executor in self.tree_executors.values():
+            executor.shutdown(wait=False)
+        self.freerun_executor.shutdown(wait=False)
+
         super(Scheduler, self).__del__()
 
     def _register_process_entry(self, process_entry, call_back):
@@ -111,12 +125,23 @@ class Scheduler(SynergyProcess):
                 self.logger.error('Freerun Thread Handler {0} failed to start. Skipping it.'
                                   .format(freerun_entry.key), exc_info=True)
 
+    def _prewarm_publishers(self):
+        """ opens MQ channels of the active managed processes ahead of their first tick """
+        for process_name, handler in self.managed_handlers.items():
+            if not handler.process_entry.is_on:
+                continue
+            try:
+                self.state_machine_for(process_name).mq_transmitter.publishers.prewarm(process_name)
+            except Exception as e:
+                self.logger.warning(f'Unable to prewarm MQ publishers for {process_name}: {e}')
+
     @with_reconnect
     def start(self, *_):
         """ reads managed process entries and starts timer instances; starts dependant threads """
         self.logger.info('Starting Scheduler...')
         db_manager.synch_db()
         self._load_managed_entries()
+        self._prewarm_publishers()
 
         try:
             self._load_freerun_entries()
@@ -126,6 +151,10 @@ class Scheduler(SynergyProcess):
         # Scheduler is initialized and running. GarbageCollector can be safely started
         self.gc.start()
 
+        # messages kept in the outbox during a broker outage, including the previous run, are drained in background
+        if self.outbox is not None:
+            self.outbox.start()
+
         # Job/UOW Status Listeners can be safely started
         self.uow_listener.start()
         self.job_listener.start()
@@ -139,18 +168,26 @@ class Scheduler(SynergyProcess):
         process_entry = self.managed_handlers[process_name].process_entry
         return self.timetable.state_machines[process_entry.state_machine_name]
 
-    @thread_safe
+    def executor_for(self, process_name):
+        """ :return: <SerialExecutor> of the tree managing the given process """
+        tree = self.timetable.get_tree(process_name)
+        if tree is None:
+            raise ValueError(f'No Timetable tree is registered for process {process_name}')
+        return self.tree_executors[tree.tree_name]
+
     def fire_managed_worker(self, thread_handler_header):
+        """ queues the tick into the work queue of the process' tree.
+            a tick is coalesced with the one of the same process, that is still awaiting the execution
+            :return: <Future> of the tick execution """
+        process_name = thread_handler_header.process_entry.process_name
+        return self.executor_for(process_name).submit_once(thread_handler_header.key,
+                                                           self._fire_managed_worker, thread_handler_header)
+
+    def _fire_managed_worker(self, thread_handler_header):
         """ requests next valid job for given process and manages its state """
 
-        def _fire_worker(process_entry, prev_job_record):
-            assert isinstance(process_entry, ManagedProcessEntry)
-            job_record = self.timetable.get_next_job_record(process_entry.process_name)
-            state_machine = self.timetable.state_machines[process_entry.state_machine_name]
-            if job_record == prev_job_record:
-                # avoid the loop
-                return None
-
+        def _fire_job(process_entry, state_machine, job_record):
+            """ :return: True if the job record was passed to the state machine """
             if not state_machine.run_on_active_timeperiod:
                 time_qualifier = process_entry.time_qualifier
                 incremented_timeperiod = time_helper.increment_timeperiod(time_qualifier, job_record.timeperiod)
@@ -163,7 +200,7 @@ class Scheduler(SynergyProcess):
                                              job_record.process_name,
                                              job_record.timeperiod,
                                              dt_record_timestamp.strftime('%Y-%m-%d %H:%M:%S')))
-                    return None
+                    return False
 
             blocking_type = process_entry.blocking_type
             if blocking_type == BLOCKING_DEPENDENCIES:
@@ -174,25 +211,94 @@ class Scheduler(SynergyProcess):
                 state_machine.manage_job(job_record)
             else:
                 raise ValueError(f'Unknown managed process type {blocking_type}')
+            return True
+
+        def _fire_worker(process_entry, prev_job_record):
+            assert isinstance(process_entry, ManagedProcessEntry)
+            job_record = self.timetable.get_next_job_record(process_entry.process_name)
+            state_machine = self.timetable.state_machines[process_entry.state_machine_name]
+            if job_record == prev_job_record:
+                # avoid the loop
+                return None
 
+            if not _fire_job(process_entry, state_machine, job_record):
+                return None
             return job_record
 
+        def _fire_window_worker(process_entry, prev_job_record):
+            """ manages up to *max_in_flight* job records of the BLOCKING_NORMAL process at once
+                :return: the first job record of the window, if all job records of the window are finished """
+            job_records = self.timetable.get_next_job_records(process_entry.process_name,
+                                                              process_entry.max_in_flight)
+            state_machine = self.timetable.state_machines[process_entry.state_machine_name]
+            if job_records[0] == prev_job_record:
+                # avoid the loop
+                return None
+
+            for job_record in job_records:
+                if not _fire_job(process_entry, state_machine, job_record):
+                    # following timeperiods are not due either
+                    break
+
+            if all(job_record.is_finished for job_record in job_records):
+                return job_records[0]
+            return None
+
+        def _fire_catchup_worker(process_entry):
+            """ :return: True if the backlog of the process was handled by the bulk catch-up """
+            max_catchup_batch = process_entry.max_catchup_batch or 1
+            state_machine = self.timetable.state_machines[process_entry.state_machine_name]
+            if max_catchup_batch < 2 or not state_machine.is_catchup_capable:
+                return False
+
+            job_records = self.timetable.get_catchup_job_records(process_entry.process_name, max_catchup_batch)
+            job_records = state_machine.select_catchup_jobs(job_records)
+            if len(job_records) < 2:
+                # a single job record is managed by the regular flow
+                return False
+
+            self.logger.info(f'Catch-up of {len(job_records)} job records for {process_entry.process_name} '
+                             f'in [{job_records[0].timeperiod}:{job_records[-1].timeperiod}]')
+            state_machine.manage_embryo_jobs(job_records)
+            return True
+
         try:
             assert isinstance(thread_handler_header, ThreadHandlerHeader)
             self.logger.info(f'{thread_handler_header.key} {{')
 
-            job_record = _fire_worker(thread_handler_header.process_entry, None)
+            process_entry = thread_handler_header.process_entry
+            # units of work of the previous ticks, that were nacked or timed out by the MQ broker, go first.
+            # NOTICE: confirms are read without blocking, so that the ticks of other trees do not wait on the broker
+            self.timetable.state_machines[process_entry.state_machine_name].republish_unconfirmed_uows()
+
+            if _fire_catchup_worker(process_entry):
+                return
+
+            if process_entry.blocking_type == BLOCKING_NORMAL and (process_entry.max_in_flight or 1) > 1:
+                job_record = _fire_window_worker(process_entry, None)
+                while job_record:
+                    # if applicable, process next window of timeperiods
+                    job_record = _fire_window_worker(process_entry, job_record)
+                return
+
+            job_record = _fire_worker(process_entry, None)
             while job_record and job_record.is_finished:
                 # if applicable, process next timeperiod
-                job_record = _fire_worker(thread_handler_header.process_entry, job_record)
+                job_record = _fire_worker(process_entry, job_record)
 
         except Exception as e:
             self.logger.error(f'Exception: {e}', exc_info=True)
         finally:
             self.logger.info('}')
 
-    @thread_safe
     def fire_freerun_worker(self, thread_handler_header):
+        """ queues the tick into the free-run work queue.
+            a tick is coalesced with the one of the same process, that is still awaiting the execution
+            :return: <Future> of the tick execution """
+        return self.freerun_executor.submit_once(thread_handler_header.key,
+                                                 self._fire_freerun_worker, thread_handler_header)
+
+    def _fire_freerun_worker(self, thread_handler_header):
         """ fires free-run worker with no dependencies to track """
         try:
             assert isinstance(thread_handler_header, ThreadHandlerHeader)
@@ -4,7 +4,9 @@ from synergy.db.model.freerun_process_entry import FreerunProcessEntry
 from synergy.db.model.managed_process_entry import ManagedProcessEntry
 from synergy.db.dao.freerun_process_dao import FreerunProcessDao
 from synergy.db.dao.managed_process_dao import ManagedProcessDao
-from synergy.system.time_trigger_factory import parse_time_trigger_string
+from synergy.conf import settings
+from synergy.system.repeat_timer import RepeatTimer
+from synergy.system.time_trigger_factory import parse_time_trigger_string, phase_offset
 
 
 class ThreadHandlerHeader(object):
@@ -20,6 +22,9 @@ class ThreadHandlerHeader(object):
 class AbstractThreadHandler(object):
     """ ThreadHandler is a thread running within the Synergy Scheduler and triggering Scheduler's fire_XXX logic"""
 
+    # True if ticks of the *every NNN* timers are anchored to the wall-clock multiples of the interval
+    FIXED_RATE = False
+
     def __init__(self, logger, key, trigger_frequency, call_back, process_entry):
         assert isinstance(process_entry, (FreerunProcessEntry, ManagedProcessEntry))
 
@@ -29,8 +34,7 @@ class AbstractThreadHandler(object):
         self.call_back = call_back
         self.process_entry = process_entry
 
-        parsed_trigger_frequency, timer_klass = parse_time_trigger_string(trigger_frequency)
-        self.timer_instance = timer_klass(parsed_trigger_frequency, call_back, args=[self.header])
+        self.timer_instance = self._create_timer_instance(trigger_frequency)
         self.is_started = False
         self.is_terminated = False
 
@@ -43,6 +47,17 @@ class AbstractThreadHandler(object):
     def header(self):
         return ThreadHandlerHeader(self.key, self.trigger_frequency, self.process_entry)
 
+    def _create_timer_instance(self, trigger_frequency):
+        """ :return: timer instance for the trigger_frequency.
+            ticks of *every NNN* timers are staggered by the phase offset derived from the handler key """
+        parsed_trigger_frequency, timer_klass = parse_time_trigger_string(trigger_frequency)
+        if timer_klass is not RepeatTimer:
+            return timer_klass(parsed_trigger_frequency, self.call_back, args=[self.header])
+
+        phase = phase_offset(self.key, parsed_trigger_frequency) if settings.settings['tick_phase_offset'] else 0.0
+        return timer_klass(parsed_trigger_frequency, self.call_back, args=[self.header],
+                           phase=phase, jitter=settings.settings['tick_jitter_seconds'], fixed_rate=self.FIXED_RATE)
+
     @property
     def dao(self):
         raise NotImplementedError(f'property dao must be implemented by {self.__class__.__name__}')
@@ -52,8 +67,7 @@ class AbstractThreadHandler(object):
             return
 
         if self.is_terminated:
-            parsed_trigger_frequency, timer_klass = parse_time_trigger_string(self.trigger_frequency)
-            self.timer_instance = timer_klass(parsed_trigger_frequency, self.call_back, args=[self.header])
+            self.timer_instance = self._create_timer_instance(self.trigger_frequency)
 
         self.process_entry.is_on = True
         if update_persistent:
@@ -86,9 +100,8 @@ class AbstractThreadHandler(object):
             self.deactivate()
 
             # 2. create a new timer instance
-            parsed_trigger_frequency, timer_klass = parse_time_trigger_string(self.trigger_frequency)
-            self.timer_instance = timer_klass(parsed_trigger_frequency, self.call_back, args=[self.header])
             self.trigger_frequency = value
+            self.timer_instance = self._create_timer_instance(value)
 
             # 3. start if necessary
             if self.process_entry.is_on:
@@ -107,6 +120,11 @@ class AbstractThreadHandler(object):
     def is_alive(self):
         return self.timer_instance.is_alive()
 
+    @property
+    def tick_metrics(self):
+        """ :return: <TickMetrics> of the current timer instance """
+        return self.timer_instance.metrics
+
 
 class FreerunThreadHandler(AbstractThreadHandler):
     def __init__(self, logger, key, trigger_frequency, call_back, process_entry):
@@ -119,6 +137,8 @@ class FreerunThreadHandler(AbstractThreadHandler):
 
 
 class ManagedThreadHandler(AbstractThreadHandler):
+    FIXED_RATE = True
+
     def __init__(self, logger, key, trigger_frequency, call_back, process_entry):
         super(ManagedThreadHandler, self).__init__(logger, key, trigger_frequency, call_back, process_entry)
         self.managed_process_dao = ManagedProcessDao(self.logger)
@@ -1,24 +1,34 @@
 __author__ = 'Bohdan Mushkevych'
 
 import collections
-from datetime import datetime
-from threading import RLock
-
-from synergy.db.dao.job_dao import JobDao
+import heapq
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from threading import RLock, Event
+
+from synergy.db.dao.job_dao import JobDao, QUERY_GET_LIKE_TIMEPERIOD
+from synergy.db.model import job
 from synergy.db.model.job import Job
 from synergy.conf import context
 from synergy.conf import settings
 from synergy.system import time_helper, utils
 from synergy.system.time_qualifier import *
 from synergy.system.decorator import thread_safe
+from synergy.system.immutable_dict import ImmutableDict
 from synergy.scheduler.scheduler_constants import COLLECTION_JOB_HOURLY, COLLECTION_JOB_DAILY, \
     COLLECTION_JOB_MONTHLY, COLLECTION_JOB_YEARLY
 from synergy.scheduler.tree import MultiLevelTree
+from synergy.scheduler.event_log_store import EventLogStore
 from synergy.scheduler.state_machine_recomputing import StateMachineRecomputing
 from synergy.scheduler.state_machine_continuous import StateMachineContinuous
 from synergy.scheduler.state_machine_discrete import StateMachineDiscrete
 from synergy.scheduler.state_machine_freerun import StateMachineFreerun
 
+# marks the end of the job records stream, loaded by the Timetable
+END_OF_STREAM = object()
+
 
 class Timetable(object):
     """ Timetable holds all known process trees, where every node presents a timeperiod-driven job"""
@@ -27,6 +37,7 @@ class Timetable(object):
         self.lock = RLock()
         self.logger = logger
         self.job_dao = JobDao(self.logger)
+        self.event_log_store = EventLogStore(self.logger)
 
         # state_machines must be constructed before the trees
         self.state_machines = self._construct_state_machines()
@@ -35,7 +46,14 @@ class Timetable(object):
         # remember to enlist here all trees the system is working with
         self.trees = self._construct_trees_from_context()
 
-        self._register_dependencies()
+        # immutable index in format {process_name: MultiLevelTree}
+        self.process_trees = self._index_trees_by_process()
+
+        # immutable index in format {tree_name: tuple of MultiLevelTree that are dependent_on the tree}
+        self.dependant_trees = self._register_dependencies()
+
+        # immutable index in format {tree_name: tuple of tree names, whose locks guard the tree}
+        self.lock_groups = self._register_lock_groups()
         self.load_tree()
         self.build_trees()
         self.validate()
@@ -61,8 +79,19 @@ class Timetable(object):
             trees[tree_name] = tree
         return trees
 
+    def _index_trees_by_process(self):
+        """ :return: immutable dict in format <process_name: tree managing the process> """
+        process_trees = dict()
+        for tree_name, tree in self.trees.items():
+            for process_name in tree.process_hierarchy:
+                # in case a process is enlisted in several trees - the first tree takes precedence
+                process_trees.setdefault(process_name, tree)
+        return ImmutableDict(process_trees)
+
     def _register_dependencies(self):
-        """ register dependencies between trees"""
+        """ register dependencies between trees
+            :return: immutable dict in format <tree_name: tuple of trees that are dependent_on the tree> """
+        dependant_trees = collections.defaultdict(list)
         for tree_name, context_entry in context.timetable_context.items():
             tree = self.trees[tree_name]
             assert isinstance(tree, MultiLevelTree)
@@ -70,130 +99,234 @@ class Timetable(object):
                 dependent_on_tree = self.trees[dependent_on]
                 assert isinstance(dependent_on_tree, MultiLevelTree)
                 tree.register_dependent_on(dependent_on_tree)
+                dependant_trees[dependent_on].append(tree)
+        return ImmutableDict({tree_name: tuple(trees) for tree_name, trees in dependant_trees.items()})
+
+    def _register_lock_groups(self):
+        """ trees related by the dependencies, directly or transitively, form a lock group:
+            reprocess/skip cascades write into the dependant trees, while the dependent_on summaries read
+            the upstream ones. unrelated trees are guarded independently and are processed in parallel
+            :return: immutable dict in format <tree_name: tuple of the group's tree names in the ascending order> """
+        groups = {tree_name: {tree_name} for tree_name in self.trees}
+        for tree_name, trees in self.dependant_trees.items():
+            for tree in trees:
+                group = groups[tree_name] | groups[tree.tree_name]
+                for name in group:
+                    groups[name] = group
+        return ImmutableDict({tree_name: tuple(sorted(group)) for tree_name, group in groups.items()})
+
+    @contextmanager
+    def tree_lock(self, *trees):
+        """ acquires locks of the given trees' lock groups. locks are always acquired in the tree name order,
+            so that neither concurrent cascades, nor nested calls on the already held groups, can deadlock """
+        tree_names = sorted(set().union(*[self.lock_groups[tree.tree_name] for tree in trees]))
+        locks = [self.trees[tree_name].lock for tree_name in tree_names]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
 
     # *** node manipulation methods ***
-    def _find_dependant_trees(self, tree_obj):
-        """ returns list of trees that are dependent_on given tree_obj """
-        dependant_trees = []
-        for tree_name, tree in self.trees.items():
-            if tree_obj in tree.dependent_on:
-                dependant_trees.append(tree)
-        return dependant_trees
-
-    def _find_dependant_tree_nodes(self, node_a):
-        dependant_nodes = set()
-        for tree_b in self._find_dependant_trees(node_a.tree):
-            node_b = node_a.find_counterpart_in(tree_b)
-            if node_b is None:
-                continue
-            dependant_nodes.add(node_b)
-        return dependant_nodes
+    def get_dependant_trees(self, tree_obj):
+        """ :return: tuple of trees that are dependent_on given tree_obj """
+        return self.dependant_trees.get(tree_obj.tree_name, tuple())
+
+    def get_dependant_tree_nodes(self, node_a):
+        """ :return: set of nodes from the dependant trees that share timeperiod with the given node_a """
+        with self.tree_lock(node_a.tree):
+            dependant_nodes = set()
+            for tree_b in self.get_dependant_trees(node_a.tree):
+                node_b = node_a.find_counterpart_in(tree_b)
+                if node_b is None:
+                    continue
+                dependant_nodes.add(node_b)
+            return dependant_nodes
 
-    @thread_safe
     def reprocess_tree_node(self, tree_node, tx_context=None):
         """ method reprocesses the node and all its dependants and parent nodes """
-        if not tx_context:
-            # create transaction context if one was not provided
-            # format: {process_name: {timeperiod: AbstractTreeNode} }
-            tx_context = collections.defaultdict(dict)
+        with self.tree_lock(tree_node.tree):
+            if not tx_context:
+                # create transaction context if one was not provided
+                # format: {process_name: {timeperiod: AbstractTreeNode} }
+                tx_context = collections.defaultdict(dict)
+
+            if tree_node.parent is None:
+                # do not process 'root' - the only node that has None as 'parent'
+                return tx_context
+            if tree_node.timeperiod in tx_context[tree_node.process_name]:
+                # the node has already been marked for re-processing
+                return tx_context
+
+            if tree_node.job_record.is_embryo:
+                # the node does not require re-processing
+                pass
+            else:
+                state_machine_name = context.process_context[tree_node.process_name].state_machine_name
+                state_machine = self.state_machines[state_machine_name]
+                state_machine.reprocess_job(tree_node.job_record)
+
+            tx_context[tree_node.process_name][tree_node.timeperiod] = tree_node
+            tree_node.tree.rewind_frontier(tree_node)
+            self.reprocess_tree_node(tree_node.parent, tx_context)
+
+            dependant_nodes = self.get_dependant_tree_nodes(tree_node)
+            for node in dependant_nodes:
+                self.reprocess_tree_node(node, tx_context)
 
-        if tree_node.parent is None:
-            # do not process 'root' - the only node that has None as 'parent'
             return tx_context
-        if tree_node.timeperiod in tx_context[tree_node.process_name]:
-            # the node has already been marked for re-processing
-            return tx_context
-
-        if tree_node.job_record.is_embryo:
-            # the node does not require re-processing
-            pass
-        else:
-            state_machine_name = context.process_context[tree_node.process_name].state_machine_name
-            state_machine = self.state_machines[state_machine_name]
-            state_machine.reprocess_job(tree_node.job_record)
-
-        tx_context[tree_node.process_name][tree_node.timeperiod] = tree_node
-        self.reprocess_tree_node(tree_node.parent, tx_context)
 
-        dependant_nodes = self._find_dependant_tree_nodes(tree_node)
-        for node in dependant_nodes:
-            self.reprocess_tree_node(node, tx_context)
-
-        return tx_context
-
-    @thread_safe
     def skip_tree_node(self, tree_node, tx_context=None):
         """ method skips the node and all its dependants and child nodes """
-        if not tx_context:
-            # create transaction context if one was not provided
-            # format: {process_name: {timeperiod: AbstractTreeNode} }
-            tx_context = collections.defaultdict(dict)
+        with self.tree_lock(tree_node.tree):
+            if not tx_context:
+                # create transaction context if one was not provided
+                # format: {process_name: {timeperiod: AbstractTreeNode} }
+                tx_context = collections.defaultdict(dict)
+
+            if tree_node.timeperiod in tx_context[tree_node.process_name]:
+                # the node has already been marked for skipping
+                return tx_context
+
+            if tree_node.job_record.is_finished:
+                # the node is finished and does not require skipping
+                pass
+            else:
+                state_machine_name = context.process_context[tree_node.process_name].state_machine_name
+                state_machine = self.state_machines[state_machine_name]
+                state_machine.skip_job(tree_node.job_record)
+
+            tx_context[tree_node.process_name][tree_node.timeperiod] = tree_node
+            for timeperiod, node in tree_node.children.items():
+                self.skip_tree_node(node, tx_context)
+
+            dependant_nodes = self.get_dependant_tree_nodes(tree_node)
+            for node in dependant_nodes:
+                self.skip_tree_node(node, tx_context)
 
-        if tree_node.timeperiod in tx_context[tree_node.process_name]:
-            # the node has already been marked for skipping
             return tx_context
 
-        if tree_node.job_record.is_finished:
-            # the node is finished and does not require skipping
-            pass
-        else:
-            state_machine_name = context.process_context[tree_node.process_name].state_machine_name
-            state_machine = self.state_machines[state_machine_name]
-            state_machine.skip_job(tree_node.job_record)
-
-        tx_context[tree_node.process_name][tree_node.timeperiod] = tree_node
-        for timeperiod, node in tree_node.children.items():
-            self.skip_tree_node(node, tx_context)
-
-        dependant_nodes = self._find_dependant_tree_nodes(tree_node)
-        for node in dependant_nodes:
-            self.skip_tree_node(node, tx_context)
-
-        return tx_context
-
-    @thread_safe
     def assign_job_record(self, tree_node):
         """ - looks for an existing job record in the DB, and if not found
             - creates a job record in STATE_EMBRYO and bind it to the given tree node """
-        try:
-            job_record = self.job_dao.get_one(tree_node.process_name, tree_node.timeperiod)
-        except LookupError:
-            state_machine_name = context.process_context[tree_node.process_name].state_machine_name
-            state_machine = self.state_machines[state_machine_name]
-            job_record = state_machine.create_job(tree_node.process_name, tree_node.timeperiod)
-        tree_node.job_record = job_record
+        with self.tree_lock(tree_node.tree):
+            try:
+                job_record = self.job_dao.get_one(tree_node.process_name, tree_node.timeperiod)
+            except LookupError:
+                state_machine_name = context.process_context[tree_node.process_name].state_machine_name
+                state_machine = self.state_machines[state_machine_name]
+                job_record = state_machine.create_job(tree_node.process_name, tree_node.timeperiod)
+            tree_node.job_record = job_record
+
+    def assign_job_records(self, tree_nodes):
+        """ bulk counterpart of the *assign_job_record*:
+            - resolves existing job records with a single query per job collection
+            - creates missing job records in STATE_EMBRYO with a single unordered insert per job collection
+            and binds them to the given tree nodes """
+        tree_nodes = list(tree_nodes)
+        with self.tree_lock(*{tree_node.tree for tree_node in tree_nodes}):
+            nodes_by_collection = collections.defaultdict(dict)
+            for tree_node in tree_nodes:
+                collection_name = self.job_dao.get_collection_name(tree_node.process_name)
+                nodes_by_collection[collection_name][(tree_node.process_name, tree_node.timeperiod)] = tree_node
+
+            for collection_name, nodes in nodes_by_collection.items():
+                for job_record in self.job_dao.get_many(collection_name, list(nodes)):
+                    nodes.pop((job_record.process_name, job_record.timeperiod)).job_record = job_record
+
+                embryo_records = []
+                for (process_name, timeperiod), tree_node in nodes.items():
+                    state_machine_name = context.process_context[process_name].state_machine_name
+                    state_machine = self.state_machines[state_machine_name]
+                    embryo_records.append(state_machine.build_embryo_job(process_name, timeperiod))
+
+                # job records created concurrently are read back from the DB
+                duplicates = self.job_dao.insert_many(collection_name, embryo_records)
+                duplicates = {(job_record.process_name, job_record.timeperiod) for job_record in duplicates}
+                for job_record in self.job_dao.get_many(collection_name, list(duplicates)):
+                    nodes[(job_record.process_name, job_record.timeperiod)].job_record = job_record
+
+                for job_record in embryo_records:
+                    key = (job_record.process_name, job_record.timeperiod)
+                    if key not in duplicates:
+                        nodes[key].job_record = job_record
+
+                if embryo_records:
+                    self.logger.info(f'Created {len(embryo_records) - len(duplicates)} embryo Jobs '
+                                     f'in {collection_name}.')
 
     # *** Tree-manipulation methods ***
-    @thread_safe
     def get_tree(self, process_name):
-        """ return tree that is managing time-periods for given process"""
-        for tree_name, tree in self.trees.items():
-            if process_name in tree:
-                return tree
-
-    @thread_safe
-    def _build_tree_by_level(self, time_qualifier, collection_name, since):
-        """ method iterated thru all documents in all job collections and builds a tree of known system state"""
+        """ :return: tree that is managing time-periods for given process or None if no tree is managing it """
+        return self.process_trees.get(process_name)
+
+    def load_job_records(self, process_name, start_timeperiod, end_timeperiod):
+        """ :return: dict in format <timeperiod: Job> with job records of the given process
+            within [start_timeperiod : end_timeperiod] boundaries. used to fault in the cold tree nodes """
+        job_records = self.job_dao.get_range(process_name, start_timeperiod, end_timeperiod)
+        return {job_record.timeperiod: job_record for job_record in job_records}
+
+    def _stream_collection(self, collection_name, query, job_queue, cancel_event):
+        """ method streams job records from the collection into the bounded queue and terminates the stream
+            with the END_OF_STREAM marker. runs in the loader thread pool
+            :return: tuple (number of job records, load time in seconds) """
+        started_at = time.perf_counter()
+        number_of_records = 0
+        try:
+            batch_size = settings.settings['timetable_load_batch_size']
+            for job_record in self.job_dao.stream(collection_name, query, batch_size):
+                if not self._put(job_queue, job_record, cancel_event):
+                    break
+                number_of_records += 1
+        finally:
+            self._put(job_queue, END_OF_STREAM, cancel_event)
+        return number_of_records, time.perf_counter() - started_at
+
+    @staticmethod
+    def _put(job_queue, item, cancel_event):
+        """ blocks until the item is placed into the queue or the load is canceled
+            :return: False if the load was canceled """
+        while not cancel_event.is_set():
+            try:
+                job_queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _drain(job_queue, time_qualifier, collection_name):
+        """ :return: generator of tuples (time_qualifier, collection_name, job_record) read from the queue
+            until the END_OF_STREAM marker """
+        while True:
+            job_record = job_queue.get()
+            if job_record is END_OF_STREAM:
+                return
+            yield time_qualifier, collection_name, job_record
+
+    def _apply_job_records(self, tagged_records):
+        """ method binds job records, tagged with the time_qualifier and the collection_name of their origin,
+            to the tree nodes
+            :return: dict in format <collection_name: number of applied job records> """
         invalid_tree_records = dict()
         invalid_tq_records = dict()
+        applied_records = collections.Counter()
 
-        try:
-            job_records = self.job_dao.get_all(collection_name, since)
-            for job_record in job_records:
-                tree = self.get_tree(job_record.process_name)
-                if tree is None:
-                    utils.increment_family_property(job_record.process_name, invalid_tree_records)
-                    continue
-
-                job_time_qualifier = context.process_context[job_record.process_name].time_qualifier
-                if time_qualifier != job_time_qualifier:
-                    utils.increment_family_property(job_record.process_name, invalid_tq_records)
-                    continue
+        for time_qualifier, collection_name, job_record in tagged_records:
+            tree = self.get_tree(job_record.process_name)
+            if tree is None:
+                utils.increment_family_property(job_record.process_name, invalid_tree_records)
+                continue
 
-                tree.update_node(job_record)
+            job_time_qualifier = context.process_context[job_record.process_name].time_qualifier
+            if time_qualifier != job_time_qualifier:
+                utils.increment_family_property(job_record.process_name, invalid_tq_records)
+                continue
 
-        except LookupError:
-            self.logger.warning(f'No job records in {collection_name}.')
+            tree.update_node(job_record)
+            applied_records[collection_name] += 1
 
         for name, counter in invalid_tree_records.items():
             self.logger.warning(f'Skipping {counter} job records for {name} since no tree is handling it.')
@@ -201,73 +334,204 @@ class Timetable(object):
         for name, counter in invalid_tq_records.items():
             self.logger.warning(f'Skipping {counter} job records for {name} since the process '
                                 f'has different time qualifier.')
+        return applied_records
+
+    def _get_window_timeperiod(self):
+        """ :return: hourly timeperiod the hot window starts from, or None if the windowing is disabled """
+        hot_window_days = settings.settings['timetable_hot_window_days']
+        if not hot_window_days:
+            return None
+
+        start_timeperiod = time_helper.cast_to_time_qualifier(QUALIFIER_HOURLY,
+                                                              settings.settings['synergy_start_timeperiod'])
+        window_timeperiod = time_helper.increment_timeperiod(QUALIFIER_HOURLY,
+                                                             time_helper.actual_timeperiod(QUALIFIER_HOURLY),
+                                                             delta=-24 * hot_window_days)
+        return max(start_timeperiod, window_timeperiod)
 
     @thread_safe
     def load_tree(self):
         """ method iterates thru all objects older than synergy_start_timeperiod parameter in job collections
-        and loads them into this timetable"""
+        and loads them into this timetable.
+        should the *timetable_hot_window_days* be set - only the hot window and unfinished job records are loaded,
+        while the rest of the history is faulted in on demand.
+        job collections are streamed concurrently, while the job records are applied to the trees
+        by this thread in the timeperiod order. thus, parent nodes are updated ahead of their children """
         timeperiod = settings.settings['synergy_start_timeperiod']
-        yearly_timeperiod = time_helper.cast_to_time_qualifier(QUALIFIER_YEARLY, timeperiod)
-        monthly_timeperiod = time_helper.cast_to_time_qualifier(QUALIFIER_MONTHLY, timeperiod)
-        daily_timeperiod = time_helper.cast_to_time_qualifier(QUALIFIER_DAILY, timeperiod)
-        hourly_timeperiod = time_helper.cast_to_time_qualifier(QUALIFIER_HOURLY, timeperiod)
+        window_timeperiod = self._get_window_timeperiod()
+        if window_timeperiod is not None:
+            for tree_name, tree in self.trees.items():
+                bottom_time_qualifier = tree.process_hierarchy.bottom_process.time_qualifier
+                tree.window_timeperiod = time_helper.cast_to_time_qualifier(bottom_time_qualifier, window_timeperiod)
+
+        # merge of the streams is stable: a parent and its first child share the timeperiod,
+        # and the tie is resolved in favor of the stream that comes first, i.e. the coarser time qualifier
+        levels = [(QUALIFIER_YEARLY, COLLECTION_JOB_YEARLY),
+                  (QUALIFIER_MONTHLY, COLLECTION_JOB_MONTHLY),
+                  (QUALIFIER_DAILY, COLLECTION_JOB_DAILY),
+                  (QUALIFIER_HOURLY, COLLECTION_JOB_HOURLY)]
+
+        cancel_event = Event()
+        with ThreadPoolExecutor(max_workers=len(levels), thread_name_prefix='TimetableLoader') as executor:
+            futures = dict()
+            streams = []
+            for time_qualifier, collection_name in levels:
+                since = time_helper.cast_to_time_qualifier(time_qualifier, timeperiod)
+                query = {job.TIMEPERIOD: {'$gte': since}}
+                if window_timeperiod is not None:
+                    window_since = time_helper.cast_to_time_qualifier(time_qualifier, window_timeperiod)
+                    unfinished_query = QUERY_GET_LIKE_TIMEPERIOD(since, include_running=True, include_processed=False,
+                                                                 include_noop=False, include_failed=False)
+                    query = {'$or': [unfinished_query, {job.TIMEPERIOD: {'$gte': window_since}}]}
+
+                job_queue = queue.Queue(maxsize=settings.settings['timetable_load_batch_size'])
+                futures[collection_name] = executor.submit(self._stream_collection, collection_name, query,
+                                                           job_queue, cancel_event)
+                streams.append(self._drain(job_queue, time_qualifier, collection_name))
+
+            try:
+                applied_records = self._apply_job_records(
+                    heapq.merge(*streams, key=lambda tagged_record: tagged_record[2].timeperiod))
+            finally:
+                # loader threads blocked on the full queues are released, should the apply fail
+                cancel_event.set()
+
+        for collection_name, future in futures.items():
+            number_of_records, load_time = future.result()
+            if number_of_records == 0:
+                self.logger.warning(f'No job records in {collection_name}.')
+                continue
 
-        self._build_tree_by_level(QUALIFIER_HOURLY, COLLECTION_JOB_HOURLY, since=hourly_timeperiod)
-        self._build_tree_by_level(QUALIFIER_DAILY, COLLECTION_JOB_DAILY, since=daily_timeperiod)
-        self._build_tree_by_level(QUALIFIER_MONTHLY, COLLECTION_JOB_MONTHLY, since=monthly_timeperiod)
-        self._build_tree_by_level(QUALIFIER_YEARLY, COLLECTION_JOB_YEARLY, since=yearly_timeperiod)
+            self.logger.info(f'Loaded {number_of_records} job records from {collection_name} in {load_time:.2f} sec: '
+                             f'{number_of_records / max(load_time, 1e-6):.0f} records/sec; '
+                             f'{applied_records[collection_name]} applied to the trees.')
 
-    @thread_safe
     def build_trees(self):
-        """ method iterates thru all trees and ensures that all time-period nodes are created up till <utc_now>"""
+        """ method iterates thru all trees and ensures that all time-period nodes are created up till <utc_now>
+            as well as evicts cold finished subtrees, should the windowing be enabled """
         for tree_name, tree in self.trees.items():
-            tree.build_tree()
+            with self.tree_lock(tree):
+                tree.build_tree()
+                number_of_evicted = tree.evict_cold_nodes()
+            if number_of_evicted:
+                self.logger.info(f'Evicted {number_of_evicted} cold nodes from {tree_name}.')
 
-    @thread_safe
     def validate(self):
         """validates that none of nodes in tree is improperly finalized and that every node has job_record"""
         for tree_name, tree in self.trees.items():
-            tree.validate()
+            with self.tree_lock(tree):
+                tree.validate()
+
+    def validate_incremental(self):
+        """ validates only the nodes that have changed since the last validation.
+            @see MultiLevelTree.validate_incremental """
+        for tree_name, tree in self.trees.items():
+            with self.tree_lock(tree):
+                tree.validate_incremental()
+
+    def mark_dirty(self, job_record):
+        """ registers tree node of the given job record, as well as its counterparts in the dependant trees,
+            for the next incremental validation """
+        tree = self.get_tree(job_record.process_name)
+        if tree is None:
+            return
+
+        with self.tree_lock(tree):
+            node = tree.nodes.get((job_record.process_name, job_record.timeperiod))
+            if node is None:
+                return
+            # re-binding keeps the node in sync should its job record have been frozen meanwhile
+            node.job_record = job_record
+
+            for tree_b in self.get_dependant_trees(tree):
+                hierarchy_entry = tree_b.process_hierarchy.get_by_qualifier(node.time_qualifier)
+                if not hierarchy_entry:
+                    continue
+                node_b = tree_b.nodes.get((hierarchy_entry.process_entry.process_name, node.timeperiod))
+                if node_b is not None:
+                    tree_b.mark_dirty(node_b)
 
-    @thread_safe
     def dependent_on_summary(self, job_record):
         """ :return instance of <tree_node.DependencySummary> """
         assert isinstance(job_record, Job)
         tree = self.get_tree(job_record.process_name)
-        node = tree.get_node(job_record.process_name, job_record.timeperiod)
-        return node.dependent_on_summary()
+        with self.tree_lock(tree):
+            node = tree.get_node(job_record.process_name, job_record.timeperiod)
+            return node.dependent_on_summary()
 
     # *** Job manipulation methods ***
-    @thread_safe
     def skip_if_needed(self, job_record):
         """ method is called from abstract_state_machine.manage_job to notify about job's failed processing
             if should_skip_node returns True - the node's job_record is transferred to STATE_SKIPPED """
         tree = self.get_tree(job_record.process_name)
-        node = tree.get_node(job_record.process_name, job_record.timeperiod)
-        if tree.should_skip_tree_node(node):
-            self.skip_tree_node(node)
+        with self.tree_lock(tree):
+            node = tree.get_node(job_record.process_name, job_record.timeperiod)
+            if tree.should_skip_tree_node(node):
+                self.skip_tree_node(node)
 
-    @thread_safe
     def get_next_job_record(self, process_name):
         """ :returns: the next job record to work on for the given process"""
         tree = self.get_tree(process_name)
-        node = tree.get_next_node(process_name)
+        with self.tree_lock(tree):
+            node = tree.get_next_node(process_name)
 
-        if node.job_record is None:
-            self.assign_job_record(node)
-        return node.job_record
+            if node.job_record is None:
+                self.assign_job_record(node)
+            return node.job_record
+
+    def get_next_job_records(self, process_name, limit):
+        """ :returns: list of up to *limit* job records to work on concurrently for the given process,
+            starting with the one returned by the *get_next_job_record* """
+        tree = self.get_tree(process_name)
+        with self.tree_lock(tree):
+            nodes = tree.get_next_nodes(process_name, limit)
+
+            unassigned_nodes = [node for node in nodes if not node.has_job_record]
+            if unassigned_nodes:
+                self.assign_job_records(unassigned_nodes)
+            return [node.job_record for node in nodes if node is nodes[0] or not node.job_record.is_finished]
+
+    def get_catchup_job_records(self, process_name, limit):
+        """ :return: list of up to *limit* job records in STATE_EMBRYO, that form the backlog of the given process:
+            consecutive timeperiods starting with the next job record of the process.
+            the most recent finished timeperiod and the active one are not part of the backlog """
+        tree = self.get_tree(process_name)
+        time_qualifier = context.process_context[process_name].time_qualifier
+        horizon = time_helper.increment_timeperiod(time_qualifier, time_helper.actual_timeperiod(time_qualifier),
+                                                   delta=-1)
+
+        with self.tree_lock(tree):
+            node = tree.get_next_node(process_name)
+            nodes = [node]
+            timeperiod = node.timeperiod
+            while len(nodes) < limit:
+                timeperiod = time_helper.increment_timeperiod(time_qualifier, timeperiod)
+                if timeperiod >= horizon:
+                    break
+                nodes.append(tree.get_node(process_name, timeperiod))
+
+            unassigned_nodes = [node for node in nodes if not node.has_job_record]
+            if unassigned_nodes:
+                self.assign_job_records(unassigned_nodes)
+
+            job_records = []
+            for node in nodes:
+                if node.timeperiod >= horizon or not node.job_record.is_embryo or tree.should_skip_tree_node(node):
+                    break
+                job_records.append(node.job_record)
+            return job_records
 
-    @thread_safe
     def is_job_record_finalizable(self, job_record):
         """ :return: True, if the node and all its children are in [STATE_PROCESSED, STATE_SKIPPED, STATE_NOOP] """
         assert isinstance(job_record, Job)
         tree = self.get_tree(job_record.process_name)
-        node = tree.get_node(job_record.process_name, job_record.timeperiod)
-        return node.is_finalizable()
+        with self.tree_lock(tree):
+            node = tree.get_node(job_record.process_name, job_record.timeperiod)
+            return node.is_finalizable()
 
-    @thread_safe
     def add_log_entry(self, process_name, timeperiod, msg):
-        """ adds a log entry to the job{process_name@timeperiod}.event_log """
+        """ adds a log entry to the event log of the job{process_name@timeperiod} """
         tree = self.get_tree(process_name)
-        node = tree.get_node(process_name, timeperiod)
-        node.add_log_entry([datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'), msg])
+        with self.tree_lock(tree):
+            node = tree.get_node(process_name, timeperiod)
+            node.add_log_entry(msg)
@@ -1,9 +1,12 @@
 __author__ = 'Bohdan Mushkevych'
 
-from datetime import datetime
+import itertools
+from datetime import datetime, timedelta
+from threading import RLock
 
 from synergy.scheduler.process_hierarchy import ProcessHierarchy
 from synergy.scheduler.tree_node import TreeNode, RootNode, AbstractTreeNode
+from synergy.system.sorted_dict import SortedDict
 from synergy.conf import settings
 from synergy.system import time_helper
 from synergy.system.time_helper import cast_to_time_qualifier
@@ -43,6 +46,9 @@ class MultiLevelTree(AbstractTree):
         super(MultiLevelTree, self).__init__()
         self.process_hierarchy = ProcessHierarchy(*process_names)
 
+        # acquired by the Timetable along with the locks of the related trees. @see Timetable.tree_lock
+        self.lock = RLock()
+
         self.build_timeperiod = None
         self.validation_timestamp = None
         self.timetable = timetable
@@ -51,6 +57,28 @@ class MultiLevelTree(AbstractTree):
         self.mx_page = mx_page
         self.root = RootNode(self)
 
+        # flat index of all materialized nodes in format {(process_name, timeperiod): TreeNode}
+        # is kept in sync with the tree structure by the *_get_node* method, the only place where nodes are created
+        self.nodes = dict()
+
+        # frontier cursors in format {process_name: TreeNode}
+        # all siblings preceding the frontier node are known to be skipped by the *get_next_node*
+        # cursor advances as the job states change, and is rewound only by the reprocessing via *rewind_frontier*
+        self.frontier = dict()
+
+        # nodes whose job record, children or dependencies have changed since the last validation
+        self.dirty_nodes = set()
+
+        # leaves, whose job records were thawed on access and are due for compaction
+        self.thawed_nodes = set()
+
+        # nodes with timeperiods preceding the hot window are not built eagerly, but faulted in on demand
+        # None means that the whole history since synergy_start_timeperiod is kept in memory
+        self.window_timeperiod = None
+
+        # format: {node: datetime}, when the top-level node or the children block of the node was faulted in
+        self.faulted_at = dict()
+
     def __contains__(self, value):
         """
         :param value: process name
@@ -67,42 +95,46 @@ class MultiLevelTree(AbstractTree):
             # here, we work at yearly/linear level
             return None
 
-        parent_siblings = list(grandparent.children)
-        sorted_keys = sorted(parent_siblings)
-        index = sorted_keys.index(parent.timeperiod)
-        if index + 1 >= len(sorted_keys):
+        next_timeperiod = grandparent.children.successor(parent.timeperiod)
+        if next_timeperiod is None:
             return None
         else:
-            return grandparent.children[sorted_keys[index + 1]]
+            return grandparent.children[next_timeperiod]
 
-    def _get_next_child_node(self, parent):
+    def _get_next_child_node(self, parent, process_name):
         """
             Iterates among children of the given parent and looks for a suitable node to process
             In case given parent has no suitable nodes, a younger parent will be found
             and the logic will be repeated for him
+            Iteration starts from the process' frontier cursor, if the cursor is among the parent's children
         """
-        children_keys = list(parent.children)
-        sorted_keys = sorted(children_keys)
-        for key in sorted_keys:
-            node = parent.children[key]
+        cursor = self.frontier.get(process_name)
+        if cursor is not None and cursor.parent is parent:
+            candidates = parent.children.values_from(cursor.timeperiod)
+        else:
+            candidates = parent.children.values()
+
+        for node in candidates:
             if node.job_record is None:
                 self.timetable.assign_job_record(node)
+                self.frontier[process_name] = node
                 return node
             elif self.should_skip_tree_node(node):
                 continue
             elif node.job_record.is_active:
+                self.frontier[process_name] = node
                 return node
 
         # special case, when all children of the parent node are not suitable for processing
         new_parent = self._get_next_parent_node(parent)
         if new_parent is not None:
             # in case all nodes are processed or blocked - look for next valid parent node
-            return self._get_next_child_node(new_parent)
+            return self._get_next_child_node(new_parent, process_name)
         else:
             # if all valid parents are exploited - return current node
-            process_name = parent.children[sorted_keys[0]].process_name
-            time_qualifier = parent.children[sorted_keys[0]].time_qualifier
-            actual_timeperiod = time_helper.actual_timeperiod(time_qualifier)
+            last_child = parent.children[parent.children.last_key()]
+            self.frontier[process_name] = last_child
+            actual_timeperiod = time_helper.actual_timeperiod(last_child.time_qualifier)
             return self.get_node(process_name, actual_timeperiod)
 
     def _get_node(self, time_qualifier, timeperiod):
@@ -114,6 +146,12 @@ class MultiLevelTree(AbstractTree):
         :return: requested node; type <AbstractNode>
         """
         hierarchy_entry = self.process_hierarchy.get_by_qualifier(time_qualifier)
+        process_name = hierarchy_entry.process_entry.process_name
+        node = self.nodes.get((process_name, timeperiod))
+        if node is not None:
+            # fast path: the node and all of its ancestors are already materialized
+            return node
+
         if hierarchy_entry.parent:
             parent_time_qualifier = hierarchy_entry.parent.process_entry.time_qualifier
             parent_timeperiod = hierarchy_entry.parent.cast_timeperiod(timeperiod)
@@ -121,13 +159,144 @@ class MultiLevelTree(AbstractTree):
         else:
             parent = self.root
 
-        node = parent.children.get(timeperiod)
-        if node is None:
-            node = TreeNode(self, parent, hierarchy_entry.process_entry.process_name, timeperiod, None)
-            parent.children[timeperiod] = node
+        if parent.is_cold:
+            # faulting in the children block of the cold parent materializes the requested node as well
+            self.fault_in_children(parent)
+            node = self.nodes.get((process_name, timeperiod))
+            if node is not None:
+                return node
 
+        if parent is self.root and self.is_cold(timeperiod):
+            # top-level nodes have no children block to fault in, and are loaded one by one
+            job_record = self.timetable.load_job_records(process_name, timeperiod, timeperiod).get(timeperiod)
+            node = self._create_node(parent, process_name, timeperiod, job_record)
+            self.faulted_at[node] = datetime.utcnow()
+            return node
+        return self._create_node(parent, process_name, timeperiod, None)
+
+    def _create_node(self, parent, process_name, timeperiod, job_record):
+        """ creates a node, and registers it with the parent and the node index """
+        node = TreeNode(self, parent, process_name, timeperiod, job_record)
+        parent.children[timeperiod] = node
+        self.nodes[(process_name, timeperiod)] = node
+        if job_record is not None:
+            # job records loaded from the DB do not require validation
+            self.dirty_nodes.discard(node)
+            return node
+
+        # new timeperiod gives its older sibling a younger one, which the sibling's validation depends on
+        # cold sibling is not validated until its children are faulted in. @see TreeNode.validate
+        previous_timeperiod = time_helper.increment_timeperiod(node.time_qualifier, timeperiod, delta=-1)
+        sibling = parent.children.get(previous_timeperiod)
+        if sibling is not None and not sibling.is_cold:
+            self.mark_dirty(sibling)
         return node
 
+    def is_cold(self, timeperiod):
+        """ :return: True if the timeperiod starts before the hot window, and its node is faulted in on demand """
+        return self.window_timeperiod is not None and timeperiod < self.window_timeperiod
+
+    def fault_in_children(self, parent):
+        """ materializes the complete children block of the cold parent along with the job records from the DB.
+            completeness of the block is what keeps *is_finalizable* and *validate* correct for the cold nodes """
+        child_entry = self.process_hierarchy.get_child_by_qualifier(parent.time_qualifier)
+        process_name = child_entry.process_entry.process_name
+        time_qualifier = child_entry.process_entry.time_qualifier
+
+        # the block spans the parent's timeperiod, bounded by the synergy_start_timeperiod and the current time
+        timeperiod = child_entry.cast_timeperiod(max(parent.timeperiod, settings.settings['synergy_start_timeperiod']))
+        actual_timeperiod = time_helper.actual_timeperiod(time_qualifier)
+        timeperiods = []
+        while timeperiod <= actual_timeperiod and child_entry.parent.cast_timeperiod(timeperiod) == parent.timeperiod:
+            timeperiods.append(timeperiod)
+            timeperiod = time_helper.increment_timeperiod(time_qualifier, timeperiod)
+
+        # parent is marked warm upfront, as the children are registered via the *parent.children* property
+        parent.is_cold = False
+        try:
+            if timeperiods:
+                job_records = self.timetable.load_job_records(process_name, timeperiods[0], timeperiods[-1])
+                for timeperiod in timeperiods:
+                    if (process_name, timeperiod) not in self.nodes:
+                        self._create_node(parent, process_name, timeperiod, job_records.get(timeperiod))
+        except Exception:
+            # block is incomplete. next access to the children will repeat the fault-in
+            parent.is_cold = True
+            raise
+        self.faulted_at[parent] = datetime.utcnow()
+
+    def evict_cold_nodes(self):
+        """ method releases finished subtrees that lie entirely before the hot window
+            and were not faulted in during the last *timetable_cold_ttl_minutes*
+            :return: number of evicted nodes """
+        if self.window_timeperiod is None:
+            return 0
+
+        evicted = set()
+        expired_at = datetime.utcnow() - timedelta(minutes=settings.settings['timetable_cold_ttl_minutes'])
+        for node in list(self.root.children.values()):
+            if self._is_evictable(node, expired_at):
+                # top-level nodes are evicted one by one, since the root is never cold
+                if node.block_index is not None:
+                    self.root.leaf_block.release(node.block_index)
+                del self.root.children[node.timeperiod]
+                self._collect_subtree(node, evicted)
+            else:
+                self._evict_children(node, expired_at, evicted)
+
+        for node in evicted:
+            del self.nodes[(node.process_name, node.timeperiod)]
+            self.dirty_nodes.discard(node)
+            self.thawed_nodes.discard(node)
+            self.faulted_at.pop(node, None)
+        for process_name, cursor in list(self.frontier.items()):
+            if cursor in evicted:
+                del self.frontier[process_name]
+        return len(evicted)
+
+    def _evict_children(self, parent, expired_at, evicted):
+        """ evicts the whole children block of the parent, or looks for the evictable blocks among its children """
+        if parent.is_cold or len(parent.children) == 0 or not self.is_cold(parent.timeperiod):
+            return
+
+        if self._is_evictable(parent, expired_at):
+            for child in parent.children.values():
+                self._collect_subtree(child, evicted)
+            parent.children = SortedDict()
+            parent.leaf_block = None
+            parent.is_cold = True
+            self.faulted_at.pop(parent, None)
+        else:
+            for child in parent.children.values():
+                self._evict_children(child, expired_at, evicted)
+
+    def _is_evictable(self, node, expired_at):
+        """ :return: True if the node's timeperiod ends before the hot window, and its materialized subtree
+            is finished, validated and was not recently faulted in """
+        next_timeperiod = time_helper.increment_timeperiod(node.time_qualifier, node.timeperiod)
+        if next_timeperiod > self.window_timeperiod:
+            return False
+        if self.faulted_at.get(node, expired_at) > expired_at:
+            return False
+
+        nodes_to_visit = [node]
+        while nodes_to_visit:
+            node = nodes_to_visit.pop()
+            if node.job_record is None or not node.job_record.is_finished or node in self.dirty_nodes:
+                return False
+            if not node.is_cold:
+                nodes_to_visit.extend(node.children.values())
+        return True
+
+    def _collect_subtree(self, node, evicted):
+        """ adds the node and its materialized descendants to the *evicted* set """
+        nodes_to_visit = [node]
+        while nodes_to_visit:
+            node = nodes_to_visit.pop()
+            evicted.add(node)
+            if not node.is_cold:
+                nodes_to_visit.extend(node.children.values())
+
     def _get_next_node(self, time_qualifier):
         """ Method goes to the top of the tree and traverses from
             there in search of the next suitable node for processing
@@ -141,7 +310,7 @@ class MultiLevelTree(AbstractTree):
         else:
             parent = self.root
 
-        return self._get_next_child_node(parent)
+        return self._get_next_child_node(parent, hierarchy_entry.process_entry.process_name)
 
     def should_skip_tree_node(self, node: AbstractTreeNode):
         """ :return True: in case the node should be _skipped_ and not included into processing """
@@ -175,7 +344,7 @@ class MultiLevelTree(AbstractTree):
         time_qualifier = self.process_hierarchy.bottom_process.time_qualifier
         process_name = self.process_hierarchy.bottom_process.process_name
         if rebuild or self.build_timeperiod is None:
-            timeperiod = settings.settings['synergy_start_timeperiod']
+            timeperiod = self.window_timeperiod or settings.settings['synergy_start_timeperiod']
         else:
             timeperiod = self.build_timeperiod
 
@@ -196,26 +365,128 @@ class MultiLevelTree(AbstractTree):
         time_qualifier = self.process_hierarchy[process_name].process_entry.time_qualifier
         return self._get_next_node(time_qualifier)
 
+    def get_next_nodes(self, process_name, limit):
+        """ :return: list of up to *limit* nodes to process concurrently by a process with process_name:
+            the next node, followed by the nodes of consecutive timeperiods that are neither finished nor skipped.
+            timeperiods past the current one are not considered """
+        node = self.get_next_node(process_name)
+        nodes = [node]
+
+        time_qualifier = node.time_qualifier
+        actual_timeperiod = time_helper.actual_timeperiod(time_qualifier)
+        timeperiod = time_helper.increment_timeperiod(time_qualifier, node.timeperiod)
+        while len(nodes) < limit and timeperiod <= actual_timeperiod:
+            node = self.get_node(process_name, timeperiod)
+            if node.job_record is None or not self.should_skip_tree_node(node):
+                nodes.append(node)
+            timeperiod = time_helper.increment_timeperiod(time_qualifier, timeperiod)
+        return nodes
+
     def update_node(self, job_record):
         """ Updates job record property for a tree node associated with the given Job """
         if job_record.process_name not in self.process_hierarchy:
             raise ValueError(f'unable to update the node due to unknown process: {job_record.process_name}')
 
-        time_qualifier = self.process_hierarchy[job_record.process_name].process_entry.time_qualifier
-        node = self._get_node(time_qualifier, job_record.timeperiod)
+        node = self.nodes.get((job_record.process_name, job_record.timeperiod))
+        if node is None:
+            time_qualifier = self.process_hierarchy[job_record.process_name].process_entry.time_qualifier
+            node = self._get_node(time_qualifier, job_record.timeperiod)
         node.job_record = job_record
+        self.rewind_frontier(node)
+
+    def rewind_frontier(self, node):
+        """ moves the frontier cursor of the node's process back, should the node precede the cursor.
+            method is called whenever a node could have become eligible for processing again,
+            for instance - during the reprocessing or when a new job record is loaded """
+        cursor = self.frontier.get(node.process_name)
+        if cursor is None or cursor.timeperiod <= node.timeperiod:
+            return
+
+        if cursor.parent is node.parent:
+            # siblings preceding the node are known to be skipped
+            self.frontier[node.process_name] = node
+        else:
+            # nothing is known about the node's siblings. the next scan will start from the first sibling
+            del self.frontier[node.process_name]
 
     def get_node(self, process_name, timeperiod):
         """ Method retrieves a tree node identified by the time_qualifier and the timeperiod """
         if process_name not in self.process_hierarchy:
             raise ValueError(f'unable to retrieve the node due to unknown process: {process_name}')
 
+        node = self.nodes.get((process_name, timeperiod))
+        if node is not None:
+            return node
+
         time_qualifier = self.process_hierarchy[process_name].process_entry.time_qualifier
         return self._get_node(time_qualifier, timeperiod)
 
+    def mark_dirty(self, node):
+        """ registers the node for the next incremental validation """
+        self.dirty_nodes.add(node)
+
     def validate(self):
         """ method starts validation of the tree.
             @see TreeNode.validate """
+        # job records of the new nodes are resolved in bulk, rather than one by one during the traversal
+        self.timetable.assign_job_records([node for node in self.nodes.values() if not node.has_job_record])
+
         for timeperiod, child in self.root.children.items():
-            child.validate()
+            if not child.is_cold:
+                child.validate()
+            elif child.job_record is None:
+                self.timetable.assign_job_record(child)
+
+        # full validation has visited every node, including the ones it has marked dirty itself
+        self.dirty_nodes.clear()
+
+        bottom_process_name = self.process_hierarchy.bottom_process.process_name
+        self._compact(node for (process_name, _), node in self.nodes.items() if process_name == bottom_process_name)
+        self.validation_timestamp = datetime.utcnow()
+
+    def validate_incremental(self):
+        """ method validates only the nodes that have changed since the last validation and their ancestors.
+            nodes are visited bottom-up, so that every parent inspects already validated children
+            @see TreeNode.validate """
+        # nodes marked dirty during this pass are carried over to the next one
+        dirty_nodes, self.dirty_nodes = self.dirty_nodes, set()
+
+        nodes_to_validate = set()
+        for node in dirty_nodes:
+            while node.parent is not None and node not in nodes_to_validate:
+                nodes_to_validate.add(node)
+                node = node.parent
+
+        # job records of the new nodes and of their siblings are resolved in bulk
+        unassigned_nodes = set()
+        for node in nodes_to_validate:
+            if not node.has_job_record:
+                unassigned_nodes.add(node)
+            unassigned_nodes.update(child for child in node.children.values() if not child.has_job_record)
+        self.timetable.assign_job_records(unassigned_nodes)
+
+        levels = {process_name: level for level, process_name in enumerate(self.process_hierarchy)}
+        bottom_level = len(levels) - 1
+        leaves = []
+        for node in sorted(nodes_to_validate, key=lambda x: (-levels[x.process_name], x.timeperiod)):
+            node.validate(recursive=False)
+
+            # leaves are compacted once validated. parents' validation inspects, and thus thaws, their leaves
+            if levels[node.process_name] == bottom_level:
+                leaves.append(node)
+            elif levels[node.process_name] == bottom_level - 1:
+                leaves.extend(node.children.values())
+
+        self._compact(leaves)
         self.validation_timestamp = datetime.utcnow()
+
+    def _compact(self, leaves):
+        """ freezes finished job records of the given and recently thawed leaf nodes,
+            unless the nodes are awaiting validation
+            @see TreeNode.freeze """
+        thawed_nodes, self.thawed_nodes = self.thawed_nodes, set()
+        for node in itertools.chain(leaves, thawed_nodes):
+            if node.block_index is not None or node in self.dirty_nodes:
+                continue
+            if node.job_record is not None and node.job_record.is_finished:
+                node.freeze()
@@ -2,15 +2,21 @@ __author__ = 'Bohdan Mushkevych'
 
 from logging import INFO
 
-from synergy.db.model import job
 from synergy.system import time_helper
 from synergy.system.immutable_dict import ImmutableDict
+from synergy.system.sorted_dict import SortedDict
 from synergy.conf import context
+from synergy.scheduler.leaf_block import LeafBlock
+
+# children of every leaf node. shared, since it is immutable
+LEAF_CHILDREN = ImmutableDict({})
 
 
 class DependentOnSummary(object):
     """ This structure is compiled to represent a composite state of dependent_on TreeNodes """
 
+    __slots__ = ('tree_node', 'unfinished', 'unprocessed', 'unhealthy', 'skipped')
+
     def __init__(self, tree_node):
         self.tree_node = tree_node
 
@@ -82,16 +88,76 @@ class DependentOnSummary(object):
 
 
 class AbstractTreeNode(object):
+    __slots__ = ('tree', 'parent', 'process_name', 'timeperiod', 'time_qualifier', 'is_cold',
+                 '_job_record', '_children', 'block_index', 'leaf_block')
+
     def __init__(self, tree, parent, process_name, timeperiod, job_record):
         self.tree = tree
         self.parent = parent
         self.process_name = process_name
         self.timeperiod = timeperiod
+
+        # index of the node's job record in the parent's leaf_block, or None if the job record is not frozen
+        self.block_index = None
+        # compact storage of the frozen job records of the node's leaf children
+        self.leaf_block = None
         self.job_record = job_record
 
+        # True while the children block of the node predates the tree's hot window and is not yet materialized
+        self.is_cold = False
+
         # fields self.time_qualifier and self.children are properly set in the child class
         self.time_qualifier = None
-        self.children = ImmutableDict({})
+        self.children = LEAF_CHILDREN
+
+    @property
+    def children(self):
+        if self.is_cold:
+            # children block is faulted in from the DB on the first access
+            self.tree.fault_in_children(self)
+        return self._children
+
+    @children.setter
+    def children(self, value):
+        self._children = value
+
+    @property
+    def job_record(self):
+        if self.block_index is not None:
+            # frozen job record is rebuilt on demand
+            self._job_record = self.parent.leaf_block.thaw(self.block_index, self.process_name, self.timeperiod)
+            self.block_index = None
+            self.tree.thawed_nodes.add(self)
+        return self._job_record
+
+    @property
+    def has_job_record(self):
+        """ :return: True if a job record is bound to the node. unlike *job_record* does not thaw a frozen record """
+        return self._job_record is not None or self.block_index is not None
+
+    @job_record.setter
+    def job_record(self, value):
+        """ binding of a new job record to the node registers the node for the incremental validation """
+        if self.block_index is not None:
+            self.parent.leaf_block.release(self.block_index)
+            self.block_index = None
+        self._job_record = value
+        if self.parent is not None:
+            self.tree.mark_dirty(self)
+
+    def freeze(self):
+        """ moves the leaf node's job record into the compact storage of the parent node
+            :return: True if the job record was frozen """
+        if self.block_index is not None:
+            return True
+        if self._job_record is None or not LeafBlock.is_freezable(self._job_record):
+            return False
+
+        if self.parent.leaf_block is None:
+            self.parent.leaf_block = LeafBlock()
+        self.block_index = self.parent.leaf_block.freeze(self._job_record)
+        self._job_record = None
+        return True
 
     def is_finalizable(self):
         """method checks whether:
@@ -111,11 +177,14 @@ class AbstractTreeNode(object):
 
         return children_processed and self.job_record.is_active
 
-    def validate(self):
+    def validate(self, recursive=True):
         """method traverse tree and performs following activities:
         * requests a job record in STATE_EMBRYO if no job record is currently assigned to the node
         * requests nodes for reprocessing, if STATE_PROCESSED node relies on unfinalized nodes
-        * requests node for skipping if it is daily node and all 24 of its Hourly nodes are in STATE_SKIPPED state"""
+        * requests node for skipping if it is daily node and all 24 of its Hourly nodes are in STATE_SKIPPED state
+        :param recursive: if False - children are inspected, but are not validated themselves.
+            used by the incremental validation, that visits the changed nodes bottom-up.
+            NOTICE: recursion does not descend into the cold nodes, i.e. nodes with not yet faulted in children """
 
         # step 1: request Job record if current one is not set
         if self.job_record is None:
@@ -129,7 +198,11 @@ class AbstractTreeNode(object):
         all_children_skipped = True
         all_children_finished = True
         for timeperiod, child in self.children.items():
-            child.validate()
+            if recursive and not child.is_cold:
+                # cold nodes are validated once their children are faulted in
+                child.validate()
+            elif child.job_record is None:
+                self.tree.timetable.assign_job_record(child)
 
             if child.job_record.is_active:
                 all_children_finished = False
@@ -154,13 +227,10 @@ class AbstractTreeNode(object):
                 and not self.job_record.is_skipped:
             self.tree.timetable.skip_tree_node(self)
 
-    def add_log_entry(self, entry):
-        """ :db.model.job record holds event log, that can be accessed by MX
-            this method adds a record and removes oldest one if necessary """
-        event_log = self.job_record.event_log
-        if len(event_log) > job.EVENT_LOG_MAX_SIZE:
-            del event_log[-1]
-        event_log.insert(0, entry)
+    def add_log_entry(self, msg):
+        """ registers the message in the job's event log, that can be accessed by MX
+            event log is kept by the Timetable's EventLogStore, rather than by the job record """
+        self.tree.timetable.event_log_store.append(self.job_record, msg)
 
     def find_counterpart_in(self, tree_b):
         """ Finds a TreeNode counterpart for this node in tree_b
@@ -205,16 +275,19 @@ class AbstractTreeNode(object):
 
 
 class TreeNode(AbstractTreeNode):
+    __slots__ = ()
+
     def __init__(self, tree, parent, process_name, timeperiod, job_record):
         super(TreeNode, self).__init__(tree, parent, process_name, timeperiod, job_record)
         self.time_qualifier = context.process_context[process_name].time_qualifier
 
         child_hierarchy_entry = tree.process_hierarchy.get_child_by_qualifier(self.time_qualifier)
         if child_hierarchy_entry:
-            children = dict()
+            children = SortedDict()
+            self.is_cold = tree.is_cold(timeperiod)
         else:
             # this is the bottom process of the process hierarchy with no children
-            children = ImmutableDict({})
+            children = LEAF_CHILDREN
         self.children = children
 
     def __str__(self) -> str:
@@ -223,10 +296,12 @@ class TreeNode(AbstractTreeNode):
 
 
 class RootNode(AbstractTreeNode):
+    __slots__ = ()
+
     def __init__(self, tree):
         super(RootNode, self).__init__(tree, None, None, None, None)
         self.time_qualifier = None
-        self.children = dict()
+        self.children = SortedDict()
 
     def __str__(self) -> str:
         return f'{self.tree.tree_name}.root'
@@ -29,11 +29,45 @@ class UowStatusListener(object):
         except Exception as e:
             self.logger.error(f'UowStatusListener: Exception caught while closing Flopsy Consumer: {e}')
 
+    def _notify(self, uow):
+        """ method updates the job, corresponding to the given unit of work.
+            runs in the work queue of the unit of work's tree, thus in order with the tree's managed ticks """
+        tree = self.timetable.get_tree(uow.process_name)
+        node = tree.get_node(uow.process_name, uow.timeperiod)
+
+        if uow.db_id != node.job_record.related_unit_of_work:
+            self.logger.info('Received transmission is likely outdated. Ignoring it.')
+            return
+
+        if not uow.is_finished:
+            # rely on Garbage Collector to re-trigger the failing unit_of_work
+            self.logger.info('Received transmission from {0}@{1} in non-final state {2}. Ignoring it.'
+                             .format(uow.process_name, uow.timeperiod, uow.state))
+            return
+
+        state_machine = self.scheduler.state_machine_for(node.process_name)
+        self.logger.info('Commencing StateMachine.notify with UOW from {0}@{1} in {2}.'
+                         .format(uow.process_name, uow.timeperiod, uow.state))
+        state_machine.notify(uow)
+
+    def _notified(self, future, message):
+        """ method is called by the tree's work queue, once the *_notify* is complete
+            and hands the message acknowledgement over to the consumer thread """
+        try:
+            future.result()
+        except KeyError:
+            self.logger.error(f'Access error for {message.body}', exc_info=True)
+        except Exception:
+            self.logger.error(f'Error during StateMachine.notify call {message.body}', exc_info=True)
+        finally:
+            self.consumer.acknowledge_deferred(message.delivery_tag)
+
     # ********************** thread-related methods ****************************
     def _mq_callback(self, message):
         """ method processes messages from Synergy Worker and updates corresponding Timetable record,
             as well as the job itself
             :param message: <MqTransmission> mq message """
+        is_deferred = False
         try:
             self.logger.info('UowStatusListener {')
 
@@ -44,30 +78,20 @@ class UowStatusListener(object):
                                  .format(uow.unit_of_work_type))
                 return
 
-            tree = self.timetable.get_tree(uow.process_name)
-            node = tree.get_node(uow.process_name, uow.timeperiod)
-
-            if uow.db_id != node.job_record.related_unit_of_work:
-                self.logger.info('Received transmission is likely outdated. Ignoring it.')
-                return
-
-            if not uow.is_finished:
-                # rely on Garbage Collector to re-trigger the failing unit_of_work
-                self.logger.info('Received transmission from {0}@{1} in non-final state {2}. Ignoring it.'
-                                 .format(uow.process_name, uow.timeperiod, uow.state))
-                return
-
-            state_machine = self.scheduler.state_machine_for(node.process_name)
-            self.logger.info('Commencing StateMachine.notify with UOW from {0}@{1} in {2}.'
-                             .format(uow.process_name, uow.timeperiod, uow.state))
-            state_machine.notify(uow)
+            # message is acknowledged once the tree's work queue has processed it.
+            # listener moves on to the messages of other trees in the meantime
+            future = self.scheduler.executor_for(uow.process_name).submit(self._notify, uow)
+            self.consumer.defer_acknowledgement(message.delivery_tag)
+            is_deferred = True
+            future.add_done_callback(lambda f: self._notified(f, message))
 
         except KeyError:
             self.logger.error(f'Access error for {message.body}', exc_info=True)
         except Exception:
             self.logger.error(f'Error during StateMachine.notify call {message.body}', exc_info=True)
         finally:
-            self.consumer.acknowledge(message.delivery_tag)
+            if not is_deferred:
+                self.consumer.acknowledge(message.delivery_tag)
             self.logger.info('UowStatusListener }')
 
     def _run_mq_listener(self):
@@ -0,0 +1,94 @@
+__author__ = 'Bohdan Mushkevych'
+
+from collections import deque
+from datetime import datetime
+from threading import Lock
+
+from synergy.conf import settings, context
+from synergy.mq.flopsy import QueueDepthProbe
+from synergy.system.decorator import thread_safe
+
+# number of the most recent throttling decisions kept for the MX
+MAX_NUMBER_OF_DECISIONS = 128
+
+
+class AdmissionError(Exception):
+    """ raised when a new unit of work is held back, since the worker queue of its process is too deep """
+    pass
+
+
+class AdmissionControl(object):
+    """ holds back new units of work for the processes, whose worker queue is too deep:
+        process is throttled once its queue reaches the *mq_queue_high_water_mark*
+        and resumes once the queue drains to the *mq_queue_low_water_mark*.
+        process is admitted whenever its queue depth can not be probed """
+
+    def __init__(self, probe=None):
+        self.probe = probe if probe is not None else QueueDepthProbe()
+        self.lock = Lock()
+
+        # format: {process_name: {'is_throttled': bool, 'message_count': int, 'error': str, 'changed_at': datetime}}
+        self.states = dict()
+
+        # the most recent transitions between the throttled and the admitted states
+        self.decisions = deque(maxlen=MAX_NUMBER_OF_DECISIONS)
+
+    def is_admitted(self, process_name):
+        """ :return: True if new units of work for the given process can be published """
+        high_water_mark = settings.settings['mq_queue_high_water_mark']
+        if not high_water_mark:
+            return True
+        low_water_mark = min(settings.settings['mq_queue_low_water_mark'], high_water_mark)
+
+        # the broker round-trip is made outside of the lock, so that the other processes and the MX are not held
+        try:
+            mq_queue_name = context.process_context[process_name].mq_queue
+            message_count, error = self.probe.message_count(mq_queue_name), None
+        except Exception as e:
+            message_count, error = None, str(e)
+
+        with self.lock:
+            state = self.states.setdefault(process_name, {'is_throttled': False, 'message_count': None,
+                                                          'error': None, 'changed_at': None})
+            state['message_count'] = message_count
+            state['error'] = error
+            if error is not None:
+                return True
+
+            if not state['is_throttled'] and message_count >= high_water_mark:
+                self._change_state(process_name, state, is_throttled=True)
+            elif state['is_throttled'] and message_count <= low_water_mark:
+                self._change_state(process_name, state, is_throttled=False)
+            return not state['is_throttled']
+
+    def _change_state(self, process_name, state, is_throttled):
+        state['is_throttled'] = is_throttled
+        state['changed_at'] = datetime.utcnow()
+        self.decisions.append({'process_name': process_name,
+                               'is_throttled': is_throttled,
+                               'message_count': state['message_count'],
+                               'changed_at': state['changed_at'].strftime('%Y-%m-%d %H:%M:%S')})
+
+    @thread_safe
+    def process_document(self, process_name):
+        """ :return: dict describing the most recent admission state of the given process """
+        state = self.states.get(process_name)
+        if state is None:
+            return {'is_throttled': False, 'message_count': None, 'error': None, 'changed_at': None}
+        changed_at = state['changed_at'].strftime('%Y-%m-%d %H:%M:%S') if state['changed_at'] else None
+        return dict(state, changed_at=changed_at)
+
+    @property
+    def document(self):
+        return {'high_water_mark': settings.settings['mq_queue_high_water_mark'],
+                'low_water_mark': settings.settings['mq_queue_low_water_mark'],
+                'processes': {process_name: self.process_document(process_name) for process_name in list(self.states)},
+                'decisions': list(self.decisions)}
+
+
+_admission_control = AdmissionControl()
+
+
+def get_admission_control():
+    """ :return: AdmissionControl instance shared by the state machines and the Garbage Collector """
+    return _admission_control
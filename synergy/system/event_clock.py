@@ -1,12 +1,17 @@
 __author__ = 'Bohdan Mushkevych'
 
-from datetime import datetime, timedelta
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 
-from synergy.system.repeat_timer import RepeatTimer
+from synergy.system.repeat_timer import TickMetrics
+from synergy.system.timer_dispatcher import get_dispatcher
 
 TIME_OF_DAY_FORMAT = "%H:%M"
 EVERY_DAY = '*'        # marks every day as suitable to trigger the event
-TRIGGER_INTERVAL = 30  # half a minute
+
+# event is skipped, rather than fired late, if the clock has jumped past it by more than the grace period
+MISFIRE_GRACE_PERIOD = timedelta(minutes=1)
 
 
 class EventTime(object):
@@ -51,7 +56,8 @@ class EventTime(object):
         def wind_days(start_date):
             while True:
                 if self.day_of_week == EVERY_DAY or start_date.weekday() == int(self.day_of_week):
-                    return start_date.replace(hour=self.time_of_day.hour, minute=self.time_of_day.minute)
+                    return start_date.replace(hour=self.time_of_day.hour, minute=self.time_of_day.minute,
+                                              second=0, microsecond=0)
                 else:
                     start_date += timedelta(days=1)
 
@@ -68,41 +74,111 @@ class EventTime(object):
 
 class EventClock(object):
     """ This class triggers on predefined time set in format 'day_of_week-HH:MM' or 'HH:MM'
-    Maintaining API compatibility with the RepeatTimer class """
+    Maintaining API compatibility with the RepeatTimer class.
+    EventClock computes the exact time of the next event and schedules it with the shared TimerDispatcher,
+    so an idle clock neither polls nor holds a thread """
 
-    def __init__(self, interval, call_back, args=None, kwargs=None):
+    def __init__(self, interval, call_back, daemonic=None, args=None, kwargs=None):
         if not kwargs: kwargs = {}
         if not args: args = []
 
+        if daemonic is None:
+            daemonic = threading.current_thread().daemon
+        self.dispatcher = get_dispatcher(daemonic)
+        # source of the current UTC time. replaced by Unit Tests with a virtual clock
+        self.clock = datetime.utcnow
+
+        self.lock = threading.RLock()
+        self.is_started = False
+        self.is_cancelled = False
+        # datetime of the scheduled event and the dispatcher entry of its countdown
+        self.next_fire_dt = None
+        self.__entry = None
+        # True if the *trigger* call was requested and has not yet started
+        self.is_trigger_pending = False
+
         self.timestamps = []
         self.change_interval(interval)
 
         self.args = args
         self.kwargs = kwargs
         self.call_back = call_back
-        self.handler = RepeatTimer(TRIGGER_INTERVAL, self.manage_schedule)
         self.activation_dt = None
+        self.metrics = TickMetrics()
 
     def _trigger_now(self):
-        if self.activation_dt is not None and datetime.utcnow() - self.activation_dt < timedelta(minutes=1):
+        utc_now = self.clock()
+        if self.activation_dt is not None and utc_now - self.activation_dt < timedelta(minutes=1):
             # the event was already triggered within 1 minute. no need to trigger it again
             return
         self.call_back(*self.args, **self.kwargs)
-        self.activation_dt = datetime.utcnow()
+        self.activation_dt = utc_now
+
+    def _next_event(self, utc_now):
+        """ :return: datetime of the earliest event strictly after the utc_now """
+        # events are set with minute precision, so shifting by a microsecond excludes only the event at utc_now
+        utc_now += timedelta(microseconds=1)
+        return min(event_time.next_trigger_frequency(utc_now) for event_time in self.timestamps)
+
+    def _arm(self, utc_now):
+        """ schedules the countdown to the next event. must be called under the self.lock """
+        if self.__entry is not None:
+            self.dispatcher.cancel(self.__entry)
+        self.next_fire_dt = self._next_event(utc_now)
+        fire_at = self.next_fire_dt.replace(tzinfo=timezone.utc).timestamp()
+        self.__entry = self.dispatcher.schedule(fire_at, self.manage_schedule)
 
     def manage_schedule(self, *_):
-        current_time = EventTime.utc_now()
-        if current_time in self.timestamps:
-            self._trigger_now()
+        with self.lock:
+            if self.is_cancelled:
+                return
+            self.__entry = None
+            fire_dt = self.next_fire_dt
+
+        utc_now = self.clock()
+        try:
+            if utc_now < fire_dt:
+                # clock was turned back after the countdown was armed
+                return
+            if utc_now - fire_dt < MISFIRE_GRACE_PERIOD:
+                started_at = time.time()
+                self._trigger_now()
+                self.metrics.register(lag=(utc_now - fire_dt).total_seconds(), duration=time.time() - started_at)
+            # otherwise the clock has jumped past the event. the event is skipped, as it is with the missed minute
+        finally:
+            with self.lock:
+                if not self.is_cancelled and self.__entry is None:
+                    self._arm(utc_now)
 
     def start(self):
-        self.handler.start()
+        with self.lock:
+            if self.is_started:
+                raise RuntimeError('timer can only be started once')
+            self.is_started = True
+            self._arm(self.clock())
 
     def cancel(self):
-        self.handler.cancel()
+        with self.lock:
+            self.is_cancelled = True
+            if self.__entry is not None:
+                self.dispatcher.cancel(self.__entry)
+                self.__entry = None
 
     def trigger(self):
-        current_time = EventTime.utc_now()
+        """ requests the immediate call_back and returns without waiting for it.
+            the request is coalesced with the one still awaiting the execution """
+        with self.lock:
+            if self.is_trigger_pending:
+                return
+            self.is_trigger_pending = True
+        self.dispatcher.schedule(self.clock().replace(tzinfo=timezone.utc).timestamp(), self._run_triggered)
+
+    def _run_triggered(self):
+        with self.lock:
+            self.is_trigger_pending = False
+
+        utc_now = self.clock()
+        current_time = EventTime('{0}-{1}'.format(utc_now.weekday(), utc_now.strftime(TIME_OF_DAY_FORMAT)))
         if current_time not in self.timestamps:
             self._trigger_now()
         else:
@@ -110,31 +186,31 @@ class EventClock(object):
             pass
 
     def change_interval(self, value):
-        """ :param value: list of strings in format 'Day_of_Week-HH:MM' """
+        """ :param value: list of strings in format 'Day_of_Week-HH:MM'
+            countdown of the running clock is re-armed to the next event from the new list """
         assert not isinstance(value, str)
-        self.timestamps = []
+        timestamps = []
 
         for timestamp in value:
             event = EventTime(timestamp)
-            self.timestamps.append(event)
+            timestamps.append(event)
+
+        with self.lock:
+            self.timestamps = timestamps
+            if self.is_alive():
+                self._arm(self.clock())
 
     def next_run_in(self, utc_now=None):
         """ :param utc_now: optional parameter to be used by Unit Tests as a definition of "now"
             :return: timedelta instance presenting amount of time before the trigger is triggered next time
          or None if the EventClock instance is not running """
         if utc_now is None:
-            utc_now = datetime.utcnow()
+            utc_now = self.clock()
 
         if self.is_alive():
-            smallest_timedelta = timedelta(days=99, hours=0, minutes=0, seconds=0, microseconds=0, milliseconds=0)
-            for event_time in self.timestamps:
-                next_trigger = event_time.next_trigger_frequency(utc_now)
-                if next_trigger - utc_now < smallest_timedelta:
-                    smallest_timedelta = next_trigger - utc_now
-            return smallest_timedelta
-
+            return min(event_time.next_trigger_frequency(utc_now) for event_time in self.timestamps) - utc_now
         else:
             return None
 
     def is_alive(self):
-        return self.handler.is_alive()
+        return self.is_started and not self.is_cancelled
@@ -0,0 +1,302 @@
+__author__ = 'Bohdan Mushkevych'
+
+import json
+import os
+import time
+from threading import Lock
+
+from synergy.conf import settings
+from synergy.mq.flopsy import PublishersPool
+from synergy.system.decorator import thread_safe
+from synergy.system.repeat_timer import RepeatTimer
+from synergy.system.system_logger import get_logger
+
+SEGMENT_PREFIX = 'segment.'
+CURSOR_FILE_NAME = 'cursor'
+
+
+class OutboxOverflowError(Exception):
+    """ raised when the message does not fit into the outbox, since the outbox has reached its maximum size """
+    pass
+
+
+class MqOutbox(object):
+    """ append-only on-disk store of the messages, that could not be published to the MQ.
+        messages are appended to the segment files as json lines. every message is flushed to the OS on arrival,
+        so that it survives the crash of the process, while the fsync is performed once per *fsync_batch_size*.
+        messages are drained in the order of their arrival; the drain position is kept in the cursor file.
+        NOTICE: delivery is at-least-once: messages published after the last cursor update are drained again """
+
+    def __init__(self, logger, directory,
+                 max_size=settings.settings['mq_outbox_max_size_mb'] * 1024 * 1024,
+                 segment_size=settings.settings['mq_outbox_segment_size_mb'] * 1024 * 1024,
+                 fsync_batch_size=settings.settings['mq_outbox_fsync_batch_size'],
+                 publishers=None):
+        self.logger = logger
+        self.directory = directory
+        self.max_size = max_size
+        self.segment_size = segment_size
+        self.fsync_batch_size = fsync_batch_size
+        self.publishers = publishers if publishers is not None else PublishersPool(self.logger)
+        self.lock = Lock()
+        self.drain_lock = Lock()
+        self.timer = None
+
+        # file object of the segment the messages are appended to; opened on the first append
+        self.writer = None
+        self.write_segment = 0
+        self.number_of_unsynced = 0
+
+        # position of the next message to drain
+        self.read_segment = 0
+        self.read_offset = 0
+
+        # metrics: bytes held by the segment files and number of messages awaiting the drain
+        self.size = 0
+        self.depth = 0
+        self.number_of_appended = 0
+        self.number_of_drained = 0
+        self.drain_rate = 0.0
+        self.last_error = None
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._recover()
+
+    def _segment_path(self, sequence):
+        return os.path.join(self.directory, f'{SEGMENT_PREFIX}{sequence:010d}')
+
+    def _segments(self):
+        """ :return: sorted list of sequence numbers of the segment files on the disk """
+        return sorted(int(file_name[len(SEGMENT_PREFIX):]) for file_name in os.listdir(self.directory)
+                      if file_name.startswith(SEGMENT_PREFIX))
+
+    def _read_cursor(self):
+        """ :return: tuple (segment sequence, offset) of the next message to drain """
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE_NAME)) as cursor_file:
+                cursor = json.load(cursor_file)
+            return cursor['segment'], cursor['offset']
+        except FileNotFoundError:
+            return 0, 0
+
+    def _write_cursor(self, sequence, offset):
+        """ replaces the cursor file atomically """
+        path = os.path.join(self.directory, CURSOR_FILE_NAME)
+        with open(path + '.tmp', 'w') as cursor_file:
+            json.dump({'segment': sequence, 'offset': offset}, cursor_file)
+            cursor_file.flush()
+            os.fsync(cursor_file.fileno())
+        os.replace(path + '.tmp', path)
+
+    def _remove_segment(self, sequence):
+        path = self._segment_path(sequence)
+        if os.path.exists(path):
+            self.size -= os.path.getsize(path)
+            os.remove(path)
+
+    def _recover(self):
+        """ restores the outbox state from the segment files and the cursor file left by the previous run.
+            messages are appended to a new segment, so that a message torn by the crash is never extended """
+        self.read_segment, self.read_offset = self._read_cursor()
+        segments = self._segments()
+        for sequence in segments:
+            path = self._segment_path(sequence)
+            if sequence < self.read_segment:
+                # segment was drained, but not removed prior to the crash
+                os.remove(path)
+                continue
+
+            self.size += os.path.getsize(path)
+            with open(path, 'rb') as segment:
+                if sequence == self.read_segment:
+                    segment.seek(self.read_offset)
+                self.depth += sum(1 for line in segment if line.endswith(b'\n'))
+
+        if self.read_segment not in segments:
+            self.read_offset = 0
+        self.write_segment = max(segments + [self.read_segment - 1]) + 1
+        if self.depth:
+            self.logger.info(f'MQ outbox {self.directory} holds {self.depth} messages from the previous run')
+
+    def _sync(self):
+        if self.writer is not None and self.number_of_unsynced:
+            os.fsync(self.writer.fileno())
+        self.number_of_unsynced = 0
+
+    def _roll(self):
+        """ closes the current segment and starts the next one """
+        if self.writer is not None:
+            self._sync()
+            self.writer.close()
+            self.write_segment += 1
+        self.writer = open(self._segment_path(self.write_segment), 'ab')
+
+    @thread_safe
+    def append(self, name, message_data, priority=None):
+        """ appends the message to the outbox
+            :param name: name of the flopsy.Publisher to drain the message through
+            :raise OutboxOverflowError: if the outbox has reached its maximum size """
+        record = (json.dumps({'name': name, 'data': message_data, 'priority': priority}) + '\n').encode('utf-8')
+        if self.size + len(record) > self.max_size:
+            raise OutboxOverflowError(f'MQ outbox {self.directory} has reached its maximum size of {self.max_size}')
+
+        if self.writer is None or self.writer.tell() >= self.segment_size:
+            self._roll()
+        self.writer.write(record)
+        self.writer.flush()
+
+        self.size += len(record)
+        self.depth += 1
+        self.number_of_appended += 1
+        self.number_of_unsynced += 1
+        if self.number_of_unsynced >= self.fsync_batch_size:
+            self._sync()
+
+    @thread_safe
+    def sync(self):
+        """ writes the appended messages to the disk """
+        self._sync()
+
+    @thread_safe
+    def _read_batch(self):
+        """ :return: tuple (records, number of lines, position) with up to *fsync_batch_size* messages
+            following the drain position, and the drain position past them. a batch never spans two segments """
+        sequence, offset = self.read_segment, self.read_offset
+        while True:
+            records = list()
+            number_of_lines = 0
+            path = self._segment_path(sequence)
+            if os.path.exists(path):
+                with open(path, 'rb') as segment:
+                    segment.seek(offset)
+                    while number_of_lines < self.fsync_batch_size:
+                        line = segment.readline()
+                        if not line.endswith(b'\n'):
+                            # end of the segment; or a message torn by the crash
+                            break
+                        offset += len(line)
+                        number_of_lines += 1
+                        try:
+                            records.append(json.loads(line.decode('utf-8')))
+                        except ValueError as e:
+                            self.logger.error(f'Skipping corrupted message in the MQ outbox {path}: {e}')
+
+            is_active = self.writer is not None and sequence == self.write_segment
+            if number_of_lines or is_active or sequence >= self.write_segment:
+                return records, number_of_lines, (sequence, offset)
+
+            # drained segment is left for the next one
+            sequence, offset = sequence + 1, 0
+
+    @thread_safe
+    def _commit(self, number_of_lines, number_of_records, position):
+        """ advances the drain position and removes the drained segments """
+        sequence, offset = position
+        self._write_cursor(sequence, offset)
+        for drained_sequence in range(self.read_segment, sequence):
+            self._remove_segment(drained_sequence)
+        self.read_segment, self.read_offset = position
+        self.depth -= number_of_lines
+        self.number_of_drained += number_of_records
+
+        if self.depth == 0 and self.writer is not None and self.read_segment == self.write_segment:
+            # drained active segment is removed; next message starts a new one
+            self._sync()
+            self.writer.close()
+            self.writer = None
+            self.write_segment += 1
+            self._write_cursor(self.write_segment, 0)
+            self._remove_segment(self.read_segment)
+            self.read_segment, self.read_offset = self.write_segment, 0
+
+    def _publish(self, records):
+        for record in records:
+            publisher = self.publishers.get(record['name'])
+            try:
+                publisher.publish(record['data'], priority=record['priority'])
+            except Exception:
+                publisher.close()
+                raise
+            publisher.release()
+
+        failed = self.publishers.wait_for_confirms()
+        if failed:
+            raise UserWarning(f'{len(failed)} messages were not confirmed by the MQ broker')
+
+    def drain(self):
+        """ publishes the outbox messages in the order of their arrival, until the outbox is empty
+            or the publishing fails. drain position is advanced after every *fsync_batch_size* messages
+            :return: number of drained messages """
+        if not self.drain_lock.acquire(blocking=False):
+            # the outbox is being drained by another thread
+            return 0
+
+        try:
+            self.sync()
+            started_at = time.time()
+            number_of_drained = 0
+            while True:
+                records, number_of_lines, position = self._read_batch()
+                if position == (self.read_segment, self.read_offset):
+                    break
+
+                try:
+                    self._publish(records)
+                    self.last_error = None
+                except Exception as e:
+                    self.last_error = str(e)
+                    self.logger.warning(f'Unable to drain the MQ outbox: {e}. {self.depth} messages remain.')
+                    break
+                self._commit(number_of_lines, len(records), position)
+                number_of_drained += len(records)
+
+            if number_of_drained:
+                self.drain_rate = number_of_drained / max(time.time() - started_at, 1e-6)
+                self.logger.info(f'Drained {number_of_drained} messages from the MQ outbox at '
+                                 f'{self.drain_rate:.0f} messages/s. {self.depth} messages remain.')
+            return number_of_drained
+        finally:
+            self.drain_lock.release()
+
+    @property
+    def document(self):
+        return {'directory': self.directory,
+                'depth': self.depth,
+                'size': self.size,
+                'max_size': self.max_size,
+                'number_of_appended': self.number_of_appended,
+                'number_of_drained': self.number_of_drained,
+                'drain_rate': round(self.drain_rate, 1),
+                'last_error': self.last_error}
+
+    def start(self):
+        """ starts the background drain of the outbox """
+        self.timer = RepeatTimer(settings.settings['mq_outbox_drain_interval_sec'], self.drain)
+        self.timer.start()
+
+    @thread_safe
+    def close(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        if self.writer is not None:
+            self._sync()
+            self.writer.close()
+            self.writer = None
+
+
+# format: {process_name: MqOutbox}
+_outboxes = dict()
+_outboxes_lock = Lock()
+
+
+def get_outbox(process_name):
+    """ :return: MqOutbox of the given process, located under the log directory;
+        None if the outbox is turned off by the *mq_outbox_max_size_mb* """
+    if not settings.settings['mq_outbox_max_size_mb']:
+        return None
+
+    with _outboxes_lock:
+        if process_name not in _outboxes:
+            directory = os.path.join(settings.settings['log_directory'], f'{process_name}.outbox')
+            _outboxes[process_name] = MqOutbox(get_logger(process_name), directory)
+        return _outboxes[process_name]
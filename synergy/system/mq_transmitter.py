@@ -2,20 +2,49 @@ __author__ = 'Bohdan Mushkevych'
 
 from threading import Lock
 
+from synergy.conf import settings, context
 from synergy.scheduler.scheduler_constants import QUEUE_UOW_STATUS, QUEUE_JOB_STATUS
 from synergy.db.model.mq_transmission import MqTransmission
 from synergy.mq.flopsy import PublishersPool
+from synergy.system import time_helper
 from synergy.system.decorator import thread_safe
 
+# units of work of the most recent timeperiods. delivered ahead of the backfill lane
+LANE_LIVE = 'live'
+
+# units of work of the older timeperiods, as well as the GC re-submissions
+LANE_BACKFILL = 'backfill'
+
+
+def compute_lane(uow):
+    """ :return: LANE_LIVE if the uow timeperiod is among the *mq_live_lane_periods* most recent ones,
+        LANE_BACKFILL otherwise """
+    time_qualifier = context.process_context[uow.process_name].time_qualifier
+    horizon = time_helper.increment_timeperiod(time_qualifier, time_helper.actual_timeperiod(time_qualifier),
+                                               delta=-settings.settings['mq_live_lane_periods'])
+    return LANE_LIVE if uow.timeperiod >= horizon else LANE_BACKFILL
+
+
+def lane_priority(lane):
+    """ :return: message priority of the lane, or None if the priority lanes are turned off """
+    if not settings.settings['mq_max_priority']:
+        return None
+    return settings.settings['mq_max_priority'] if lane == LANE_LIVE else 0
+
 
 class MqTransmitter(object):
-    """ a class hosting several Message Queue helper methods to send MqTransmission """
+    """ a class hosting several Message Queue helper methods to send MqTransmission.
+        with the *outbox* given, messages failed to publish are appended to it, rather than raising an exception """
 
-    def __init__(self, logger):
+    def __init__(self, logger, outbox=None):
         self.logger = logger
+        self.outbox = outbox
         self.lock = Lock()
         self.publishers = PublishersPool(self.logger)
 
+        # managed units of work nacked by the broker, or not confirmed within the timeout
+        self.unconfirmed_uows = list()
+
     def __del__(self):
         try:
             self.logger.info('Closing Flopsy Publishers Pool...')
@@ -23,23 +52,79 @@ class MqTransmitter(object):
         except Exception as e:
             self.logger.error(f'Exception caught while closing Flopsy Publishers Pool: {e}')
 
+    def _publish_batch(self, name, messages):
+        """ publishes the messages over a single publisher of the given name, checked out of the pool once
+            :param messages: list of tuples (message_data, priority, token)
+            :raise OutboxOverflowError: if the publishing failed and the unpublished messages do not fit into the outbox
+        """
+        number_of_published = 0
+        try:
+            publisher = self.publishers.get(name)
+            try:
+                for message_data, priority, token in messages:
+                    publisher.publish(message_data, priority=priority, token=token)
+                    number_of_published += 1
+            except Exception:
+                publisher.close()
+                self._collect_failed(publisher)
+                raise
+        except Exception as e:
+            if self.outbox is None:
+                raise
+            for message_data, priority, _ in messages[number_of_published:]:
+                self.outbox.append(name, message_data, priority)
+            self.logger.warning(f'Unable to publish to {name}: {e}. '
+                                f'{len(messages) - number_of_published} messages are kept in the MQ outbox.')
+            return
+        self._release(publisher)
+
+    def _publish(self, name, message_data, priority=None, token=None):
+        self._publish_batch(name, [(message_data, priority, token)])
+
+    def _collect_failed(self, publisher):
+        """ collects the managed units of work the publisher failed to deliver """
+        self.unconfirmed_uows.extend(token for token in publisher.pop_failed() if token is not None)
+
+    def _release(self, publisher):
+        self._collect_failed(publisher)
+        publisher.release()
+
+    @thread_safe
+    def confirm_managed_uows(self, wait=True):
+        """ collects the broker confirms of the managed units of work published so far
+            :param wait: if True - blocks until all messages in flight are either confirmed or timed out;
+                otherwise reads only the confirms that have arrived
+            :return: list of units of work nacked by the broker, or not confirmed within the timeout.
+                empty list, unless the publisher confirms are turned on by the *mq_confirm_window* """
+        failed = self.publishers.wait_for_confirms() if wait else self.publishers.poll_confirms()
+        failed = [token for token in failed if token is not None]
+        unconfirmed, self.unconfirmed_uows = self.unconfirmed_uows, list()
+        return unconfirmed + failed
+
     @thread_safe
-    def publish_managed_uow(self, uow):
+    def publish_managed_uow(self, uow, lane=None):
+        """ :param lane: LANE_LIVE or LANE_BACKFILL; derived from the uow timeperiod if omitted """
+        if lane is None:
+            lane = compute_lane(uow)
         mq_request = MqTransmission(process_name=uow.process_name, record_db_id=uow.db_id)
+        self._publish(uow.process_name, mq_request.document, priority=lane_priority(lane), token=uow)
 
-        publisher = self.publishers.get(uow.process_name)
-        publisher.publish(mq_request.document)
-        publisher.release()
+    @thread_safe
+    def publish_managed_uows(self, uows):
+        """ publishes units of work of a single process over one channel """
+        if not uows:
+            return
+
+        messages = [(MqTransmission(process_name=uow.process_name, record_db_id=uow.db_id).document,
+                     lane_priority(compute_lane(uow)), uow) for uow in uows]
+        self._publish_batch(uows[0].process_name, messages)
 
     @thread_safe
     def publish_freerun_uow(self, freerun_entry, uow):
         mq_request = MqTransmission(process_name=freerun_entry.process_name,
                                     entry_name=freerun_entry.entry_name,
                                     record_db_id=uow.db_id)
-
-        publisher = self.publishers.get(freerun_entry.process_name)
-        publisher.publish(mq_request.document)
-        publisher.release()
+        self._publish(freerun_entry.process_name, mq_request.document)
 
     @thread_safe
     def publish_job_status(self, job_record, finished_only=True):
@@ -47,14 +132,9 @@ class MqTransmitter(object):
             return
 
         mq_request = MqTransmission(process_name=job_record.process_name, record_db_id=job_record.db_id)
-        publisher = self.publishers.get(QUEUE_JOB_STATUS)
-        publisher.publish(mq_request.document)
-        publisher.release()
+        self._publish(QUEUE_JOB_STATUS, mq_request.document)
 
     @thread_safe
     def publish_uow_status(self, uow):
         mq_request = MqTransmission(process_name=uow.process_name, record_db_id=uow.db_id)
-
-        publisher = self.publishers.get(QUEUE_UOW_STATUS)
-        publisher.publish(mq_request.document)
-        publisher.release()
+        self._publish(QUEUE_UOW_STATUS, mq_request.document)
@@ -3,23 +3,80 @@
 @author: Brian Curtin
 http://code.activestate.com/lists/python-ideas/8982/
 """
+import math
 import numbers
+import random
+import sys
 import threading
+import time
+import traceback
+from concurrent.futures import Future
 from datetime import datetime, timedelta
 
+from synergy.system.timer_dispatcher import get_dispatcher
 
-class RepeatTimer(threading.Thread):
-    """ This class triggers every number of seconds """
-    def __init__(self, interval, call_back, daemonic=None, args=None, kwargs=None):
+
+class TickMetrics(object):
+    """ statistics of the <tick> execution: lag - seconds between the scheduled and the actual start of the <tick>;
+        duration - seconds between the start and the completion of the <tick>;
+        overrun - <tick> that took longer than the interval; skipped - <tick> coalesced into an overrun one """
+    def __init__(self):
+        self.number_of_ticks = 0
+        self.number_of_overruns = 0
+        self.number_of_skipped = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+
+    def register(self, lag, duration, interval=None):
+        self.number_of_ticks += 1
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.last_duration = duration
+        self.max_duration = max(self.max_duration, duration)
+        self.total_duration += duration
+        if interval is not None and duration > interval:
+            self.number_of_overruns += 1
+
+    def register_skipped(self, number_of_skipped):
+        self.number_of_skipped += number_of_skipped
+
+    @property
+    def document(self):
+        mean_duration = self.total_duration / self.number_of_ticks if self.number_of_ticks else 0.0
+        return {'number_of_ticks': self.number_of_ticks,
+                'number_of_overruns': self.number_of_overruns,
+                'number_of_skipped': self.number_of_skipped,
+                'last_lag': round(self.last_lag, 3),
+                'max_lag': round(self.max_lag, 3),
+                'last_duration': round(self.last_duration, 3),
+                'mean_duration': round(mean_duration, 3),
+                'max_duration': round(self.max_duration, 3)}
+
+
+class RepeatTimer(object):
+    """ This class triggers every number of seconds.
+        RepeatTimer does not own a thread: its countdown is kept by the shared TimerDispatcher
+        and the call_back is executed by the dispatcher's worker pool.
+        Next countdown starts once the <tick> completes: either the call_back returns, or the Future
+        returned by the call_back is done. Hence <ticks> of a single timer never overlap.
+        In the fixed-delay mode, the next <tick> comes in *interval* seconds after the completion of the current one;
+        *phase* replaces the first countdown, so that timers of the same interval do not tick simultaneously.
+        In the fixed-rate mode, <ticks> are anchored to the wall-clock multiples of the interval shifted by the *phase*;
+        <ticks> missed by the overrunning one are coalesced into it.
+        *jitter* adds a random number of seconds from [0, jitter] to every countdown """
+    def __init__(self, interval, call_back, daemonic=None, args=None, kwargs=None,
+                 phase=0.0, jitter=0.0, fixed_rate=False):
         if not kwargs: kwargs = {}
         if not args: args = []
-        
-        threading.Thread.__init__(self)
-        # handle daemonic state as in Python3
-        if daemonic is not None:
-            self.daemon = daemonic
-        else:
-            self.daemon = threading.current_thread().daemon
+
+        # handle daemonic state as in Python3: non-daemonic timers prevent the interpreter from exiting
+        if daemonic is None:
+            daemonic = threading.current_thread().daemon
+        self.daemon = daemonic
+        self.dispatcher = get_dispatcher(daemonic)
 
         assert isinstance(interval, numbers.Number)
         # interval_current shows number of seconds in currently triggered <tick>
@@ -29,33 +86,125 @@ class RepeatTimer(threading.Thread):
         self.call_back = call_back
         self.args = args
         self.kwargs = kwargs
-        self.event = threading.Event()
-        self.event.set()
+        self.phase = phase
+        self.jitter = jitter
+        self.fixed_rate = fixed_rate
+        self.metrics = TickMetrics()
+        # countdown shows number of seconds from activation_dt to the next <tick>
+        self.countdown = None
+        # time of the next <tick> in seconds since the epoch
+        self.fire_at = None
+        self.lock = threading.RLock()
+        self.is_started = False
+        self.is_cancelled = False
         self.activation_dt = None
-        self.__timer = None
-
-    def run(self):
-        while self.event.is_set():
-            self.activation_dt = datetime.utcnow()
-            self.__timer = threading.Timer(self.interval_new,
-                                           self.call_back,
-                                           self.args,
-                                           self.kwargs)
-            self.interval_current = self.interval_new
-            self.__timer.start()
-            self.__timer.join()
+
+        # dispatcher entry of the current countdown; None while the call_back is being executed
+        self.__entry = None
+        self.is_firing = False
+        # True if the immediate <tick> was requested by the *trigger* call and has not yet started
+        self.is_trigger_pending = False
+
+    def _arm(self, countdown=None):
+        """ starts a new countdown. must be called under the self.lock
+            :param countdown: number of seconds before the <tick> in the fixed-delay mode;
+             interval_new is applied if omitted """
+        self.activation_dt = datetime.utcnow()
+        self.interval_current = self.interval_new
+        now = time.time()
+
+        if self.fixed_rate:
+            # next wall-clock slot; slots passed since the previous <tick> are coalesced
+            slot = math.floor((now - self.phase) / self.interval_current) + 1
+            fire_at = slot * self.interval_current + self.phase
+            if self.fire_at is not None:
+                number_of_skipped = int(round((fire_at - self.fire_at) / self.interval_current)) - 1
+                if number_of_skipped > 0:
+                    self.metrics.register_skipped(number_of_skipped)
+            countdown = fire_at - now
+        elif countdown is None:
+            countdown = self.interval_current
+
+        if self.jitter:
+            countdown += random.uniform(0, self.jitter)
+        self.countdown = countdown
+        self.fire_at = now + countdown
+        self.__entry = self.dispatcher.schedule(self.fire_at, self._fire)
+
+    def _schedule_now(self):
+        """ schedules the immediate <tick>. must be called under the self.lock """
+        self.fire_at = time.time()
+        self.__entry = self.dispatcher.schedule(self.fire_at, self._fire)
+
+    def _fire(self):
+        with self.lock:
+            if self.is_cancelled and not self.is_trigger_pending:
+                return
+            self.__entry = None
+            self.is_firing = True
+            self.is_trigger_pending = False
+            scheduled_at = self.fire_at
+
+        started_at = time.time()
+        result = None
+        try:
+            result = self.call_back(*self.args, **self.kwargs)
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+
+        if isinstance(result, Future):
+            result.add_done_callback(lambda _: self._complete(scheduled_at, started_at))
+        else:
+            self._complete(scheduled_at, started_at)
+
+    def _complete(self, scheduled_at, started_at):
+        """ registers the <tick> metrics and starts the next countdown """
+        self.metrics.register(lag=started_at - scheduled_at,
+                              duration=time.time() - started_at,
+                              interval=self.interval_current)
+        with self.lock:
+            self.is_firing = False
+            if self.is_trigger_pending:
+                # *trigger* was requested while the <tick> was running
+                self._schedule_now()
+            elif self.is_alive() and self.__entry is None:
+                self._arm()
+
+    def start(self):
+        """ starts the first countdown. timer can only be started once """
+        with self.lock:
+            if self.is_started:
+                raise RuntimeError('timer can only be started once')
+            self.is_started = True
+            self._arm(self.phase if self.phase > 0 else None)
+
+    def is_alive(self):
+        """ :return: True if the timer was started and has not been cancelled """
+        return self.is_started and not self.is_cancelled
 
     def cancel(self):
         """ stops the timer. call_back function is not called """
-        self.event.clear()
-        if self.__timer is not None:
-            self.__timer.cancel()
+        with self.lock:
+            self.is_cancelled = True
+            self.is_trigger_pending = False
+            if self.__entry is not None:
+                self.dispatcher.cancel(self.__entry)
+                self.__entry = None
 
     def trigger(self):
-        """ calls the call_back function. interrupts the timer to start a new countdown """
-        self.call_back(*self.args, **self.kwargs)
-        if self.__timer is not None:
-            self.__timer.cancel()
+        """ requests the immediate <tick> and returns without waiting for it.
+            the request is coalesced with the one still awaiting the execution;
+            if the <tick> is running, the requested one follows it.
+            running timer starts a new countdown once the requested <tick> completes """
+        with self.lock:
+            if self.is_trigger_pending:
+                return
+            self.is_trigger_pending = True
+            if self.is_firing:
+                return
+            if self.__entry is not None:
+                self.dispatcher.cancel(self.__entry)
+            self._schedule_now()
 
     def change_interval(self, value):
         """ :param value: <tick> interval in seconds
@@ -71,7 +220,7 @@ class RepeatTimer(threading.Thread):
             utc_now = datetime.utcnow()
 
         if self.is_alive():
-            next_run = timedelta(seconds=self.interval_current) + self.activation_dt
+            next_run = timedelta(seconds=self.countdown) + self.activation_dt
             return next_run - utc_now
         else:
             return None
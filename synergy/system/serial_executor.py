@@ -0,0 +1,47 @@
+__author__ = 'Bohdan Mushkevych'
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from synergy.system.decorator import thread_safe
+
+
+class SerialExecutor(object):
+    """ Single-threaded work queue: submitted tasks are executed one at a time in the order of submission.
+        Tasks submitted with a *key* are coalesced: a key already awaiting the execution is not queued again """
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+        # format: {key: Future} of the keyed tasks awaiting the execution
+        self.pending = dict()
+
+    def submit(self, fn, *args, **kwargs):
+        """ :return: <Future> of the task execution """
+        return self.executor.submit(fn, *args, **kwargs)
+
+    @thread_safe
+    def submit_once(self, key, fn, *args, **kwargs):
+        """ submits the task, unless a task with the same key is awaiting the execution
+            :return: <Future> of the queued task, or of the one it was coalesced with """
+        future = self.pending.get(key)
+        if future is not None:
+            return future
+
+        def _run():
+            self._release(key)
+            return fn(*args, **kwargs)
+
+        future = self.executor.submit(_run)
+        self.pending[key] = future
+        return future
+
+    @thread_safe
+    def _release(self, key):
+        """ once the task starts, a new task with the same key may be queued behind it """
+        del self.pending[key]
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,78 @@
+__author__ = 'Bohdan Mushkevych'
+
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import MutableMapping
+
+
+class SortedDict(MutableMapping):
+    """ module represents a dictionary that iterates its keys in the ascending order
+    keys are maintained in a bisect-backed list, which gives O(log n) successor/predecessor lookups
+    and O(1) insertion for keys that are appended to the end - typical for the timeperiod-driven keys """
+
+    def __init__(self, *args, **kwargs):
+        super(SortedDict, self).__init__()
+        # format: {key: value}
+        self.data = dict()
+        # sorted list of keys from the self.data
+        self.keys_list = list()
+        self.update(dict(*args, **kwargs))
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        if key not in self.data:
+            if not self.keys_list or self.keys_list[-1] < key:
+                self.keys_list.append(key)
+            else:
+                insort(self.keys_list, key)
+        self.data[key] = value
+
+    def __delitem__(self, key):
+        del self.data[key]
+        index = bisect_left(self.keys_list, key)
+        del self.keys_list[index]
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __iter__(self):
+        return iter(self.keys_list)
+
+    def __reversed__(self):
+        return reversed(self.keys_list)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return '{0}({1})'.format(self.__class__.__name__, ', '.join(f'{k!r}: {self.data[k]!r}' for k in self))
+
+    def first_key(self):
+        """ :return: the smallest key or None if the dictionary is empty """
+        return self.keys_list[0] if self.keys_list else None
+
+    def last_key(self):
+        """ :return: the largest key or None if the dictionary is empty """
+        return self.keys_list[-1] if self.keys_list else None
+
+    def successor(self, key):
+        """ :return: the smallest key that is strictly greater than the given one, or None if no such key exists """
+        index = bisect_right(self.keys_list, key)
+        if index >= len(self.keys_list):
+            return None
+        return self.keys_list[index]
+
+    def predecessor(self, key):
+        """ :return: the largest key that is strictly smaller than the given one, or None if no such key exists """
+        index = bisect_left(self.keys_list, key)
+        if index == 0:
+            return None
+        return self.keys_list[index - 1]
+
+    def values_from(self, key):
+        """ :return: generator over values, whose keys are greater or equal to the given one, in the ascending order """
+        index = bisect_left(self.keys_list, key)
+        while index < len(self.keys_list):
+            yield self.data[self.keys_list[index]]
+            index += 1
@@ -1,11 +1,16 @@
 __author__ = 'Bohdan Mushkevych'
 
+import zlib
+
 from synergy.system.event_clock import EventClock
 from synergy.system.repeat_timer import RepeatTimer
 
 TRIGGER_PREAMBLE_AT = 'at '
 TRIGGER_PREAMBLE_EVERY = 'every '
 
+# number of distinct phase offsets within an interval
+PHASE_RESOLUTION = 10000
+
 
 def parse_time_trigger_string(trigger_frequency):
     """
@@ -47,3 +52,15 @@ def format_time_trigger_string(timer_instance):
         return TRIGGER_PREAMBLE_AT + ','.join(timestamps)
     else:
         raise ValueError(f'Unknown timer instance type {timer_instance.__class__.__name__}')
+
+
+def phase_offset(key, interval):
+    """
+    :param key: timer identifier, for instance process_name
+    :param interval: timer interval in seconds
+    :return: offset in seconds within [0, interval), derived from the key.
+     offset of a given key is stable across restarts, and offsets of different keys spread evenly across the interval
+    """
+    # built-in hash of a string is randomized per interpreter, hence the crc32
+    digest = zlib.crc32(str(key).encode('utf-8'))
+    return interval * (digest % PHASE_RESOLUTION) / PHASE_RESOLUTION
@@ -0,0 +1,146 @@
+__author__ = 'Bohdan Mushkevych'
+
+import heapq
+import itertools
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Condition, Thread
+
+# number of threads executing due call_backs
+MAX_WORKERS = 16
+
+# upper boundary of the dispatcher sleep, so that the heap is re-evaluated after the wall clock adjustments
+MAX_WAIT_SECONDS = 10.0
+
+# number of the most recent seconds covered by the tick density report
+DENSITY_WINDOW_SECONDS = 300
+
+# position of the call_back in the heap entry [fire_at, sequence, call_back]
+CALL_BACK = 2
+
+
+class TimerDispatcher(object):
+    """ Single thread that holds the heap of scheduled call_backs ordered by their fire time,
+        and hands the due call_backs over to the bounded worker pool.
+        Dispatcher thread runs only while there are scheduled call_backs """
+
+    def __init__(self, name, daemonic, max_workers=MAX_WORKERS):
+        self.name = name
+        self.daemonic = daemonic
+        self.condition = Condition()
+
+        # heap of entries [fire_at, sequence, call_back]. cancelled entries have call_back set to None
+        # and are dropped lazily, once they reach the top of the heap or outnumber the live entries
+        self.heap = []
+        self.number_of_cancelled = 0
+        self.sequence = itertools.count()
+
+        # format: deque of [epoch second, number of dispatched call_backs] for the most recent seconds with ticks
+        self.tick_counts = deque(maxlen=DENSITY_WINDOW_SECONDS)
+
+        self.workers = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'{name}Worker')
+        self.thread = None
+
+    def __len__(self):
+        """ :return: number of scheduled call_backs """
+        with self.condition:
+            return len(self.heap) - self.number_of_cancelled
+
+    def schedule(self, fire_at, call_back):
+        """ :param fire_at: time in seconds since the epoch, as returned by time.time()
+            :return: entry to be used to cancel the call_back """
+        entry = [fire_at, next(self.sequence), call_back]
+        with self.condition:
+            heapq.heappush(self.heap, entry)
+            if self.thread is None:
+                self.thread = Thread(target=self._run, name=self.name, daemon=self.daemonic)
+                self.thread.start()
+            elif self.heap[0] is entry:
+                # new entry precedes the one the dispatcher is waiting for
+                self.condition.notify()
+        return entry
+
+    def cancel(self, entry):
+        """ cancels the scheduled call_back. has no effect if the call_back has already been dispatched """
+        with self.condition:
+            if entry[CALL_BACK] is None:
+                return
+            entry[CALL_BACK] = None
+            self.number_of_cancelled += 1
+
+            if self.number_of_cancelled > len(self.heap) // 2:
+                self.heap = [e for e in self.heap if e[CALL_BACK] is not None]
+                heapq.heapify(self.heap)
+                self.number_of_cancelled = 0
+            self.condition.notify()
+
+    def _next_due(self):
+        """ blocks until the top entry is due
+            :return: call_back of the due entry, or None if no call_backs are scheduled """
+        with self.condition:
+            while True:
+                while self.heap and self.heap[0][CALL_BACK] is None:
+                    heapq.heappop(self.heap)
+                    self.number_of_cancelled -= 1
+
+                if not self.heap:
+                    # the thread is restarted by the next *schedule* call
+                    self.thread = None
+                    return None
+
+                now = time.time()
+                delay = self.heap[0][0] - now
+                if delay <= 0:
+                    entry = heapq.heappop(self.heap)
+                    call_back, entry[CALL_BACK] = entry[CALL_BACK], None
+                    self._count_tick(int(now))
+                    return call_back
+
+                self.condition.wait(min(delay, MAX_WAIT_SECONDS))
+
+    def _count_tick(self, second):
+        """ registers dispatched call_back in the per-second tick counts. must be called under the self.condition """
+        if self.tick_counts and self.tick_counts[-1][0] == second:
+            self.tick_counts[-1][1] += 1
+        else:
+            self.tick_counts.append([second, 1])
+
+    def tick_density(self, now=None):
+        """ :param now: optional parameter to be used by Unit Tests as a definition of "now" in epoch seconds
+            :return: dict describing number of call_backs dispatched per second over the DENSITY_WINDOW_SECONDS """
+        if now is None:
+            now = time.time()
+        window_start = int(now) - DENSITY_WINDOW_SECONDS
+
+        with self.condition:
+            counts = [count for second, count in self.tick_counts if second > window_start]
+
+        number_of_ticks = sum(counts)
+        return {'window_seconds': DENSITY_WINDOW_SECONDS,
+                'number_of_ticks': number_of_ticks,
+                'busy_seconds': len(counts),
+                'mean_per_second': number_of_ticks / DENSITY_WINDOW_SECONDS,
+                'max_per_second': max(counts, default=0)}
+
+    def _run(self):
+        while True:
+            call_back = self._next_due()
+            if call_back is None:
+                return
+            self.workers.submit(call_back)
+
+
+# call_backs of the daemonic timers do not prevent the interpreter from exiting
+_dispatchers = {True: TimerDispatcher('DaemonicTimerDispatcher', daemonic=True),
+                False: TimerDispatcher('TimerDispatcher', daemonic=False)}
+
+
+def get_dispatcher(daemonic):
+    """ :return: shared TimerDispatcher instance """
+    return _dispatchers[bool(daemonic)]
+
+
+def tick_density(now=None):
+    """ :return: dict in format {dispatcher name: tick density report} """
+    return {dispatcher.name: dispatcher.tick_density(now) for dispatcher in _dispatchers.values()}
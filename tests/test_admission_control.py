@@ -0,0 +1,100 @@
+__author__ = 'Bohdan Mushkevych'
+
+import unittest
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from settings import enable_test_mode
+enable_test_mode()
+
+from constants import PROCESS_SITE_HOURLY
+from synergy.conf import settings
+from synergy.mq.flopsy import QueueDepthProbe
+from synergy.system.admission_control import AdmissionControl
+
+
+class StubProbe(object):
+    """ reports the queue depth set by the test; None simulates the unreachable broker """
+
+    def __init__(self):
+        self.depth = 0
+        self.admission_control = None
+        self.is_locked = None
+
+    def message_count(self, mq_queue_name):
+        self.is_locked = self.admission_control.lock.locked() if self.admission_control else None
+        if self.depth is None:
+            raise ConnectionError('broker is unreachable')
+        return self.depth
+
+
+class TestAdmissionControl(unittest.TestCase):
+    def setUp(self):
+        self.initial_high_water_mark = settings.settings['mq_queue_high_water_mark']
+        self.initial_low_water_mark = settings.settings['mq_queue_low_water_mark']
+        settings.settings['mq_queue_high_water_mark'] = 1000
+        settings.settings['mq_queue_low_water_mark'] = 100
+
+        self.probe = StubProbe()
+        self.admission_control = AdmissionControl(probe=self.probe)
+        self.probe.admission_control = self.admission_control
+
+    def tearDown(self):
+        settings.settings['mq_queue_high_water_mark'] = self.initial_high_water_mark
+        settings.settings['mq_queue_low_water_mark'] = self.initial_low_water_mark
+
+    def test_hysteresis(self):
+        for depth, is_admitted in [(10, True), (999, True), (1000, False), (500, False),
+                                   (100, True), (500, True), (2000, False)]:
+            self.probe.depth = depth
+            self.assertEqual(self.admission_control.is_admitted(PROCESS_SITE_HOURLY), is_admitted, depth)
+
+        # only the transitions are recorded
+        decisions = self.admission_control.document['decisions']
+        self.assertEqual([decision['is_throttled'] for decision in decisions], [True, False, True])
+        self.assertEqual([decision['message_count'] for decision in decisions], [1000, 100, 2000])
+        self.assertTrue(self.admission_control.process_document(PROCESS_SITE_HOURLY)['is_throttled'])
+
+    def test_fail_open(self):
+        self.probe.depth = 5000
+        self.assertFalse(self.admission_control.is_admitted(PROCESS_SITE_HOURLY))
+
+        # process is admitted while its queue depth is unknown
+        self.probe.depth = None
+        self.assertTrue(self.admission_control.is_admitted(PROCESS_SITE_HOURLY))
+        self.assertIn('unreachable', self.admission_control.process_document(PROCESS_SITE_HOURLY)['error'])
+
+    def test_disabled(self):
+        settings.settings['mq_queue_high_water_mark'] = 0
+        self.probe.depth = None
+        self.assertTrue(self.admission_control.is_admitted(PROCESS_SITE_HOURLY))
+        self.assertEqual(self.admission_control.document['processes'], dict())
+
+    def test_probe_outside_of_lock(self):
+        self.assertTrue(self.admission_control.is_admitted(PROCESS_SITE_HOURLY))
+        self.assertFalse(self.probe.is_locked)
+
+    @mock.patch('synergy.mq.flopsy.Connection')
+    def test_failed_probe_cached(self, connection):
+        channel = connection.return_value.connection.channel.return_value
+        channel.queue_declare.side_effect = ConnectionError('broker is unreachable')
+        self.admission_control = AdmissionControl(probe=QueueDepthProbe(cache_seconds=60))
+
+        # the unreachable broker is not re-probed by every query within the cache window
+        for _ in range(3):
+            self.assertTrue(self.admission_control.is_admitted(PROCESS_SITE_HOURLY))
+        self.assertEqual(channel.queue_declare.call_count, 1)
+        self.assertIn('unreachable', self.admission_control.process_document(PROCESS_SITE_HOURLY)['error'])
+
+        # the broker is probed again once the cached failure expires
+        self.admission_control.probe.cache_seconds = 0
+        channel.queue_declare.side_effect = None
+        channel.queue_declare.return_value.message_count = 5000
+        self.assertFalse(self.admission_control.is_admitted(PROCESS_SITE_HOURLY))
+        self.assertEqual(channel.queue_declare.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,14 +1,61 @@
 __author__ = 'Bohdan Mushkevych'
 
+import heapq
+import itertools
 import unittest
 from datetime import datetime, timedelta
 
 from synergy.system.event_clock import EventClock, EventTime
 from synergy.system.repeat_timer import RepeatTimer
-from synergy.system.time_trigger_factory import parse_time_trigger_string, format_time_trigger_string
+from synergy.system.time_trigger_factory import parse_time_trigger_string, format_time_trigger_string, \
+    phase_offset
+
+
+class VirtualDispatcher(object):
+    """ deterministic replacement of the TimerDispatcher: time moves only when advanced by the test """
+
+    def __init__(self, utc_now):
+        self.utc_now = utc_now
+        self.heap = []
+        self.sequence = itertools.count()
+
+    def clock(self):
+        return self.utc_now
+
+    def schedule(self, fire_at, call_back):
+        entry = [datetime.utcfromtimestamp(fire_at), next(self.sequence), call_back]
+        heapq.heappush(self.heap, entry)
+        return entry
+
+    def cancel(self, entry):
+        entry[2] = None
+
+    def advance(self, utc_till):
+        """ fires the call_backs due before the utc_till in the order of their fire time """
+        while self.heap and self.heap[0][0] <= utc_till:
+            fire_dt, _, call_back = heapq.heappop(self.heap)
+            if call_back is None:
+                continue
+            self.utc_now = max(self.utc_now, fire_dt)
+            call_back()
+        self.utc_now = utc_till
+
+    @property
+    def number_of_scheduled(self):
+        return len([entry for entry in self.heap if entry[2] is not None])
 
 
 class TestEventClock(unittest.TestCase):
+    def _virtual_clock(self, timestamps, utc_now):
+        """ :return: tuple (started EventClock bound to the VirtualDispatcher, dispatcher, list of fire datetimes) """
+        dispatcher = VirtualDispatcher(utc_now)
+        fired = []
+        clock = EventClock(timestamps, lambda: fired.append(dispatcher.clock()))
+        clock.dispatcher = dispatcher
+        clock.clock = dispatcher.clock
+        clock.start()
+        return clock, dispatcher, fired
+
     def test_utc_now(self):
         utc_now = datetime.utcnow()
         self.obj = EventTime.utc_now()
@@ -64,6 +111,19 @@ class TestEventClock(unittest.TestCase):
             processed_tuple = format_time_trigger_string(handler)
             self.assertEqual(processed_tuple, expected_output)
 
+    def test_phase_offset(self):
+        # offset is deterministic and lies within the interval
+        self.assertEqual(phase_offset('process_a', 60), phase_offset('process_a', 60))
+        offsets = [phase_offset(f'process_{index}', 60) for index in range(600)]
+        self.assertTrue(all(0 <= offset < 60 for offset in offsets))
+
+        # offsets of the 600 processes spread across the minute: no second holds more than 3x of the average 10
+        per_second = [0] * 60
+        for offset in offsets:
+            per_second[int(offset)] += 1
+        self.assertLess(max(per_second), 30)
+        self.assertNotEqual(phase_offset(('process_a', 'entry_a'), 60), phase_offset(('process_a', 'entry_b'), 60))
+
     def test_next_run_in(self):
         # 2014-05-01 is Thu. In Python it is weekday=3
         fixed_utc_now = \
@@ -82,6 +142,76 @@ class TestEventClock(unittest.TestCase):
             processed_output = handler.next_run_in(utc_now=fixed_utc_now)
             self.assertEqual(processed_output, expected_output)
 
+    def test_simulated_month(self):
+        # 2014-05-01 is Thu. *-17:00 and 2-17:00 overlap every Wednesday
+        start_dt = datetime(year=2014, month=5, day=1)
+        end_dt = datetime(year=2014, month=6, day=1)
+        clock, dispatcher, fired = self._virtual_clock(['*-17:00', '2-17:00', '4-15:45', '1-9:01'], start_dt)
+
+        expected = []
+        day = start_dt
+        while day < end_dt:
+            if day.weekday() == 1:
+                expected.append(day.replace(hour=9, minute=1))
+            if day.weekday() == 4:
+                expected.append(day.replace(hour=15, minute=45))
+            expected.append(day.replace(hour=17))
+            day += timedelta(days=1)
+
+        # advance the virtual time in uneven steps, checking the exact countdown along the way
+        while dispatcher.utc_now < end_dt:
+            next_run_in = clock.next_run_in()
+            self.assertEqual(dispatcher.utc_now + next_run_in, clock.next_fire_dt)
+            dispatcher.advance(min(end_dt, dispatcher.utc_now + timedelta(hours=7, minutes=13)))
+
+        self.assertEqual(fired, expected)
+        # only one countdown is kept by the clock at any time
+        self.assertEqual(dispatcher.number_of_scheduled, 1)
+
+        clock.cancel()
+        self.assertEqual(dispatcher.number_of_scheduled, 0)
+        self.assertIsNone(clock.next_run_in())
+
+    def test_clock_jump(self):
+        # 2014-05-01 is Thu
+        start_dt = datetime(year=2014, month=5, day=1, hour=13)
+        clock, dispatcher, fired = self._virtual_clock(['*-17:00'], start_dt)
+        self.assertEqual(clock.next_fire_dt, datetime(year=2014, month=5, day=1, hour=17))
+
+        # clock jumps forward past two events: missed events are skipped and the clock is re-armed
+        dispatcher.utc_now = datetime(year=2014, month=5, day=3, hour=12)
+        dispatcher.advance(dispatcher.utc_now)
+        self.assertEqual(fired, [])
+        self.assertEqual(clock.next_fire_dt, datetime(year=2014, month=5, day=3, hour=17))
+
+        dispatcher.advance(datetime(year=2014, month=5, day=4))
+        self.assertEqual(fired, [datetime(year=2014, month=5, day=3, hour=17)])
+
+    def test_change_interval(self):
+        start_dt = datetime(year=2014, month=5, day=1, hour=13)
+        clock, dispatcher, fired = self._virtual_clock(['*-17:00'], start_dt)
+
+        # running clock is re-armed to the new schedule
+        clock.change_interval(['*-14:30'])
+        self.assertEqual(clock.next_fire_dt, datetime(year=2014, month=5, day=1, hour=14, minute=30))
+        self.assertEqual(dispatcher.number_of_scheduled, 1)
+
+        dispatcher.advance(datetime(year=2014, month=5, day=2))
+        self.assertEqual(fired, [datetime(year=2014, month=5, day=1, hour=14, minute=30)])
+
+    def test_trigger(self):
+        start_dt = datetime(year=2014, month=5, day=1, hour=13)
+        clock, dispatcher, fired = self._virtual_clock(['*-17:00'], start_dt)
+
+        # trigger requests are coalesced and executed by the dispatcher
+        clock.trigger()
+        clock.trigger()
+        self.assertEqual(fired, [])
+        self.assertEqual(dispatcher.number_of_scheduled, 2)
+
+        dispatcher.advance(start_dt + timedelta(minutes=1))
+        self.assertEqual(fired, [start_dt])
+
 
 if __name__ == '__main__':
     unittest.main()
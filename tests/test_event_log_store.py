@@ -0,0 +1,121 @@
+__author__ = 'Bohdan Mushkevych'
+
+import unittest
+from datetime import datetime
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from settings import enable_test_mode
+enable_test_mode()
+
+from synergy.conf import settings
+from synergy.db.dao.job_event_dao import JobEventDao
+from synergy.db.model import job
+from synergy.db.model.job import Job, EVENT_LOG_MAX_SIZE
+from synergy.db.model.job_event import JobEvent
+from synergy.scheduler.event_log_store import EventLogStore
+from synergy.scheduler.scheduler_constants import COLLECTION_JOB_EVENT_LOG
+
+
+class TestEventLogStore(unittest.TestCase):
+    def setUp(self):
+        self.original_batch_size = settings.settings['event_log_batch_size']
+        settings.settings['event_log_batch_size'] = 4
+
+        self.dao_patcher = mock.patch('synergy.scheduler.event_log_store.JobEventDao')
+        self.dao_mock = self.dao_patcher.start().return_value
+        self.dao_mock.get_events.return_value = []
+
+        self.store = EventLogStore(mock.MagicMock())
+        self.job_record = Job(db_id='5e2b7a1c9d4f3a0012000001', process_name='SomeProcess',
+                              timeperiod='2020010100', state=job.STATE_IN_PROGRESS)
+
+    def tearDown(self):
+        self.dao_patcher.stop()
+        settings.settings['event_log_batch_size'] = self.original_batch_size
+
+    def test_batched_inserts(self):
+        for i in range(3):
+            self.store.append(self.job_record, f'message {i}')
+        self.dao_mock.insert_many.assert_not_called()
+
+        # the batch is written in a single round-trip, once it is full
+        self.store.append(self.job_record, 'message 3')
+        self.dao_mock.insert_many.assert_called_once()
+        events = self.dao_mock.insert_many.call_args[0][0]
+        self.assertEqual([event.message for event in events], [f'message {i}' for i in range(4)])
+        self.assertTrue(all(event.job_id == self.job_record.db_id for event in events))
+        self.assertEqual(self.store.pending, [])
+
+        self.assertEqual(self.store.flush(), 0)
+        self.assertEqual(self.dao_mock.insert_many.call_count, 1)
+
+    def test_get_event_log(self):
+        persisted = JobEvent(job_id=self.job_record.db_id, created_at=datetime(2020, 1, 1), message='persisted')
+        self.dao_mock.get_events.return_value = [persisted]
+
+        other_job = Job(db_id='5e2b7a1c9d4f3a0012000002', process_name='SomeProcess',
+                        timeperiod='2020010101', state=job.STATE_IN_PROGRESS)
+        self.store.append(self.job_record, 'first')
+        self.store.append(other_job, 'other')
+        self.store.append(self.job_record, 'second')
+
+        event_log = self.store.get_event_log(self.job_record)
+        self.assertEqual([entry[1] for entry in event_log], ['second', 'first', 'persisted'])
+        self.assertEqual(event_log[-1][0], '2020-01-01 00:00:00')
+        self.dao_mock.get_events.assert_called_once_with(self.job_record.db_id, limit=EVENT_LOG_MAX_SIZE - 2)
+
+        self.assertEqual(self.store.get_event_log(None), [])
+
+    def test_failed_flush(self):
+        self.dao_mock.insert_many.side_effect = EnvironmentError('DB is not available')
+        for i in range(EVENT_LOG_MAX_SIZE + 1):
+            self.store.append(self.job_record, f'message {i}')
+
+        # pending events are retained for the next attempt, but remain bounded
+        self.assertLessEqual(len(self.store.pending), EVENT_LOG_MAX_SIZE + 1)
+        self.assertEqual(self.store.pending[-1].message, f'message {EVENT_LOG_MAX_SIZE}')
+
+        self.dao_mock.insert_many.side_effect = None
+        pending = len(self.store.pending)
+        self.assertEqual(self.store.flush(), pending)
+        self.assertEqual(self.store.pending, [])
+
+
+class TestJobEventDao(unittest.TestCase):
+    def setUp(self):
+        self.ds_patcher = mock.patch('synergy.db.dao.base_dao.ds_manager.ds_factory')
+        self.collection = self.ds_patcher.start().return_value.connection.return_value
+        self.database = self.collection.database
+        self.job_event_dao = JobEventDao(mock.MagicMock())
+
+    def tearDown(self):
+        self.ds_patcher.stop()
+
+    def test_missing_collection(self):
+        self.database.list_collection_names.return_value = []
+        event = JobEvent(job_id='5e2b7a1c9d4f3a0012000001', created_at=datetime(2020, 1, 1), message='first')
+        self.job_event_dao.insert_many([event])
+        self.job_event_dao.insert_many([event])
+
+        # the collection is created capped, prior to the first insert only
+        self.database.create_collection.assert_called_once_with(
+            COLLECTION_JOB_EVENT_LOG, capped=True, size=settings.settings['event_log_capped_size_mb'] * 1024 * 1024)
+        self.collection.create_index.assert_called_once()
+        self.assertEqual(self.collection.insert_many.call_count, 2)
+
+    def test_existing_collection(self):
+        self.database.list_collection_names.return_value = [COLLECTION_JOB_EVENT_LOG]
+        self.collection.options.return_value = {}
+        self.job_event_dao.ensure_collection()
+
+        # collection left not capped by the older deployments is reported, rather than recreated
+        self.database.create_collection.assert_not_called()
+        self.job_event_dao.logger.warning.assert_called_once()
+        self.collection.create_index.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
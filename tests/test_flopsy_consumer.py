@@ -0,0 +1,120 @@
+__author__ = 'Bohdan Mushkevych'
+
+import json
+import socket
+import threading
+import unittest
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+import amqp
+
+from settings import enable_test_mode
+enable_test_mode()
+
+from synergy.conf import settings
+from synergy.mq.flopsy import Consumer
+from synergy.scheduler.scheduler_constants import QUEUE_JOB_STATUS
+
+
+def build_message(delivery_tag):
+    message = amqp.Message(json.dumps({'data': {'record_db_id': delivery_tag}}))
+    message.delivery_info = {'delivery_tag': delivery_tag}
+    return message
+
+
+class TestConsumer(unittest.TestCase):
+    def setUp(self):
+        self.connection = mock.MagicMock()
+        self.channel = self.connection.connection.channel.return_value
+        self.consumer = Consumer(QUEUE_JOB_STATUS, connection=self.connection, prefetch_count=10)
+
+    def test_prefetch(self):
+        self.channel.basic_qos.assert_called_once_with(prefetch_size=0, prefetch_count=10, a_global=False)
+
+        self.channel.reset_mock()
+        Consumer(QUEUE_JOB_STATUS, connection=self.connection, prefetch_count=0)
+        self.channel.basic_qos.assert_not_called()
+
+    def test_batch(self):
+        batches = []
+
+        def call_back(messages):
+            batches.append([message.body['record_db_id'] for message in messages])
+            # second message of the batch fails to process
+            return messages[1:2]
+
+        self.consumer.register_batch(call_back, batch_size=3)
+        for delivery_tag in range(1, 8):
+            self.consumer.dispatch(build_message(delivery_tag))
+        self.assertEqual(batches, [[1, 2, 3], [4, 5, 6]])
+
+        # failed message is re-queued; the rest of the batch, interleaved with it, is acknowledged one by one
+        self.assertEqual(self.channel.basic_reject.call_args_list,
+                         [mock.call(delivery_tag=2, requeue=True), mock.call(delivery_tag=5, requeue=True)])
+        self.assertEqual(self.channel.basic_ack.call_args_list,
+                         [mock.call(delivery_tag=1, multiple=False), mock.call(delivery_tag=3, multiple=False),
+                          mock.call(delivery_tag=4, multiple=False), mock.call(delivery_tag=6, multiple=False)])
+
+        # incomplete batch is handed over, once no message arrives within the batch_timeout
+        def blocking_read(timeout=None):
+            self.consumer.is_running = False
+            raise socket.timeout()
+
+        self.connection.connection.blocking_read.side_effect = blocking_read
+        self.consumer.wait()
+        self.assertEqual(batches[-1], [7])
+        self.assertEqual(self.channel.basic_ack.call_args, mock.call(delivery_tag=7, multiple=True))
+
+    def test_batch_last_failed(self):
+        # last message of the batch fails to process
+        self.consumer.register_batch(lambda messages: messages[-1:], batch_size=3)
+        for delivery_tag in range(1, 4):
+            self.consumer.dispatch(build_message(delivery_tag))
+
+        # rejected delivery is settled, and is not acknowledged again
+        self.channel.basic_reject.assert_called_once_with(delivery_tag=3, requeue=True)
+        self.channel.basic_ack.assert_called_once_with(delivery_tag=2, multiple=True)
+
+    def test_batch_exception(self):
+        self.consumer.register_batch(mock.Mock(side_effect=ValueError('simulated failure')), batch_size=2)
+        self.consumer.dispatch(build_message(1))
+        self.consumer.dispatch(build_message(2))
+
+        # whole batch is re-queued
+        self.assertEqual(self.channel.basic_reject.call_count, 2)
+        self.channel.basic_ack.assert_not_called()
+
+    def test_deferred_acknowledgement(self):
+        self.consumer.defer_acknowledgement(1)
+        self.consumer.defer_acknowledgement(2)
+
+        # deliveries processed by other threads are acknowledged by the consumer thread only
+        worker = threading.Thread(target=self.consumer.acknowledge_deferred, args=(1,))
+        worker.start()
+        worker.join()
+        self.channel.basic_ack.assert_not_called()
+
+        timeouts = []
+
+        def blocking_read(timeout=None):
+            timeouts.append(timeout)
+            if len(timeouts) == 1:
+                # no message arrives while the delivery 2 is processed
+                self.consumer.acknowledge_deferred(2)
+                raise socket.timeout()
+            self.consumer.is_running = False
+
+        self.connection.connection.blocking_read.side_effect = blocking_read
+        self.consumer.wait()
+        self.assertEqual(self.channel.basic_ack.call_args_list,
+                         [mock.call(delivery_tag=1, multiple=False), mock.call(delivery_tag=2, multiple=False)])
+
+        # consumer blocks on the next message once no acknowledgement is outstanding
+        self.assertEqual(timeouts, [settings.settings['mq_deferred_ack_interval_sec'], None])
+
+
+if __name__ == '__main__':
+    unittest.main()
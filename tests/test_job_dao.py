@@ -0,0 +1,44 @@
+__author__ = 'Bohdan Mushkevych'
+
+import unittest
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from settings import enable_test_mode
+enable_test_mode()
+
+from constants import PROCESS_SITE_HOURLY, PROCESS_SITE_DAILY
+from synergy.db.dao.job_dao import JobDao
+from synergy.db.model import job
+from synergy.scheduler.scheduler_constants import COLLECTION_JOB_HOURLY, COLLECTION_JOB_DAILY
+
+
+class TestJobDao(unittest.TestCase):
+    def setUp(self):
+        self.ds_patcher = mock.patch('synergy.db.dao.job_dao.ds_manager.ds_factory')
+        self.ds = self.ds_patcher.start().return_value
+        self.job_dao = JobDao(mock.MagicMock())
+
+    def tearDown(self):
+        self.ds_patcher.stop()
+
+    def test_stream_ensures_timeperiod_index(self):
+        collection = self.ds.connection.return_value
+        collection.find.return_value.sort.return_value = iter([])
+
+        # the index is created once per collection, prior to the first timeperiod-ordered load
+        for collection_name in [COLLECTION_JOB_HOURLY, COLLECTION_JOB_HOURLY, COLLECTION_JOB_DAILY]:
+            self.assertEqual(list(self.job_dao.stream(collection_name, {}, batch_size=16)), [])
+        self.assertEqual(collection.create_index.call_count, 2)
+        collection.create_index.assert_called_with([(job.TIMEPERIOD, 1)])
+        collection.find.return_value.sort.assert_called_with(job.TIMEPERIOD, 1)
+
+    def test_get_collection_name(self):
+        self.assertEqual(self.job_dao.get_collection_name(PROCESS_SITE_HOURLY), COLLECTION_JOB_HOURLY)
+        self.assertEqual(self.job_dao.get_collection_name(PROCESS_SITE_DAILY), COLLECTION_JOB_DAILY)
+
+
+if __name__ == '__main__':
+    unittest.main()
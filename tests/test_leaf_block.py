@@ -0,0 +1,54 @@
+__author__ = 'Bohdan Mushkevych'
+
+import unittest
+
+from synergy.db.model import job
+from synergy.db.model.job import Job
+from synergy.scheduler.leaf_block import LeafBlock, MAX_NUMBER_OF_FAILURES
+
+
+class TestLeafBlock(unittest.TestCase):
+    def setUp(self):
+        self.block = LeafBlock()
+        self.job_records = []
+        for index, state in enumerate([job.STATE_PROCESSED, job.STATE_SKIPPED, job.STATE_NOOP, job.STATE_EMBRYO]):
+            job_record = Job(db_id='5e2b7a1c9d4f3a0012{0:06d}'.format(index),
+                             process_name='SomeProcess',
+                             timeperiod='20200101{0:02d}'.format(index),
+                             state=state,
+                             number_of_failures=index)
+            self.job_records.append(job_record)
+        self.job_records[0].related_unit_of_work = '5e2b7a1c9d4f3a0012abcdef'
+
+    def test_round_trip(self):
+        indexes = [self.block.freeze(job_record) for job_record in self.job_records]
+        self.assertEqual(len(self.block), len(self.job_records))
+
+        for index, job_record in zip(indexes, self.job_records):
+            thawed = self.block.thaw(index, job_record.process_name, job_record.timeperiod)
+            self.assertEqual(thawed.document, job_record.document)
+        self.assertEqual(len(self.block), 0)
+
+    def test_vacant_records(self):
+        indexes = [self.block.freeze(job_record) for job_record in self.job_records]
+        self.block.release(indexes[1])
+        self.assertEqual(len(self.block), len(self.job_records) - 1)
+
+        # vacant record is reused
+        self.assertEqual(self.block.freeze(self.job_records[1]), indexes[1])
+        self.assertEqual(len(self.block.states), len(self.job_records))
+
+    def test_not_freezable(self):
+        job_record = Job(process_name='SomeProcess', timeperiod='2020010100', state=job.STATE_PROCESSED)
+        self.assertFalse(LeafBlock.is_freezable(job_record))
+        self.assertTrue(LeafBlock.is_freezable(self.job_records[0]))
+
+        # number of failures beyond the unsigned short array would not survive the round trip
+        self.job_records[0].number_of_failures = MAX_NUMBER_OF_FAILURES
+        self.assertTrue(LeafBlock.is_freezable(self.job_records[0]))
+        self.job_records[0].number_of_failures = MAX_NUMBER_OF_FAILURES + 1
+        self.assertFalse(LeafBlock.is_freezable(self.job_records[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
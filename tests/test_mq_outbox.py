@@ -0,0 +1,124 @@
+__author__ = 'Bohdan Mushkevych'
+
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import unittest
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from settings import enable_test_mode
+enable_test_mode()
+
+from synergy.system.mq_outbox import MqOutbox, OutboxOverflowError
+from synergy.system.mq_transmitter import MqTransmitter
+from synergy.scheduler.scheduler_constants import QUEUE_UOW_STATUS
+
+NUMBER_OF_MESSAGES = 100
+
+
+def build_publishers(published, fail_after=None):
+    """ :return: mocked PublishersPool, that records the published messages
+        and fails the publishing once *fail_after* messages are published """
+    def publish(message_data, priority=None):
+        if fail_after is not None and len(published) >= fail_after:
+            raise ConnectionError('broker is unreachable')
+        published.append(message_data['index'])
+
+    publishers = mock.MagicMock()
+    publishers.get.return_value.publish.side_effect = publish
+    publishers.wait_for_confirms.return_value = []
+    return publishers
+
+
+def enqueue_and_crash(directory):
+    """ appends messages to the outbox and kills the process before they are drained or fsync-ed """
+    outbox = MqOutbox(mock.MagicMock(), directory, max_size=1024 * 1024, segment_size=1024,
+                      fsync_batch_size=1000, publishers=mock.MagicMock())
+    for index in range(NUMBER_OF_MESSAGES):
+        outbox.append(QUEUE_UOW_STATUS, {'index': index})
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+class TestMqOutbox(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _open(self, published, fail_after=None, max_size=1024 * 1024):
+        return MqOutbox(mock.MagicMock(), self.directory, max_size=max_size, segment_size=1024,
+                        fsync_batch_size=8, publishers=build_publishers(published, fail_after))
+
+    def test_crash_recovery(self):
+        process = multiprocessing.get_context('fork').Process(target=enqueue_and_crash, args=(self.directory,))
+        process.start()
+        process.join()
+        self.assertEqual(process.exitcode, -signal.SIGKILL)
+
+        published = []
+        outbox = self._open(published)
+        self.assertEqual(outbox.depth, NUMBER_OF_MESSAGES)
+        self.assertEqual(outbox.drain(), NUMBER_OF_MESSAGES)
+        self.assertEqual(published, list(range(NUMBER_OF_MESSAGES)))
+        self.assertEqual(outbox.depth, 0)
+        self.assertEqual(outbox.size, 0)
+
+    def test_drain_resumes_in_order(self):
+        published = []
+        outbox = self._open(published, fail_after=20)
+        for index in range(NUMBER_OF_MESSAGES):
+            outbox.append(QUEUE_UOW_STATUS, {'index': index})
+
+        # broker goes away after 20 messages; drain position is kept at the last complete batch of 8
+        self.assertEqual(outbox.drain(), 16)
+        self.assertEqual(outbox.depth, NUMBER_OF_MESSAGES - 16)
+        self.assertIsNotNone(outbox.document['last_error'])
+        outbox.close()
+
+        # messages published after the last drain position are published again by the next run
+        published = []
+        outbox = self._open(published)
+        self.assertEqual(outbox.depth, NUMBER_OF_MESSAGES - 16)
+        self.assertEqual(outbox.drain(), NUMBER_OF_MESSAGES - 16)
+        self.assertEqual(published, list(range(16, NUMBER_OF_MESSAGES)))
+
+        # drained segments are removed; the outbox keeps accepting messages
+        self.assertEqual(outbox.size, 0)
+        self.assertEqual(os.listdir(self.directory), ['cursor'])
+        outbox.append(QUEUE_UOW_STATUS, {'index': NUMBER_OF_MESSAGES})
+        self.assertEqual(outbox.drain(), 1)
+        self.assertEqual(published[-1], NUMBER_OF_MESSAGES)
+
+    def test_overflow(self):
+        outbox = self._open([], max_size=256)
+        with self.assertRaises(OutboxOverflowError):
+            for index in range(NUMBER_OF_MESSAGES):
+                outbox.append(QUEUE_UOW_STATUS, {'index': index})
+        self.assertLessEqual(outbox.size, 256)
+        self.assertEqual(outbox.depth, outbox.number_of_appended)
+
+    def test_transmitter_fallback(self):
+        outbox = mock.MagicMock()
+        mq_transmitter = MqTransmitter(mock.MagicMock(), outbox=outbox)
+        mq_transmitter.publishers = mock.MagicMock()
+        mq_transmitter.publishers.get.side_effect = ConnectionError('broker is unreachable')
+
+        uow = mock.MagicMock(process_name='process', db_id='5e2b7a1c9d4f3a0012000001')
+        mq_transmitter.publish_uow_status(uow)
+        name, message_data, priority = outbox.append.call_args[0]
+        self.assertEqual(name, QUEUE_UOW_STATUS)
+        self.assertEqual(message_data['record_db_id'], uow.db_id)
+
+        # with no outbox, the failure is raised to the caller
+        mq_transmitter.outbox = None
+        self.assertRaises(ConnectionError, mq_transmitter.publish_uow_status, uow)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+__author__ = 'Bohdan Mushkevych'
+
+import unittest
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from settings import enable_test_mode
+enable_test_mode()
+
+from constants import PROCESS_SITE_HOURLY
+from synergy.conf import settings
+from synergy.db.model.unit_of_work import UnitOfWork
+from synergy.system import time_helper
+from synergy.system.mq_transmitter import MqTransmitter, LANE_LIVE, LANE_BACKFILL, compute_lane
+from synergy.system.time_qualifier import QUALIFIER_HOURLY
+
+
+def build_uow(timeperiod):
+    uow = UnitOfWork()
+    uow.db_id = '5e2b7a1c9d4f3a0012000001'
+    uow.process_name = PROCESS_SITE_HOURLY
+    uow.timeperiod = timeperiod
+    return uow
+
+
+class TestMqTransmitter(unittest.TestCase):
+    def setUp(self):
+        self.initial_max_priority = settings.settings['mq_max_priority']
+        self.initial_live_lane_periods = settings.settings['mq_live_lane_periods']
+        settings.settings['mq_max_priority'] = 2
+        settings.settings['mq_live_lane_periods'] = 2
+
+        self.actual_timeperiod = time_helper.actual_timeperiod(QUALIFIER_HOURLY)
+        self.mq_transmitter = MqTransmitter(mock.MagicMock())
+        self.mq_transmitter.publishers = mock.MagicMock()
+        self.publisher = self.mq_transmitter.publishers.get.return_value
+
+    def tearDown(self):
+        settings.settings['mq_max_priority'] = self.initial_max_priority
+        settings.settings['mq_live_lane_periods'] = self.initial_live_lane_periods
+
+    def _timeperiod(self, delta):
+        return time_helper.increment_timeperiod(QUALIFIER_HOURLY, self.actual_timeperiod, delta=delta)
+
+    def test_compute_lane(self):
+        for delta, lane in [(0, LANE_LIVE), (-2, LANE_LIVE), (-3, LANE_BACKFILL), (-24 * 30, LANE_BACKFILL)]:
+            self.assertEqual(compute_lane(build_uow(self._timeperiod(delta))), lane, delta)
+
+    def test_priority(self):
+        self.mq_transmitter.publish_managed_uow(build_uow(self._timeperiod(0)))
+        self.assertEqual(self.publisher.publish.call_args[1]['priority'], 2)
+
+        # GC re-submission of the live timeperiod takes the backfill lane
+        self.mq_transmitter.publish_managed_uow(build_uow(self._timeperiod(0)), lane=LANE_BACKFILL)
+        self.assertEqual(self.publisher.publish.call_args[1]['priority'], 0)
+
+        self.mq_transmitter.publish_managed_uows([build_uow(self._timeperiod(-5)), build_uow(self._timeperiod(-1))])
+        priorities = [call[1]['priority'] for call in self.publisher.publish.call_args_list[-2:]]
+        self.assertEqual(priorities, [0, 2])
+
+        # messages carry no priority once the lanes are turned off
+        settings.settings['mq_max_priority'] = 0
+        self.mq_transmitter.publish_managed_uow(build_uow(self._timeperiod(0)))
+        self.assertIsNone(self.publisher.publish.call_args[1]['priority'])
+
+    def test_confirm_managed_uows(self):
+        nacked = build_uow(self._timeperiod(0))
+        timed_out = build_uow(self._timeperiod(-1))
+
+        # failures of the job status publishing carry no token, and are not reported
+        self.publisher.pop_failed.return_value = [None, nacked]
+        self.mq_transmitter.publish_managed_uow(nacked)
+        self.publisher.pop_failed.return_value = []
+        self.mq_transmitter.publishers.wait_for_confirms.return_value = [timed_out]
+        self.assertEqual(self.mq_transmitter.confirm_managed_uows(), [nacked, timed_out])
+
+        self.mq_transmitter.publishers.wait_for_confirms.return_value = []
+        self.assertEqual(self.mq_transmitter.confirm_managed_uows(), [])
+
+        # state machine ticks read the arrived confirms only, and do not wait for the outstanding ones
+        self.mq_transmitter.publishers.poll_confirms.return_value = [timed_out]
+        self.assertEqual(self.mq_transmitter.confirm_managed_uows(wait=False), [timed_out])
+        self.assertEqual(self.mq_transmitter.publishers.wait_for_confirms.call_count, 2)
+
+    def test_publish_managed_uows(self):
+        uows = [build_uow(self._timeperiod(-delta)) for delta in range(4)]
+        self.mq_transmitter.publish_managed_uows(uows)
+        self.assertEqual(self.mq_transmitter.publishers.get.call_count, 1)
+        self.assertEqual(self.publisher.publish.call_count, 4)
+        self.assertEqual(self.publisher.release.call_count, 1)
+
+        # publisher fails on the third message: the unpublished remainder is kept in the outbox
+        self.mq_transmitter.outbox = mock.MagicMock()
+        self.publisher.reset_mock()
+        self.publisher.publish.side_effect = [None, None, ConnectionError('broker is unreachable')]
+        self.mq_transmitter.publish_managed_uows(uows)
+        self.assertEqual(self.mq_transmitter.outbox.append.call_count, 2)
+        self.assertTrue(self.publisher.close.called)
+        self.assertFalse(self.publisher.release.called)
+
+        self.mq_transmitter.publishers.get.reset_mock()
+        self.mq_transmitter.publish_managed_uows([])
+        self.assertFalse(self.mq_transmitter.publishers.get.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,12 +7,15 @@ except ImportError:
     from unittest import mock
 
 from constants import PROCESS_SITE_HOURLY, PROCESS_SITE_DAILY, PROCESS_SITE_YEARLY, PROCESS_SITE_MONTHLY
+from synergy.db.model import job
+from synergy.db.model.job import Job
 from synergy.system import time_helper
 from synergy.system.utils import increment_family_property
-from synergy.system.time_qualifier import QUALIFIER_HOURLY
-from synergy.scheduler.tree_node import AbstractTreeNode
+from synergy.system.time_qualifier import QUALIFIER_HOURLY, QUALIFIER_DAILY, QUALIFIER_MONTHLY
+from synergy.scheduler.tree_node import AbstractTreeNode, TreeNode
 from synergy.scheduler.tree import MultiLevelTree
 from synergy.scheduler.timetable import Timetable
+from synergy.conf import context
 from synergy.conf import settings
 
 
@@ -21,6 +24,7 @@ class TestTwoLevelTree(unittest.TestCase):
         self.time_table_mocked = mock.create_autospec(Timetable)
         self.initial_actual_timeperiod = time_helper.actual_timeperiod
         self.initial_synergy_start_time = settings.settings['synergy_start_timeperiod']
+        self.initial_cold_ttl = settings.settings['timetable_cold_ttl_minutes']
 
         self.actual_timeperiod = time_helper.actual_timeperiod(QUALIFIER_HOURLY)
         settings.settings['synergy_start_timeperiod'] = self.actual_timeperiod
@@ -47,6 +51,7 @@ class TestTwoLevelTree(unittest.TestCase):
     def tearDown(self):
         del self.trees
         settings.settings['synergy_start_timeperiod'] = self.initial_synergy_start_time
+        settings.settings['timetable_cold_ttl_minutes'] = self.initial_cold_ttl
         time_helper.actual_timeperiod = self.initial_actual_timeperiod
 
     def test_simple_build_tree(self):
@@ -132,6 +137,272 @@ class TestTwoLevelTree(unittest.TestCase):
             tree.build_tree()
             self._perform_assertions(tree, 2 * delta)
 
+    def test_node_index(self):
+        delta = 49
+
+        for tree in self.trees:
+            assert isinstance(tree, MultiLevelTree)
+            time_qualifier = tree.process_hierarchy.bottom_process.time_qualifier
+            new_synergy_start_time = time_helper.increment_timeperiod(time_qualifier,
+                                                                      self.actual_timeperiod,
+                                                                      -delta)
+            settings.settings['synergy_start_timeperiod'] = new_synergy_start_time
+            tree.build_tree()
+
+            # every materialized node must be registered in the index, and vice versa
+            materialized = dict()
+            nodes_to_visit = list(tree.root.children.values())
+            while nodes_to_visit:
+                node = nodes_to_visit.pop()
+                materialized[(node.process_name, node.timeperiod)] = node
+                nodes_to_visit.extend(node.children.values())
+
+            self.assertEqual(len(materialized), len(tree.nodes))
+            for key, node in materialized.items():
+                self.assertIs(tree.nodes[key], node)
+                self.assertIs(tree.get_node(*key), node)
+
+    def test_frontier_cursor(self):
+        delta = 48
+        tree = self.trees[-1]
+        assert isinstance(tree, MultiLevelTree)
+        new_synergy_start_time = time_helper.increment_timeperiod(QUALIFIER_HOURLY, self.actual_timeperiod, -delta)
+        settings.settings['synergy_start_timeperiod'] = new_synergy_start_time
+        tree.build_tree()
+
+        timeperiods = list(tree.root.children)
+        for timeperiod, node in tree.root.children.items():
+            node.job_record = Job(process_name=PROCESS_SITE_HOURLY, timeperiod=timeperiod, state=job.STATE_PROCESSED)
+        for timeperiod in timeperiods[10:]:
+            tree.root.children[timeperiod].job_record.state = job.STATE_IN_PROGRESS
+
+        # navigation advances the frontier cursor to the first active node
+        node = tree.get_next_node(PROCESS_SITE_HOURLY)
+        self.assertEqual(node.timeperiod, timeperiods[10])
+        self.assertIs(tree.frontier[PROCESS_SITE_HOURLY], node)
+
+        node.job_record.state = job.STATE_PROCESSED
+        node = tree.get_next_node(PROCESS_SITE_HOURLY)
+        self.assertEqual(node.timeperiod, timeperiods[11])
+        self.assertIs(tree.frontier[PROCESS_SITE_HOURLY], node)
+
+        # re-opened node that precedes the cursor is invisible until the cursor is rewound
+        reprocessed = tree.root.children[timeperiods[5]]
+        reprocessed.job_record.state = job.STATE_IN_PROGRESS
+        self.assertEqual(tree.get_next_node(PROCESS_SITE_HOURLY).timeperiod, timeperiods[11])
+        tree.rewind_frontier(reprocessed)
+        self.assertIs(tree.get_next_node(PROCESS_SITE_HOURLY), reprocessed)
+
+        # once all nodes are finished, the cursor rests on the last node
+        for node in tree.root.children.values():
+            node.job_record.state = job.STATE_PROCESSED
+        tree.get_next_node(PROCESS_SITE_HOURLY)
+        self.assertEqual(tree.frontier[PROCESS_SITE_HOURLY].timeperiod, timeperiods[-1])
+
+    def test_next_nodes(self):
+        delta = 48
+        tree = self.trees[-1]
+        new_synergy_start_time = time_helper.increment_timeperiod(QUALIFIER_HOURLY, self.actual_timeperiod, -delta)
+        settings.settings['synergy_start_timeperiod'] = new_synergy_start_time
+        tree.build_tree()
+
+        timeperiods = list(tree.root.children)
+        for timeperiod, node in tree.root.children.items():
+            node.job_record = Job(process_name=PROCESS_SITE_HOURLY, timeperiod=timeperiod, state=job.STATE_EMBRYO)
+        for timeperiod in timeperiods[:10] + timeperiods[12:14]:
+            tree.root.children[timeperiod].job_record.state = job.STATE_PROCESSED
+        tree.root.children[timeperiods[11]].job_record.state = job.STATE_IN_PROGRESS
+
+        # window starts with the next node and omits the finished nodes
+        nodes = tree.get_next_nodes(PROCESS_SITE_HOURLY, 4)
+        self.assertEqual([node.timeperiod for node in nodes],
+                         [timeperiods[10], timeperiods[11], timeperiods[14], timeperiods[15]])
+        self.assertEqual(tree.get_next_nodes(PROCESS_SITE_HOURLY, 1), nodes[:1])
+
+        # window does not stretch past the current timeperiod
+        nodes = tree.get_next_nodes(PROCESS_SITE_HOURLY, 1000)
+        self.assertEqual(nodes[-1].timeperiod, timeperiods[-1])
+        self.assertEqual(len(nodes), len(timeperiods) - 12)
+
+    def test_incremental_validation(self):
+        def assign_job_record(tree_node):
+            tree_node.job_record = Job(process_name=tree_node.process_name,
+                                       timeperiod=tree_node.timeperiod,
+                                       state=job.STATE_EMBRYO)
+        self.time_table_mocked.assign_job_record = mock.MagicMock(side_effect=assign_job_record)
+
+        tree = self.trees[0]
+        assert isinstance(tree, MultiLevelTree)
+        new_synergy_start_time = time_helper.increment_timeperiod(QUALIFIER_HOURLY, self.actual_timeperiod, -49)
+        settings.settings['synergy_start_timeperiod'] = new_synergy_start_time
+        tree.build_tree()
+        self.assertEqual(len(tree.dirty_nodes), len(tree.nodes))
+
+        tree.validate()
+        self.assertEqual(len(tree.dirty_nodes), 0)
+        for node in tree.nodes.values():
+            self.assertIsNotNone(node.job_record)
+
+        # job change marks the node dirty; incremental pass visits the node and its ancestors bottom-up
+        hourly_node = tree.nodes[(PROCESS_SITE_HOURLY, new_synergy_start_time)]
+        hourly_node.job_record = Job(process_name=PROCESS_SITE_HOURLY,
+                                     timeperiod=new_synergy_start_time,
+                                     state=job.STATE_IN_PROGRESS)
+        self.assertEqual(tree.dirty_nodes, {hourly_node})
+
+        original_validate = TreeNode.validate
+        with mock.patch.object(TreeNode, 'validate', autospec=True, side_effect=original_validate) as validate_mock:
+            tree.validate_incremental()
+
+        expected_nodes = [hourly_node, hourly_node.parent, hourly_node.parent.parent, hourly_node.parent.parent.parent]
+        self.assertEqual([c[0][0] for c in validate_mock.call_args_list], expected_nodes)
+        self.assertTrue(all(c[1] == {'recursive': False} for c in validate_mock.call_args_list))
+        self.assertEqual(len(tree.dirty_nodes), 0)
+
+        # newly created node is validated by the incremental pass
+        next_timeperiod = time_helper.increment_timeperiod(QUALIFIER_HOURLY, self.actual_timeperiod)
+        new_node = tree.get_node(PROCESS_SITE_HOURLY, next_timeperiod)
+        self.assertIn(new_node, tree.dirty_nodes)
+        tree.validate_incremental()
+        self.assertIsNotNone(new_node.job_record)
+
+    def test_incremental_validation_of_older_sibling(self):
+        def assign_job_record(tree_node):
+            state = job.STATE_SKIPPED if tree_node.process_name == PROCESS_SITE_HOURLY else job.STATE_EMBRYO
+            tree_node.job_record = Job(process_name=tree_node.process_name, timeperiod=tree_node.timeperiod,
+                                       state=state)
+
+        def skip_tree_node(tree_node):
+            tree_node.job_record = Job(process_name=tree_node.process_name, timeperiod=tree_node.timeperiod,
+                                       state=job.STATE_SKIPPED)
+
+        def validate_and_advance(tree, validate):
+            """ :return: job states of the tree nodes, once the tree has grown into the next day """
+            time_helper.actual_timeperiod = lambda qualifier: time_helper.cast_to_time_qualifier(qualifier,
+                                                                                                 '2026101823')
+            tree.build_tree()
+            tree.validate()
+
+            # day with all hourly nodes skipped is not skipped itself, until the next day appears
+            daily_node = tree.get_node(PROCESS_SITE_DAILY, '2026101800')
+            self.assertFalse(daily_node.job_record.is_skipped)
+
+            time_helper.actual_timeperiod = lambda qualifier: time_helper.cast_to_time_qualifier(qualifier,
+                                                                                                 '2026101900')
+            tree.build_tree()
+            validate()
+            return {key: node.job_record.state for key, node in tree.nodes.items()}
+
+        self.time_table_mocked.assign_job_record = mock.MagicMock(side_effect=assign_job_record)
+        self.time_table_mocked.skip_tree_node = mock.MagicMock(side_effect=skip_tree_node)
+        settings.settings['synergy_start_timeperiod'] = '2026101800'
+
+        full_tree = self.trees[1]
+        incremental_tree = MultiLevelTree(process_names=[PROCESS_SITE_HOURLY, PROCESS_SITE_DAILY],
+                                          timetable=self.time_table_mocked)
+        full_states = validate_and_advance(full_tree, full_tree.validate)
+        incremental_states = validate_and_advance(incremental_tree, incremental_tree.validate_incremental)
+
+        # new daily node gives the older one a younger sibling, and the older one is skipped by both validations
+        self.assertEqual(full_states[(PROCESS_SITE_DAILY, '2026101800')], job.STATE_SKIPPED)
+        self.assertEqual(incremental_states, full_states)
+
+    def test_cold_nodes(self):
+        def load_job_records(process_name, start_timeperiod, end_timeperiod):
+            time_qualifier = context.process_context[process_name].time_qualifier
+            job_records = dict()
+            timeperiod = start_timeperiod
+            while timeperiod <= end_timeperiod:
+                job_records[timeperiod] = Job(process_name=process_name, timeperiod=timeperiod,
+                                              state=job.STATE_PROCESSED)
+                timeperiod = time_helper.increment_timeperiod(time_qualifier, timeperiod)
+            return job_records
+        self.time_table_mocked.load_job_records = mock.MagicMock(side_effect=load_job_records)
+
+        tree = self.trees[0]
+        assert isinstance(tree, MultiLevelTree)
+        synergy_start_time = time_helper.increment_timeperiod(QUALIFIER_HOURLY, self.actual_timeperiod, -24 * 90)
+        settings.settings['synergy_start_timeperiod'] = synergy_start_time
+        tree.window_timeperiod = time_helper.increment_timeperiod(QUALIFIER_HOURLY, self.actual_timeperiod, -48)
+        tree.build_tree()
+
+        # only the hot window and the children blocks of its ancestors are materialized
+        hourly_nodes = [key for key in tree.nodes if key[0] == PROCESS_SITE_HOURLY]
+        self.assertLessEqual(len(hourly_nodes), 24 * 3)
+
+        cold_timeperiod = time_helper.cast_to_time_qualifier(
+            QUALIFIER_DAILY, time_helper.increment_timeperiod(QUALIFIER_HOURLY, self.actual_timeperiod, -24 * 60))
+        self.assertNotIn((PROCESS_SITE_DAILY, cold_timeperiod), tree.nodes)
+
+        # touching the cold node faults in the complete block of its siblings along with their job records
+        cold_node = tree.get_node(PROCESS_SITE_DAILY, cold_timeperiod)
+        self.assertTrue(cold_node.is_cold)
+        self.assertTrue(cold_node.job_record.is_processed)
+        self.assertNotIn(cold_node, tree.dirty_nodes)
+
+        expected_siblings = []
+        timeperiod = time_helper.cast_to_time_qualifier(QUALIFIER_DAILY,
+                                                        max(cold_node.parent.timeperiod, synergy_start_time))
+        while time_helper.cast_to_time_qualifier(QUALIFIER_MONTHLY, timeperiod) == cold_node.parent.timeperiod:
+            expected_siblings.append(timeperiod)
+            timeperiod = time_helper.increment_timeperiod(QUALIFIER_DAILY, timeperiod)
+        self.assertEqual(list(cold_node.parent.children), expected_siblings)
+
+        # children are faulted in on the first access
+        self.assertEqual(len(cold_node.children), 24)
+        self.assertFalse(cold_node.is_cold)
+
+        # finished cold subtrees are evicted, while the hot window stays intact
+        settings.settings['timetable_cold_ttl_minutes'] = 0
+        self.assertGreater(tree.evict_cold_nodes(), 0)
+        self.assertNotIn((PROCESS_SITE_DAILY, cold_timeperiod), tree.nodes)
+        self.assertIn((PROCESS_SITE_HOURLY, self.actual_timeperiod), tree.nodes)
+        for key, node in tree.nodes.items():
+            self.assertIs(tree.get_node(*key), node)
+
+        # evicted node is faulted in again on demand
+        self.assertTrue(tree.get_node(PROCESS_SITE_DAILY, cold_timeperiod).job_record.is_processed)
+
+    def test_leaf_compaction(self):
+        tree = self.trees[1]
+        assert isinstance(tree, MultiLevelTree)
+        new_synergy_start_time = time_helper.increment_timeperiod(QUALIFIER_HOURLY, self.actual_timeperiod, -48)
+        settings.settings['synergy_start_timeperiod'] = new_synergy_start_time
+        tree.build_tree()
+
+        for index, ((process_name, timeperiod), node) in enumerate(sorted(tree.nodes.items())):
+            node.job_record = Job(db_id='5e2b7a1c9d4f3a0012{0:06d}'.format(index),
+                                  process_name=process_name,
+                                  timeperiod=timeperiod,
+                                  state=job.STATE_PROCESSED)
+        active_node = tree.nodes[(PROCESS_SITE_HOURLY, self.actual_timeperiod)]
+        active_node.job_record.state = job.STATE_IN_PROGRESS
+        tree.validate()
+
+        # finished leaves are frozen, while the active leaf and the non-leaf nodes are not
+        hourly_nodes = [node for (process_name, _), node in tree.nodes.items() if process_name == PROCESS_SITE_HOURLY]
+        frozen_nodes = [node for node in hourly_nodes if node.block_index is not None]
+        self.assertEqual(len(frozen_nodes), len(hourly_nodes) - 1)
+        self.assertIsNone(active_node.block_index)
+        for node in tree.nodes.values():
+            if node.process_name == PROCESS_SITE_DAILY:
+                self.assertIsNone(node.block_index)
+                self.assertEqual(len(node.leaf_block), len(node.children) - (active_node.parent is node))
+
+        # job record is thawed on access, and frozen again by the validation
+        frozen_node = frozen_nodes[0]
+        self.assertTrue(frozen_node.job_record.is_processed)
+        self.assertEqual(frozen_node.job_record.timeperiod, frozen_node.timeperiod)
+        self.assertIsNone(frozen_node.block_index)
+        tree.validate_incremental()
+        self.assertIsNotNone(frozen_node.block_index)
+
+        # binding of a new job record releases the frozen one
+        frozen_node.job_record = Job(process_name=PROCESS_SITE_HOURLY, timeperiod=frozen_node.timeperiod,
+                                     state=job.STATE_EMBRYO)
+        self.assertIsNone(frozen_node.block_index)
+        self.assertTrue(frozen_node.job_record.is_embryo)
+
 
 if __name__ == '__main__':
     unittest.main()
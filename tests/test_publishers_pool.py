@@ -1,16 +1,54 @@
 __author__ = 'Bohdan Mushkevych'
 
+import socket
+import time
 import unittest
+from collections import defaultdict, deque
 try:
     import mock
 except ImportError:
     from unittest import mock
 
-from synergy.mq.flopsy import PublishersPool, _Pool, Publisher
+from synergy.mq.flopsy import PublishersPool, _Pool, Publisher, ConnectionManager
 from synergy.system.system_logger import get_logger
 from tests.ut_context import PROCESS_UNIT_TEST, register_processes
 
 
+def build_connection():
+    """ :return: mocked live flopsy.Connection, that opens a distinct channel per call """
+    connection = mock.MagicMock(is_alive=True)
+    connection.connection.channel.side_effect = lambda: mock.MagicMock(is_open=True)
+    return connection
+
+
+class ConfirmingChannel(object):
+    """ stand-in for the amqp.Channel in the confirm mode """
+
+    def __init__(self):
+        self.is_open = True
+        self.events = defaultdict(set)
+        self.number_of_published = 0
+
+        # format: deque of (event name, delivery tag, multiple) the broker has sent, but the client has not read
+        self.confirms = deque()
+
+    def confirm_select(self):
+        pass
+
+    def basic_publish(self, message, exchange, routing_key):
+        self.number_of_published += 1
+
+    def drain_events(self, timeout=None):
+        if not self.confirms:
+            raise socket.timeout()
+        event, delivery_tag, multiple = self.confirms.popleft()
+        for callback in self.events[event]:
+            callback(delivery_tag, multiple)
+
+    def close(self):
+        self.is_open = False
+
+
 class TestPublishersPool(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -43,6 +81,93 @@ class TestPublishersPool(unittest.TestCase):
         self.assertEqual(mock_publisher.__del__.call_count, 0)
         self.assertTrue(len(single_pool.publishers) == 0)
 
+    @mock.patch('synergy.mq.flopsy.Connection')
+    def test_connection_manager(self, connection_klass):
+        connection_klass.side_effect = build_connection
+        manager = ConnectionManager(size=2)
+
+        # connections are shared round-robin, once the manager holds *size* of them
+        connections = [manager.get() for _ in range(10)]
+        self.assertEqual(manager.number_of_connections, 2)
+        self.assertEqual(len({id(connection) for connection in connections}), 2)
+
+        # broken connection is replaced on the next checkout
+        connections[0].is_alive = False
+        manager.get()
+        self.assertEqual(manager.number_of_connections, 2)
+        self.assertNotIn(connections[0], manager.connections)
+        connections[0].close.assert_called_once_with()
+
+    @mock.patch('synergy.mq.flopsy.Connection')
+    def test_bounded_pool(self, connection_klass):
+        connection_klass.side_effect = build_connection
+        manager = ConnectionManager(size=1)
+        single_pool = _Pool(logger=self.logger, name=PROCESS_UNIT_TEST, connection_manager=manager, max_size=2)
+
+        single_pool.prewarm(5)
+        self.assertEqual(len(single_pool.publishers), 2)
+
+        publishers = [single_pool.get() for _ in range(3)]
+        self.assertEqual(manager.number_of_connections, 1)
+        for publisher in publishers:
+            publisher.release()
+        self.assertEqual(len(single_pool.publishers), 2)
+
+        # publisher with the closed channel is discarded on checkout; shared connection stays open
+        broken = single_pool.publishers[-1]
+        broken.channel.is_open = False
+        self.assertIsNot(single_pool.get(), broken)
+        broken.channel.close.assert_called_once_with()
+        broken.connection.close.assert_not_called()
+
+    def test_publisher_confirms(self):
+        channel = ConfirmingChannel()
+        connection = mock.MagicMock(is_alive=True)
+        connection.connection.channel.return_value = channel
+        connection.connection.drain_events.side_effect = channel.drain_events
+        publisher = Publisher(PROCESS_UNIT_TEST, connection=connection, confirm_window=2, confirm_timeout=0.05)
+
+        # confirms are read as they arrive, without blocking the publishing
+        publisher.publish({}, token='a')
+        channel.confirms.append(('basic_ack', 1, False))
+        publisher.publish({}, token='b')
+        self.assertEqual([token for token, _ in publisher.unconfirmed.values()], ['b'])
+
+        channel.confirms.append(('basic_nack', 2, False))
+        publisher.publish({}, token='c')
+        self.assertEqual([token for token, _ in publisher.unconfirmed.values()], ['c'])
+        self.assertEqual(publisher.failed, ['b'])
+
+        # full window blocks the publishing until a confirm arrives, or the timeout expires
+        publisher.publish({}, token='d')
+        self.assertEqual(len(publisher.unconfirmed), 0)
+        self.assertEqual(publisher.pop_failed(), ['b', 'c', 'd'])
+        self.assertEqual(publisher.pop_failed(), [])
+
+        # single multiple-ack settles all messages up to its delivery tag
+        publisher.publish({}, token='e')
+        channel.confirms.append(('basic_ack', 5, True))
+        publisher.wait_for_confirms()
+        self.assertEqual(len(publisher.unconfirmed), 0)
+        self.assertEqual(publisher.pop_failed(), [])
+        self.assertEqual(channel.number_of_published, 5)
+
+        # polling reads the arrived confirms without blocking, and expires the messages older than the timeout
+        publisher.publish({}, token='f')
+        channel.confirms.append(('basic_ack', 6, False))
+        publisher.poll_confirms()
+        self.assertEqual(len(publisher.unconfirmed), 0)
+
+        publisher.publish({}, token='g')
+        publisher.poll_confirms()
+        self.assertEqual([token for token, _ in publisher.unconfirmed.values()], ['g'])
+        self.assertEqual(publisher.pop_failed(), [])
+
+        time.sleep(0.05)
+        publisher.poll_confirms()
+        self.assertEqual(len(publisher.unconfirmed), 0)
+        self.assertEqual(publisher.pop_failed(), ['g'])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,60 @@
+__author__ = 'Bohdan Mushkevych'
+
+import unittest
+from threading import Event
+
+from synergy.system.serial_executor import SerialExecutor
+
+
+class TestSerialExecutor(unittest.TestCase):
+    def setUp(self):
+        self.executor = SerialExecutor('TestExecutor')
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def _block(self):
+        """ occupies the executor until the returned event is set """
+        is_released = Event()
+        self.executor.submit(is_released.wait, 5)
+        return is_released
+
+    def test_order(self):
+        executed = []
+        futures = [self.executor.submit(executed.append, index) for index in range(100)]
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(executed, list(range(100)))
+
+    def test_coalescing(self):
+        executed = []
+        is_released = self._block()
+
+        # tasks with the same key are coalesced while awaiting the execution
+        future_a = self.executor.submit_once('key_a', executed.append, 'a_1')
+        self.assertIs(self.executor.submit_once('key_a', executed.append, 'a_2'), future_a)
+        future_b = self.executor.submit_once('key_b', executed.append, 'b_1')
+
+        is_released.set()
+        future_a.result(timeout=5)
+        future_b.result(timeout=5)
+        self.assertEqual(executed, ['a_1', 'b_1'])
+
+        # once executed, the key can be queued again
+        self.executor.submit_once('key_a', executed.append, 'a_3').result(timeout=5)
+        self.assertEqual(executed, ['a_1', 'b_1', 'a_3'])
+
+    def test_exception(self):
+        def _fail():
+            raise ValueError('failed task')
+
+        future = self.executor.submit_once('key', _fail)
+        self.assertRaises(ValueError, future.result, 5)
+
+        # failure of a task does not affect the following ones
+        self.assertEqual(self.executor.submit(sum, [1, 2]).result(timeout=5), 3)
+        self.assertEqual(self.executor.pending, dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+__author__ = 'Bohdan Mushkevych'
+
+import random
+import unittest
+
+from synergy.system import time_helper
+from synergy.system.sorted_dict import SortedDict
+from synergy.system.time_qualifier import QUALIFIER_HOURLY
+
+
+class TestSortedDict(unittest.TestCase):
+    def setUp(self):
+        self.timeperiods = []
+        timeperiod = '2010123100'
+        for _ in range(48):
+            self.timeperiods.append(timeperiod)
+            timeperiod = time_helper.increment_timeperiod(QUALIFIER_HOURLY, timeperiod)
+
+    def test_ordering(self):
+        shuffled = list(self.timeperiods)
+        random.shuffle(shuffled)
+
+        d = SortedDict()
+        for timeperiod in shuffled:
+            d[timeperiod] = timeperiod
+        self.assertEqual(list(d), self.timeperiods)
+        self.assertEqual(list(d.values()), self.timeperiods)
+        self.assertEqual(list(reversed(d)), list(reversed(self.timeperiods)))
+        self.assertEqual(len(d), len(self.timeperiods))
+
+        # override of the existing key must not duplicate it
+        d[self.timeperiods[0]] = 'value'
+        self.assertEqual(len(d), len(self.timeperiods))
+        self.assertEqual(d[self.timeperiods[0]], 'value')
+
+        del d[self.timeperiods[10]]
+        self.assertNotIn(self.timeperiods[10], d)
+        self.assertEqual(list(d), self.timeperiods[:10] + self.timeperiods[11:])
+
+    def test_navigation(self):
+        d = SortedDict({timeperiod: None for timeperiod in self.timeperiods})
+        self.assertEqual(d.first_key(), self.timeperiods[0])
+        self.assertEqual(d.last_key(), self.timeperiods[-1])
+
+        for index, timeperiod in enumerate(self.timeperiods):
+            expected_successor = self.timeperiods[index + 1] if index + 1 < len(self.timeperiods) else None
+            expected_predecessor = self.timeperiods[index - 1] if index > 0 else None
+            self.assertEqual(d.successor(timeperiod), expected_successor)
+            self.assertEqual(d.predecessor(timeperiod), expected_predecessor)
+
+        # keys that are not registered in the dictionary
+        self.assertEqual(d.successor('2000010100'), self.timeperiods[0])
+        self.assertEqual(d.predecessor('2030010100'), self.timeperiods[-1])
+
+        self.assertEqual(list(d.values_from(self.timeperiods[10])), [None] * (len(self.timeperiods) - 10))
+        self.assertEqual(list(d.values_from('2030010100')), [])
+
+        empty = SortedDict()
+        self.assertIsNone(empty.first_key())
+        self.assertIsNone(empty.last_key())
+        self.assertIsNone(empty.successor('2010123100'))
+        self.assertIsNone(empty.predecessor('2010123100'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -89,6 +89,32 @@ class DiscreteSMUnitTest(unittest.TestCase):
 
         self.sm_real._StateMachineDiscrete__process_finalizable_job.assert_called_once_with(mock.ANY, mock.ANY)
 
+    def test_manage_embryo_jobs(self):
+        """ coverage scope: backlog of embryo jobs is inserted, published and updated in bulk;
+            job whose unit_of_work already exists is passed to the regular flow """
+        timeperiods = ['2013010120', '2013010121', '2013010122']
+        job_records = [get_job_record(job.STATE_EMBRYO, timeperiod, PROCESS_SITE_HOURLY) for timeperiod in timeperiods]
+
+        def insert_many(uows):
+            for index, uow in enumerate(uows):
+                uow.db_id = f'a_uow_id_{index}'
+            return [uows[1]]
+
+        self.uow_dao_mocked.insert_many = mock.MagicMock(side_effect=insert_many)
+        self.sm_real.mq_transmitter = mock.MagicMock()
+        self.sm_real.manage_job = mock.Mock()
+
+        self.sm_real.manage_embryo_jobs(job_records)
+        self.uow_dao_mocked.insert_many.assert_called_once_with(mock.ANY)
+        published = self.sm_real.mq_transmitter.publish_managed_uows.call_args[0][0]
+        self.assertEqual([uow.timeperiod for uow in published], ['2013010120', '2013010122'])
+
+        updated = self.job_dao_mocked.update_many.call_args[0][0]
+        self.assertEqual([job_record.timeperiod for job_record in updated], ['2013010120', '2013010122'])
+        self.assertTrue(all(job_record.is_in_progress for job_record in updated))
+        self.assertEqual(updated[1].related_unit_of_work, 'a_uow_id_2')
+        self.sm_real.manage_job.assert_called_once_with(job_records[1])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,170 @@
+__author__ = 'Bohdan Mushkevych'
+
+import threading
+import time
+import unittest
+from concurrent.futures import Future
+
+from synergy.system.repeat_timer import RepeatTimer
+from synergy.system.timer_dispatcher import TimerDispatcher, DENSITY_WINDOW_SECONDS
+
+
+class TestTimerDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.dispatcher = TimerDispatcher('TestTimerDispatcher', daemonic=True, max_workers=1)
+
+    def tearDown(self):
+        self.dispatcher.workers.shutdown()
+
+    def _wait_for_idle(self, timeout=5.0):
+        deadline = time.time() + timeout
+        while self.dispatcher.thread is not None and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_order(self):
+        fired = []
+        is_done = threading.Event()
+        now = time.time()
+        for index in [3, 1, 4, 0, 2]:
+            self.dispatcher.schedule(now + 0.05 * index, lambda i=index: fired.append(i))
+        self.dispatcher.schedule(now + 0.3, is_done.set)
+
+        self.assertTrue(is_done.wait(5))
+        self.assertEqual(fired, [0, 1, 2, 3, 4])
+
+    def test_cancel(self):
+        fired = []
+        now = time.time()
+        entries = [self.dispatcher.schedule(now + 0.1, lambda i=index: fired.append(i)) for index in range(10)]
+        for entry in entries[::2]:
+            self.dispatcher.cancel(entry)
+        self.assertEqual(len(self.dispatcher), 5)
+
+        self._wait_for_idle()
+        self.dispatcher.workers.submit(lambda: None).result(timeout=5)
+        self.assertEqual(sorted(fired), [1, 3, 5, 7, 9])
+
+        # cancellation of the dispatched call_back has no effect
+        self.dispatcher.cancel(entries[1])
+        self.assertEqual(len(self.dispatcher), 0)
+
+    def test_thread_lifecycle(self):
+        self.assertIsNone(self.dispatcher.thread)
+        entry = self.dispatcher.schedule(time.time() + 60, lambda: None)
+        self.assertTrue(self.dispatcher.thread.is_alive())
+
+        # dispatcher thread exits once there is nothing to schedule
+        self.dispatcher.cancel(entry)
+        self._wait_for_idle()
+        self.assertIsNone(self.dispatcher.thread)
+
+    def test_repeat_timers_share_thread(self):
+        number_of_threads = threading.active_count()
+        ticks = []
+        timers = [RepeatTimer(0.05, ticks.append, daemonic=True, args=[index]) for index in range(200)]
+        for timer in timers:
+            timer.start()
+        time.sleep(0.3)
+        self.assertLessEqual(threading.active_count(), number_of_threads + 1 + 16)
+        for timer in timers:
+            timer.cancel()
+            self.assertFalse(timer.is_alive())
+
+        self.assertTrue(set(range(200)).issubset(ticks))
+        self.assertRaises(RuntimeError, timers[0].start)
+
+    def test_tick_density(self):
+        now = 1000000
+        for second, count in [(now - DENSITY_WINDOW_SECONDS - 5, 50), (now - 10, 3), (now - 9, 7), (now - 1, 1)]:
+            for _ in range(count):
+                self.dispatcher._count_tick(second)
+
+        # ticks outside of the window are not reported
+        report = self.dispatcher.tick_density(now)
+        self.assertEqual(report['number_of_ticks'], 11)
+        self.assertEqual(report['busy_seconds'], 3)
+        self.assertEqual(report['max_per_second'], 7)
+
+    def test_phase(self):
+        timer = RepeatTimer(60, lambda: None, daemonic=True, phase=5.0, jitter=1.0)
+        timer.start()
+        try:
+            # phase replaces the first countdown; jitter is added on top of it
+            self.assertTrue(4 < timer.next_run_in().total_seconds() <= 6)
+        finally:
+            timer.cancel()
+
+    def test_fixed_rate(self):
+        interval = 0.2
+        fired_at = []
+
+        def call_back():
+            fired_at.append(time.time())
+            if len(fired_at) == 2:
+                # overrun: the tick spans 2 more slots
+                time.sleep(2.5 * interval)
+
+        timer = RepeatTimer(interval, call_back, daemonic=True, phase=0.05, fixed_rate=True)
+        timer.start()
+        time.sleep(8 * interval)
+        timer.cancel()
+
+        # ticks are anchored to the wall-clock multiples of the interval shifted by the phase
+        for timestamp in fired_at:
+            self.assertLess((timestamp - 0.05) % interval, 0.05)
+        # slots missed by the overrunning tick are coalesced, rather than queued
+        self.assertEqual(timer.metrics.number_of_overruns, 1)
+        self.assertEqual(timer.metrics.number_of_skipped, 2)
+        self.assertTrue(5 <= len(fired_at) <= 6)
+
+    def test_future_completion(self):
+        futures = []
+
+        def call_back():
+            futures.append(Future())
+            return futures[-1]
+
+        timer = RepeatTimer(0.05, call_back, daemonic=True)
+        timer.start()
+        time.sleep(0.3)
+
+        # next countdown waits for the Future returned by the call_back
+        self.assertEqual(len(futures), 1)
+        futures[0].set_result(None)
+        time.sleep(0.3)
+        timer.cancel()
+        self.assertGreaterEqual(len(futures), 2)
+        self.assertGreaterEqual(timer.metrics.document['max_duration'], 0.2)
+
+    def test_trigger_coalescing(self):
+        is_released = threading.Event()
+        started = []
+
+        def call_back():
+            started.append(time.time())
+            is_released.wait(5)
+
+        timer = RepeatTimer(60, call_back, daemonic=True)
+        timer.start()
+
+        # trigger returns without waiting for the call_back
+        started_at = time.time()
+        timer.trigger()
+        self.assertLess(time.time() - started_at, 0.1)
+        time.sleep(0.1)
+        self.assertEqual(len(started), 1)
+
+        # requests made while the tick is running are collapsed into a single follow-up tick
+        for _ in range(10):
+            timer.trigger()
+        is_released.set()
+        time.sleep(0.2)
+        self.assertEqual(len(started), 2)
+
+        # timer resumes the regular countdown
+        self.assertGreater(timer.next_run_in().total_seconds(), 59)
+        timer.cancel()
+
+
+if __name__ == '__main__':
+    unittest.main()
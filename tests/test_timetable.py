@@ -0,0 +1,202 @@
+__author__ = 'Bohdan Mushkevych'
+
+import unittest
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from settings import enable_test_mode
+enable_test_mode()
+
+from constants import TREE_SITE, TREE_CLIENT, TREE_ALERT, PROCESS_SITE_HOURLY, PROCESS_SITE_DAILY, \
+    PROCESS_CLIENT_DAILY
+from synergy.conf import context
+from synergy.db.model import job
+from synergy.db.model.job import Job
+from synergy.scheduler.scheduler_constants import COLLECTION_JOB_HOURLY, COLLECTION_JOB_DAILY
+from synergy.scheduler.tree import MultiLevelTree
+from synergy.scheduler.timetable import Timetable
+
+
+class TestTimetable(unittest.TestCase):
+    def setUp(self):
+        # DB-facing steps of the Timetable construction are out of scope
+        with mock.patch.object(Timetable, 'load_tree'), \
+                mock.patch.object(Timetable, 'build_trees'), \
+                mock.patch.object(Timetable, 'validate'):
+            self.timetable = Timetable(mock.MagicMock())
+
+    def tearDown(self):
+        del self.timetable
+
+    def test_process_trees(self):
+        for tree_name, context_entry in context.timetable_context.items():
+            for process_name in context_entry.enclosed_processes:
+                self.assertIs(self.timetable.get_tree(process_name), self.timetable.trees[tree_name])
+        self.assertIsNone(self.timetable.get_tree('non_existent_process'))
+
+        with self.assertRaises(TypeError):
+            self.timetable.process_trees[PROCESS_SITE_HOURLY] = None
+
+    def test_dependant_trees(self):
+        site_tree = self.timetable.trees[TREE_SITE]
+        client_tree = self.timetable.trees[TREE_CLIENT]
+        self.assertEqual(self.timetable.get_dependant_trees(site_tree), (client_tree, ))
+        self.assertEqual(self.timetable.get_dependant_trees(client_tree), tuple())
+        self.assertEqual(self.timetable.get_dependant_trees(self.timetable.trees[TREE_ALERT]), tuple())
+
+    def test_lock_groups(self):
+        # client tree depends on the site tree, thus they share the lock group
+        self.assertEqual(self.timetable.lock_groups[TREE_SITE], tuple(sorted([TREE_CLIENT, TREE_SITE])))
+        self.assertEqual(self.timetable.lock_groups[TREE_CLIENT], self.timetable.lock_groups[TREE_SITE])
+        self.assertEqual(self.timetable.lock_groups[TREE_ALERT], (TREE_ALERT, ))
+
+        site_tree = self.timetable.trees[TREE_SITE]
+        client_tree = self.timetable.trees[TREE_CLIENT]
+        alert_tree = self.timetable.trees[TREE_ALERT]
+        with self.timetable.tree_lock(client_tree):
+            self.assertTrue(site_tree.lock._is_owned())
+            self.assertFalse(alert_tree.lock._is_owned())
+
+            # nested acquisition of the held group is re-entrant
+            with self.timetable.tree_lock(site_tree):
+                self.assertTrue(client_tree.lock._is_owned())
+        self.assertFalse(site_tree.lock._is_owned())
+        self.assertFalse(client_tree.lock._is_owned())
+
+    def test_dependant_tree_nodes(self):
+        site_tree = self.timetable.trees[TREE_SITE]
+        client_tree = self.timetable.trees[TREE_CLIENT]
+
+        site_node = site_tree.get_node(PROCESS_SITE_DAILY, '2015030100')
+        self.assertEqual(self.timetable.get_dependant_tree_nodes(site_node),
+                         {client_tree.get_node(PROCESS_CLIENT_DAILY, '2015030100')})
+
+        # client tree has no hourly level, hence the site hourly node has no counterparts
+        site_node = site_tree.get_node(PROCESS_SITE_HOURLY, '2015030105')
+        self.assertEqual(self.timetable.get_dependant_tree_nodes(site_node), set())
+
+    def test_mark_dirty(self):
+        site_tree = self.timetable.trees[TREE_SITE]
+        client_tree = self.timetable.trees[TREE_CLIENT]
+        site_node = site_tree.get_node(PROCESS_SITE_DAILY, '2015030100')
+        client_node = client_tree.get_node(PROCESS_CLIENT_DAILY, '2015030100')
+        site_tree.dirty_nodes.clear()
+        client_tree.dirty_nodes.clear()
+
+        # job state change marks the node and its counterparts in the dependant trees
+        self.timetable.mark_dirty(Job(process_name=PROCESS_SITE_DAILY, timeperiod='2015030100'))
+        self.assertEqual(site_tree.dirty_nodes, {site_node})
+        self.assertEqual(client_tree.dirty_nodes, {client_node})
+
+        # nodes are not materialized by the marking
+        self.timetable.mark_dirty(Job(process_name=PROCESS_SITE_DAILY, timeperiod='2015030200'))
+        self.assertNotIn((PROCESS_SITE_DAILY, '2015030200'), site_tree.nodes)
+
+    def test_assign_job_records(self):
+        site_tree = self.timetable.trees[TREE_SITE]
+        nodes = [site_tree.get_node(PROCESS_SITE_HOURLY, timeperiod)
+                 for timeperiod in ['2015030100', '2015030101', '2015030102']]
+        existing_record = Job(db_id='5e2b7a1c9d4f3a0012000001', process_name=PROCESS_SITE_HOURLY,
+                              timeperiod='2015030100', state=job.STATE_PROCESSED)
+        concurrent_record = Job(db_id='5e2b7a1c9d4f3a0012000003', process_name=PROCESS_SITE_HOURLY,
+                                timeperiod='2015030102', state=job.STATE_EMBRYO)
+
+        def insert_many(collection_name, instances):
+            # second embryo record has been created concurrently
+            instances[0].db_id = '5e2b7a1c9d4f3a0012000002'
+            return instances[1:]
+
+        job_dao = mock.MagicMock()
+        job_dao.get_collection_name.return_value = COLLECTION_JOB_HOURLY
+        job_dao.get_many.side_effect = [[existing_record], [concurrent_record]]
+        job_dao.insert_many.side_effect = insert_many
+        self.timetable.job_dao = job_dao
+
+        self.timetable.assign_job_records(nodes)
+        self.assertIs(nodes[0].job_record, existing_record)
+        self.assertTrue(nodes[1].job_record.is_embryo)
+        self.assertEqual(nodes[1].job_record.db_id, '5e2b7a1c9d4f3a0012000002')
+        self.assertIs(nodes[2].job_record, concurrent_record)
+
+        # one query to resolve existing records, one bulk insert and one query to resolve the duplicates
+        self.assertEqual(job_dao.get_many.call_count, 2)
+        job_dao.insert_many.assert_called_once()
+        self.assertEqual(len(job_dao.insert_many.call_args[0][1]), 2)
+
+    def test_catchup_job_records(self):
+        site_tree = self.timetable.trees[TREE_SITE]
+        states = {'2015030100': job.STATE_EMBRYO, '2015030101': job.STATE_EMBRYO,
+                  '2015030102': job.STATE_EMBRYO, '2015030103': job.STATE_IN_PROGRESS}
+
+        def assign_job_records(nodes):
+            for node in nodes:
+                node.job_record = Job(process_name=node.process_name, timeperiod=node.timeperiod,
+                                      state=states.get(node.timeperiod, job.STATE_EMBRYO))
+
+        self.timetable.assign_job_records = mock.MagicMock(side_effect=assign_job_records)
+        first_node = site_tree.get_node(PROCESS_SITE_HOURLY, '2015030100')
+        with mock.patch.object(site_tree, 'get_next_node', return_value=first_node), \
+                mock.patch('synergy.scheduler.timetable.time_helper.actual_timeperiod', return_value='2015030105'):
+            # backlog is limited by the first job record that is not in STATE_EMBRYO
+            job_records = self.timetable.get_catchup_job_records(PROCESS_SITE_HOURLY, 10)
+            self.assertEqual([job_record.timeperiod for job_record in job_records],
+                             ['2015030100', '2015030101', '2015030102'])
+            self.timetable.assign_job_records.assert_called_once()
+
+            # backlog is limited by the batch size
+            job_records = self.timetable.get_catchup_job_records(PROCESS_SITE_HOURLY, 2)
+            self.assertEqual([job_record.timeperiod for job_record in job_records], ['2015030100', '2015030101'])
+
+            # the most recent finished timeperiod is left to the regular flow
+            states['2015030103'] = job.STATE_EMBRYO
+            for timeperiod in ['2015030103', '2015030104']:
+                site_tree.get_node(PROCESS_SITE_HOURLY, timeperiod).job_record = None
+            job_records = self.timetable.get_catchup_job_records(PROCESS_SITE_HOURLY, 10)
+            self.assertEqual(job_records[-1].timeperiod, '2015030103')
+
+    def test_load_tree(self):
+        job_records = {
+            COLLECTION_JOB_HOURLY: [Job(process_name=PROCESS_SITE_HOURLY, timeperiod=timeperiod,
+                                        state=job.STATE_PROCESSED)
+                                    for timeperiod in ['2015030100', '2015030123', '2015030200']],
+            COLLECTION_JOB_DAILY: [Job(process_name=PROCESS_SITE_DAILY, timeperiod=timeperiod,
+                                       state=job.STATE_IN_PROGRESS)
+                                   for timeperiod in ['2015030100', '2015030200']],
+        }
+        job_dao = mock.MagicMock()
+        job_dao.stream.side_effect = lambda collection_name, query, batch_size: \
+            iter(job_records.get(collection_name, []))
+        self.timetable.job_dao = job_dao
+
+        applied_records = []
+        original_update_node = MultiLevelTree.update_node
+
+        def update_node(tree, job_record):
+            applied_records.append(job_record)
+            original_update_node(tree, job_record)
+
+        with mock.patch.object(MultiLevelTree, 'update_node', autospec=True, side_effect=update_node):
+            self.timetable.load_tree()
+
+        # all collections are streamed, while the job records are applied in the timeperiod order
+        self.assertEqual(job_dao.stream.call_count, 4)
+        self.assertEqual([(job_record.timeperiod, job_record.process_name) for job_record in applied_records],
+                         [('2015030100', PROCESS_SITE_DAILY), ('2015030100', PROCESS_SITE_HOURLY),
+                          ('2015030123', PROCESS_SITE_HOURLY),
+                          ('2015030200', PROCESS_SITE_DAILY), ('2015030200', PROCESS_SITE_HOURLY)])
+
+        site_tree = self.timetable.trees[TREE_SITE]
+        for job_record in applied_records:
+            self.assertIs(site_tree.get_node(job_record.process_name, job_record.timeperiod).job_record, job_record)
+
+    def test_load_tree_failure(self):
+        job_dao = mock.MagicMock()
+        job_dao.stream.side_effect = EnvironmentError('DB is not available')
+        self.timetable.job_dao = job_dao
+        self.assertRaises(EnvironmentError, self.timetable.load_tree)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -114,6 +114,7 @@ class TestTreeNode(unittest.TestCase):
             mock_job = mock.create_autospec(Job)
             mock_job.is_finished = True
             child_mock = mock.create_autospec(TreeNode)
+            child_mock.is_cold = False
             child_mock.job_record = mock.create_autospec(Job)
             child_mock.job_record.is_active = True
             self.the_node.children[_index] = child_mock
@@ -146,6 +147,7 @@ class TestTreeNode(unittest.TestCase):
             mock_job = mock.create_autospec(Job)
             mock_job.is_finished = True
             child_mock = mock.create_autospec(TreeNode)
+            child_mock.is_cold = False
             child_mock.job_record = mock.create_autospec(Job)
             child_mock.job_record.is_active = False
             child_mock.job_record.is_skipped = True
@@ -169,12 +171,15 @@ class TestTreeNode(unittest.TestCase):
         depon_summary = mock.create_autospec(DependentOnSummary)
         type(depon_summary).all_finished = mock.PropertyMock(return_value=True)
 
-        self.the_node.dependent_on_summary = mock.Mock(return_value=depon_summary)
-        self.the_node.request_embryo_job_record = mock.Mock()
+        # TreeNode declares __slots__, hence the method is patched on the class level
+        patcher = mock.patch.object(TreeNode, 'dependent_on_summary', return_value=depon_summary)
+        patcher.start()
+        self.addCleanup(patcher.stop)
         for _index in range(10):
             mock_job = mock.create_autospec(Job)
             mock_job.is_finished = True
             child_mock = mock.create_autospec(TreeNode)
+            child_mock.is_cold = False
             child_mock.job_record = mock.create_autospec(Job)
             child_mock.job_record.is_active = True
             self.the_node.children[_index] = child_mock
@@ -0,0 +1,70 @@
+__author__ = 'Bohdan Mushkevych'
+
+import threading
+import unittest
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+from settings import enable_test_mode
+enable_test_mode()
+
+from constants import PROCESS_SITE_HOURLY
+from synergy.db.model import unit_of_work
+from synergy.scheduler.uow_status_listener import UowStatusListener
+from synergy.system.serial_executor import SerialExecutor
+
+
+class TestUowStatusListener(unittest.TestCase):
+    def setUp(self):
+        self.consumer_patcher = mock.patch('synergy.scheduler.uow_status_listener.Consumer')
+        self.uow_dao_patcher = mock.patch('synergy.scheduler.uow_status_listener.UnitOfWorkDao')
+        self.consumer = self.consumer_patcher.start().return_value
+        self.uow_dao = self.uow_dao_patcher.start().return_value
+
+        self.executor = SerialExecutor('test_tree')
+        self.scheduler = mock.MagicMock()
+        self.scheduler.executor_for.return_value = self.executor
+        self.listener = UowStatusListener(self.scheduler)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        self.consumer_patcher.stop()
+        self.uow_dao_patcher.stop()
+
+    def test_busy_tree(self):
+        self.uow_dao.get_one.return_value = mock.MagicMock(unit_of_work_type=unit_of_work.TYPE_MANAGED,
+                                                           process_name=PROCESS_SITE_HOURLY)
+        message = mock.MagicMock(body={'process_name': PROCESS_SITE_HOURLY,
+                                       'record_db_id': '5e2b7a1c9d4f3a0012000001'},
+                                 delivery_tag=7)
+
+        # tree's work queue is occupied by a long tick
+        tick_is_over = threading.Event()
+        self.executor.submit(tick_is_over.wait)
+
+        with mock.patch.object(UowStatusListener, '_notify') as notify:
+            # listener does not wait for the tree, and is free to process the messages of other trees
+            self.listener._mq_callback(message)
+            self.consumer.defer_acknowledgement.assert_called_once_with(7)
+            self.consumer.acknowledge.assert_not_called()
+            self.consumer.acknowledge_deferred.assert_not_called()
+
+            tick_is_over.set()
+            self.executor.submit(lambda: None).result()
+        notify.assert_called_once()
+        self.consumer.acknowledge_deferred.assert_called_once_with(7)
+
+    def test_non_managed(self):
+        self.uow_dao.get_one.return_value = mock.MagicMock(unit_of_work_type=unit_of_work.TYPE_FREERUN)
+        message = mock.MagicMock(body={'process_name': PROCESS_SITE_HOURLY,
+                                       'record_db_id': '5e2b7a1c9d4f3a0012000001'},
+                                 delivery_tag=8)
+        self.listener._mq_callback(message)
+        self.consumer.acknowledge.assert_called_once_with(8)
+        self.consumer.defer_acknowledgement.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+__author__ = 'Bohdan Mushkevych'
+
+import json
+import unittest
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+import amqp
+
+from settings import enable_test_mode
+enable_test_mode()
+
+from constants import PROCESS_SITE_HOURLY, PROCESS_ALERT_DAILY
+from synergy.db.model.mq_transmission import MqTransmission
+from synergy.mq import wire_codec
+from synergy.mq.flopsy import Consumer
+from synergy.mq.wire_codec import WIRE_FORMAT_BINARY, WIRE_FORMAT_JSON, CONTENT_TYPE_BINARY, CONTENT_TYPE_JSON
+from synergy.scheduler.scheduler_constants import QUEUE_UOW_STATUS
+
+RECORD_DB_ID = '5e2b7a1c9d4f3a0012000001'
+
+
+class TestWireCodec(unittest.TestCase):
+    def _round_trip(self, message_data):
+        body, content_type = wire_codec.encode(message_data, WIRE_FORMAT_BINARY)
+        self.assertEqual(content_type, CONTENT_TYPE_BINARY)
+        self.assertEqual(wire_codec.decode(body, content_type), message_data)
+        return body
+
+    def test_binary_round_trip(self):
+        managed = MqTransmission(process_name=PROCESS_SITE_HOURLY, record_db_id=RECORD_DB_ID)
+        body = self._round_trip(managed.document)
+        self.assertEqual(len(body), wire_codec.HEADER.size)
+        self.assertEqual(MqTransmission.from_json(wire_codec.decode(body, CONTENT_TYPE_BINARY)).record_db_id,
+                         managed.record_db_id)
+
+        freerun = MqTransmission(process_name=PROCESS_ALERT_DAILY, entry_name='ad_hoc', record_db_id=RECORD_DB_ID)
+        self._round_trip(freerun.document)
+
+        # process unknown to the registry is transmitted by name
+        unregistered = MqTransmission(process_name='unregistered_process', record_db_id=RECORD_DB_ID)
+        body = self._round_trip(unregistered.document)
+        self.assertTrue(body[1] & wire_codec.FLAG_INLINE_PROCESS_NAME)
+
+    def test_json_fallback(self):
+        # documents not expressible in the binary format, as well as the json wire format, produce json
+        for message_data, wire_format in [({'process_name': PROCESS_SITE_HOURLY, 'record_db_id': 'not-an-id'},
+                                           WIRE_FORMAT_BINARY),
+                                          ({'process_name': PROCESS_SITE_HOURLY, 'timeperiod': '2026101800'},
+                                           WIRE_FORMAT_BINARY),
+                                          ({'process_name': PROCESS_SITE_HOURLY, 'record_db_id': RECORD_DB_ID},
+                                           WIRE_FORMAT_JSON)]:
+            body, content_type = wire_codec.encode(message_data, wire_format)
+            self.assertEqual(content_type, CONTENT_TYPE_JSON)
+            self.assertEqual(wire_codec.decode(body, content_type), message_data)
+
+        # messages of the older publishers carry no content_type
+        legacy = json.dumps({'data': {'process_name': PROCESS_SITE_HOURLY, 'record_db_id': RECORD_DB_ID}})
+        self.assertEqual(wire_codec.decode(legacy.encode('utf-8')),
+                         {'process_name': PROCESS_SITE_HOURLY, 'record_db_id': RECORD_DB_ID})
+
+    def test_unsupported(self):
+        body, _ = wire_codec.encode({'process_name': PROCESS_SITE_HOURLY, 'record_db_id': RECORD_DB_ID},
+                                    WIRE_FORMAT_BINARY)
+        self.assertRaises(ValueError, wire_codec.decode, b'\x02' + body[1:], CONTENT_TYPE_BINARY)
+
+        unknown_id = wire_codec.HEADER.pack(wire_codec.BINARY_VERSION, 0, 0, b'\x00' * 12)
+        self.assertRaises(ValueError, wire_codec.decode, unknown_id, CONTENT_TYPE_BINARY)
+
+    def test_consumer_negotiation(self):
+        consumer = Consumer(QUEUE_UOW_STATUS, connection=mock.MagicMock())
+        received = []
+        consumer.register(lambda message: received.append(message.body))
+
+        message_data = {'process_name': PROCESS_SITE_HOURLY, 'record_db_id': RECORD_DB_ID}
+        for wire_format in [WIRE_FORMAT_BINARY, WIRE_FORMAT_JSON]:
+            body, content_type = wire_codec.encode(message_data, wire_format)
+            consumer.dispatch(amqp.Message(body, content_type=content_type))
+        consumer.dispatch(amqp.Message(json.dumps({'data': message_data})))
+        self.assertEqual(received, [message_data] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()